@@ -0,0 +1,197 @@
+"""
+Answer Cache - reuse answers for repeated and near-identical questions
+Shared by app_local.py (FastAPI) and app.py (Streamlit)
+
+Two tiers:
+- exact: normalised question text, checked before any embedding call
+- semantic: cosine similarity between query embeddings, only among entries with
+  the same scope (metadata filters + language) - "A&E in Kowloon West" and
+  "... Kowloon East" embed almost identically but must not share an answer
+Entries expire after a TTL, the least recently used are evicted past the size cap,
+and everything is dropped when the vector store on disk changes (re-ingestion).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Configuration
+CACHE_MAX_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "512"))
+CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+CACHE_SIMILARITY_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92"))
+INDEX_CHECK_INTERVAL = 5.0  # seconds between vector store change checks
+
+
+def normalize_question(question):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def cache_scope(filters=None, language=None):
+    """Key of everything besides the wording that shapes an answer (semantic hits must match it)"""
+    return json.dumps({"filters": filters or {}, "language": language}, sort_keys=True)
+
+
+def index_fingerprint(persist_directory):
+    """Cheap fingerprint of a vector store directory (file sizes + mtimes)"""
+    if not persist_directory or not os.path.exists(persist_directory):
+        return None
+
+    fingerprint = []
+    for root, _, files in os.walk(persist_directory):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            fingerprint.append((name, stat.st_size, stat.st_mtime_ns))
+    return hash(tuple(sorted(fingerprint)))
+
+
+class AnswerCache:
+    """Thread-safe exact + semantic answer cache with TTL/LRU eviction"""
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl_seconds=CACHE_TTL_SECONDS,
+                 similarity_threshold=CACHE_SIMILARITY_THRESHOLD, index_dir=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_dir = index_dir
+
+        self._entries = OrderedDict()  # normalised question -> entry
+        self._matrix = None  # stacked unit embeddings, rebuilt lazily
+        self._matrix_keys = []
+        self._matrix_scopes = None
+        self._lock = threading.Lock()
+
+        self._fingerprint = index_fingerprint(index_dir)
+        self._last_index_check = time.time()
+
+        self.stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    def get_exact(self, question):
+        """Look up the normalised question - every question passes here, so it counts the lookup"""
+        key = normalize_question(question)
+        with self._lock:
+            self._check_index()
+            self.stats["lookups"] += 1
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self.stats["exact_hits"] += 1
+            return entry
+
+    def get_similar(self, embedding, scope=None):
+        """Look up the closest cached embedding above the threshold within the same scope
+
+        Follows a get_exact miss for the same question, so it doesn't count another lookup.
+        """
+        scope = scope if scope is not None else cache_scope()
+        with self._lock:
+            self._check_index()
+            if embedding is None or not self._entries:
+                return None
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if not self._matrix_keys:
+                return None
+            scores = np.where(self._matrix_scopes == scope, self._matrix @ _unit(embedding), -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            entry = self._live_entry(self._matrix_keys[best])
+            if entry is not None:
+                self.stats["semantic_hits"] += 1
+            return entry
+
+    def put(self, question, answer, sources, embedding=None, scope=None):
+        """Store an answer, evicting the least recently used entries past the cap"""
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "embedding": _unit(embedding) if embedding is not None else None,
+                "scope": scope if scope is not None else cache_scope(),
+                "created": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._matrix = None
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the vector store was rebuilt"""
+        with self._lock:
+            self._clear()
+
+    def snapshot(self):
+        """Counters and size for /metrics"""
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = self.stats["lookups"]
+            return {
+                **self.stats,
+                "misses": lookups - hits,
+                "size": len(self._entries),
+                "capacity": self.max_size,
+                "hit_rate": round(hits / lookups * 100, 2) if lookups > 0 else 0
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- internals (caller holds the lock) ---
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _rebuild_matrix(self):
+        self._matrix_keys = [k for k, e in self._entries.items() if e["embedding"] is not None]
+        if self._matrix_keys:
+            self._matrix = np.stack([self._entries[k]["embedding"] for k in self._matrix_keys])
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._matrix_scopes = np.array([self._entries[k]["scope"] for k in self._matrix_keys], dtype=object)
+
+    def _check_index(self):
+        now = time.time()
+        if self.index_dir is None or now - self._last_index_check < INDEX_CHECK_INTERVAL:
+            return
+        self._last_index_check = now
+        fingerprint = index_fingerprint(self.index_dir)
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._clear()
+
+    def _clear(self):
+        if self._entries:
+            self.stats["invalidations"] += 1
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_scopes = None
+
+
+def _unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
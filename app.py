@@ -6,10 +6,24 @@ sys.modules['sqlite3'] = pysqlite3
 from langchain_cohere import ChatCohere, CohereEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from operator import itemgetter
 from langchain_core.output_parsers import StrOutputParser
+from answer_cache import AnswerCache, cache_scope
+from geo_index import answer_nearby_question, load_geo_index
+from stat_router import answer_stat_question, load_stat_table
+from bm25_index import load_bm25_index
+from retrieval import HYBRID_CANDIDATES, hybrid_merge, lexical_search
+from telemetry import Telemetry
+from context_builder import budget_for, build_context
+from language import COLLECTIONS, detect_language, index_language
+from query_filters import describe, extract_filters, where_clause
+from index_registry import current_index_dir
+from reranker import RERANK_CANDIDATES, load_reranker, rerank_depth
 import os
+import time
 cohere_api_key = os.environ.get("COHERE_API_KEY", "")
+CHROMA_DIR = "./chroma_db"  # registry root - ingest_data.py publishes index versions under it
 
 st.set_page_config(
     page_title="HK Healthcare RAG Chatbot",
@@ -67,11 +81,25 @@ with st.sidebar:
     st.markdown("### 🔑 Get FREE Key:")
     st.markdown("[Cohere Dashboard](https://dashboard.cohere.com/api-keys)")
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
+@st.cache_resource
+def get_telemetry():
+    # Per-stage latency histograms shared by every session of this app
+    return Telemetry(namespace="streamlit")
+
+@st.cache_resource
+def get_reranker():
+    # Local cross-encoder (None when RERANK=0 or sentence-transformers isn't installed)
+    try:
+        return load_reranker()
+    except Exception:
+        return None
+
+def format_docs(inputs, token_budget):
+    # Merged, deduplicated, question-language context within the model's token budget
+    return build_context(inputs["question"], inputs["docs"], token_budget)
 
 @st.cache_resource
-def initialize_rag_chain(cohere_key, model_name, temp, max_tok):
+def initialize_rag_chain(cohere_key, model_name, temp, max_tok, persist_directory):
     try:
         # Initialize with CURRENT Cohere model
         llm = ChatCohere(
@@ -91,9 +119,7 @@ def initialize_rag_chain(cohere_key, model_name, temp, max_tok):
 
         st.success("✅ Cohere Embeddings loaded")
 
-        # Check for database
-        persist_directory = "./chroma_db"
-
+        # Check for database (the live index version's directory)
         if not os.path.exists(persist_directory):
             st.warning("⚠️ No healthcare database found")
             st.info("""
@@ -115,8 +141,8 @@ def initialize_rag_chain(cohere_key, model_name, temp, max_tok):
                 "You are a helpful assistant. Answer this question about Hong Kong healthcare:\n\n{question}"
             )
 
-            simple_chain = prompt | llm | StrOutputParser()
-            return simple_chain, None
+            simple_chain = RunnablePassthrough.assign(answer=prompt | llm | StrOutputParser())
+            return simple_chain, None, None
 
         # Full RAG mode
         vectorstore = Chroma(
@@ -124,11 +150,24 @@ def initialize_rag_chain(cohere_key, model_name, temp, max_tok):
             embedding_function=embeddings
         )
 
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-
         doc_count = vectorstore._collection.count()
         st.success(f"✅ Loaded {doc_count} documents - RAG mode active!")
 
+        # Chinese chunks have their own collection, embedded with the multilingual model
+        zh_embeddings = None
+        zh_vectorstore = None
+        if COLLECTIONS["zh"] in {getattr(c, "name", c) for c in vectorstore._client.list_collections()}:
+            zh_embeddings = CohereEmbeddings(
+                cohere_api_key=cohere_key,
+                model="embed-multilingual-light-v3.0"
+            )
+            zh_vectorstore = Chroma(
+                collection_name=COLLECTIONS["zh"],
+                persist_directory=persist_directory,
+                embedding_function=zh_embeddings
+            )
+            st.success(f"✅ Loaded {zh_vectorstore._collection.count()} Chinese documents")
+
         prompt = ChatPromptTemplate.from_template(
             """Use this context to answer:
 
@@ -140,21 +179,90 @@ Question: {question}
 Provide a clear answer based on the context."""
         )
 
+        # BM25 over the same chunks for exact-term (facility name, district) matches
+        bm25_index = load_bm25_index(persist_directory, vectorstore._collection)
+
+        telemetry = get_telemetry()
+        reranker = get_reranker()
+
+        def retrieve(inputs):
+            timings = inputs.get("timings")
+            language = inputs.get("language", "en")
+            filters = inputs.get("filters") or {}
+            # Chinese questions search only their own script in the Chinese collection
+            if index_language(language) == "zh" and zh_vectorstore is not None:
+                with telemetry.timer("embed", timings):
+                    zh_embedding = zh_embeddings.embed_query(inputs["question"])
+                with telemetry.timer("vector_search", timings):
+                    return (zh_vectorstore.similarity_search_by_vector(zh_embedding, k=3, filter=where_clause(filters, language))
+                            or zh_vectorstore.similarity_search_by_vector(zh_embedding, k=3))
+
+            # Confident BM25 hits arrive without an embedding - use them as-is,
+            # otherwise RRF-fuse the vector search with the BM25 ranking
+            embedding = inputs["embedding"]
+            if embedding is None:
+                if inputs["lexical_docs"]:
+                    return inputs["lexical_docs"][:3]
+                # Chinese question but no Chinese collection - fall back to the English index
+                with telemetry.timer("embed", timings):
+                    embedding = embeddings.embed_query(inputs["question"])
+            # Cluster / facility type / A&E constraints are pushed down as a Chroma where clause
+            candidates_k = max(HYBRID_CANDIDATES, RERANK_CANDIDATES) if reranker else HYBRID_CANDIDATES
+            with telemetry.timer("vector_search", timings):
+                hits = vectorstore.similarity_search_by_vector_with_relevance_scores(
+                    embedding, k=candidates_k, filter=where_clause(filters)
+                )
+                if not hits and filters:
+                    hits = vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k=candidates_k)
+            vector_docs = [doc for doc, _ in hits]
+
+            # Close calls go to the cross-encoder; a clear top hit skips it
+            depth = rerank_depth([distance for _, distance in hits], 3) if reranker else 0
+            if not depth:
+                return hybrid_merge(vector_docs[:HYBRID_CANDIDATES], inputs["lexical_docs"], 3)
+            candidates = hybrid_merge(vector_docs[:depth], inputs["lexical_docs"], depth)
+            with telemetry.timer("rerank", timings):
+                return reranker.rerank(inputs["question"], candidates, 3)
+
+        # One retrieval pass: the same docs feed the prompt and the sources panel.
+        # The query embedding is computed once by the caller (it also keys the answer cache).
+
         rag_chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
+            RunnablePassthrough.assign(docs=RunnableLambda(retrieve))
+            | RunnablePassthrough.assign(context_info=RunnableLambda(lambda inputs: format_docs(inputs, budget_for(model_name))))
+            | RunnablePassthrough.assign(context=itemgetter("context_info") | RunnableLambda(itemgetter("context")))
+            | RunnablePassthrough.assign(answer=prompt | llm | StrOutputParser())
         )
 
-        return rag_chain, retriever
+        return rag_chain, embeddings, bm25_index
 
     except Exception as e:
         st.error(f"❌ Error: {str(e)}")
         import traceback
         with st.expander("🐛 Details"):
             st.code(traceback.format_exc())
-        return None, None
+        return None, None, None
+
+@st.cache_resource
+def get_answer_cache(model_name, temp, max_tok, persist_directory):
+    # One cache per model setting and index version; dropped automatically when the index changes
+    return AnswerCache(index_dir=persist_directory)
+
+@st.cache_resource
+def get_geo_index(persist_directory):
+    # Nearest-facility KD-tree written by ingest_data.py (built from data/ if missing)
+    try:
+        return load_geo_index(persist_directory)
+    except Exception:
+        return None
+
+@st.cache_resource
+def get_stat_table():
+    # Healthstat indicator x year tables for direct answers (loaded from data/)
+    try:
+        return load_stat_table()
+    except Exception:
+        return None
 
 # Check API key
 if not cohere_api_key:
@@ -171,9 +279,15 @@ if not cohere_api_key:
     """)
     st.stop()
 
-# Initialize
+# Initialize - resources are cached per index version, so a newly published
+# version is picked up on the next rerun while running sessions finish on the old one
+index_dir = current_index_dir(CHROMA_DIR)
 with st.spinner("🔄 Loading Cohere AI..."):
-    chain, retriever = initialize_rag_chain(cohere_api_key, model_choice, temperature, max_tokens)
+    chain, embeddings, bm25_index = initialize_rag_chain(cohere_api_key, model_choice, temperature, max_tokens, index_dir)
+    answer_cache = get_answer_cache(model_choice, temperature, max_tokens, index_dir)
+    geo_index = get_geo_index(index_dir)
+    stat_table = get_stat_table()
+    telemetry = get_telemetry()
 
 if chain is None:
     st.error("❌ Failed. Check error above.")
@@ -199,32 +313,112 @@ if prompt := st.chat_input("Ask about HK healthcare..."):
     with st.chat_message("assistant"):
         with st.spinner("🤔 Thinking..."):
             try:
-                answer = chain.invoke(prompt)
-                st.markdown(answer)
-
-                # Get sources if available
-                if retriever:
-                    try:
-                        source_docs = retriever.invoke(prompt)
-                        if source_docs:
-                            sources_text = "### 📄 Sources:\n\n"
-                            for i, doc in enumerate(source_docs, 1):
-                                source = doc.metadata.get("source", "Unknown")
-                                preview = doc.page_content[:150] + "..."
-                                sources_text += f"**{i}. {source}**\n```{preview}```\n\n"
-
-                            with st.expander("📚 Sources"):
-                                st.markdown(sources_text)
-
-                            st.session_state.messages.append({
-                                "role": "assistant",
-                                "content": answer,
-                                "sources": sources_text
-                            })
-                        else:
-                            st.session_state.messages.append({"role": "assistant", "content": answer})
-                    except:
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
+                start_time = time.perf_counter()
+                timings = {}
+
+                # Nearest-facility questions are answered from the geo index and
+                # indicator/year lookups from the stat tables (no LLM call)
+                with telemetry.timer("geo_lookup", timings):
+                    nearby = answer_nearby_question(prompt, geo_index)
+                stat = None
+                if nearby is None:
+                    with telemetry.timer("stats_lookup", timings):
+                        stat = answer_stat_question(prompt, stat_table, geo_index)
+
+                # Otherwise exact cache tier first, then BM25; a confident lexical hit
+                # skips the embedding call, else one query embedding is shared by the
+                # semantic tier and the vector search
+                cached = None
+                embedding = None
+                lexical_docs = []
+                # Chinese questions are embedded by the chain with the multilingual model
+                language = detect_language(prompt)
+                filters = extract_filters(prompt, bm25_index.metadata_index if bm25_index is not None else None)
+                if nearby is None and stat is None:
+                    with telemetry.timer("cache_lookup", timings):
+                        cached = answer_cache.get_exact(prompt)
+                    if cached is None and index_language(language) == "en":
+                        with telemetry.timer("bm25_search", timings):
+                            lexical_docs, confident = lexical_search(bm25_index, prompt, filters=filters)
+                        if not confident:
+                            if embeddings is not None:
+                                with telemetry.timer("embed", timings):
+                                    embedding = embeddings.embed_query(prompt)
+                            with telemetry.timer("cache_lookup", timings):
+                                cached = answer_cache.get_similar(embedding, cache_scope(filters, language))
+
+                if nearby is not None:
+                    answer = nearby["answer"]
+                    sources_text = "### 📍 Sources:\n\n" + "\n".join(f"- {source}" for source in nearby["sources"])
+                    st.markdown(answer)
+                    st.caption("📍 Answered from the facility location index")
+                elif stat is not None:
+                    answer = stat["answer"]
+                    sources_text = "### 📊 Sources:\n\n" + "\n".join(f"- {source}" for source in stat["sources"])
+                    st.markdown(answer)
+                    st.caption("📊 Answered directly from the health statistics tables")
+                elif cached is not None:
+                    answer = cached["answer"]
+                    sources_text = cached["sources"]
+                    st.markdown(answer)
+                    st.caption("⚡ Cached answer")
+                else:
+                    result = {"tokens": 0}
+
+                    def stream_answer():
+                        # Docs arrive first from the stream, then answer tokens
+                        generation_start = time.perf_counter()
+                        first_token_at = None
+                        inputs = {"question": prompt, "embedding": embedding, "language": language,
+                                  "filters": filters, "lexical_docs": lexical_docs, "timings": timings}
+                        for chunk in chain.stream(inputs):
+                            if "docs" in chunk:
+                                result["docs"] = chunk["docs"]
+                            if "context_info" in chunk:
+                                result["context_info"] = chunk["context_info"]
+                            if "answer" in chunk:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                    telemetry.observe("time_to_first_token", first_token_at - generation_start, timings)
+                                result["tokens"] += 1
+                                yield chunk["answer"]
+                        telemetry.observe("generate", time.perf_counter() - generation_start, timings)
+                        if first_token_at is not None:
+                            # Cohere streams roughly one token per chunk
+                            telemetry.record_generation(result["tokens"], time.perf_counter() - first_token_at)
+
+                    answer = st.write_stream(stream_answer())
+
+                    # Sources come from the same retrieval that built the context
+                    sources_text = None
+                    source_docs = result.get("docs", [])
+                    if source_docs:
+                        sources_text = "### 📄 Sources:\n\n"
+                        for i, doc in enumerate(source_docs, 1):
+                            source = doc.metadata.get("source", "Unknown")
+                            preview = doc.page_content[:150] + "..."
+                            sources_text += f"**{i}. {source}**\n```{preview}```\n\n"
+
+                    answer_cache.put(prompt, answer, sources_text, embedding, cache_scope(filters, language))
+
+                route = "geo" if nearby else "stats" if stat else "cache" if cached else "rag"
+                telemetry.observe(f"total_{route}", time.perf_counter() - start_time, timings)
+                st.caption("⏱️ " + " · ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items()))
+                context_info = result.get("context_info") if route == "rag" else None
+                if context_info:
+                    st.caption(f"✂️ Context: {context_info['tokens_after']} tokens (saved {context_info['tokens_saved']})")
+                if route == "rag" and filters:
+                    st.caption(f"🔎 Filtered by {describe(filters)}")
+
+                if sources_text:
+                    with st.expander("📚 Sources"):
+                        st.markdown(sources_text)
+
+                    st.session_state.messages.append({
+                        "role": "assistant",
+                        "content": answer,
+                        "sources": sources_text
+                    })
                 else:
                     st.session_state.messages.append({"role": "assistant", "content": answer})
 
@@ -239,6 +433,17 @@ if prompt := st.chat_input("Ask about HK healthcare..."):
                 st.info("💡 Try: Switch to command-r7b model or reduce max tokens")
                 st.session_state.messages.append({"role": "assistant", "content": error_msg})
 
+with st.sidebar:
+    stage_summary = telemetry.stage_summary()
+    if stage_summary:
+        st.markdown("---")
+        with st.expander("📈 Latency by stage (p50 / p95)"):
+            for stage, stats in stage_summary.items():
+                st.markdown(f"- **{stage}**: {stats['p50'] * 1000:.0f} / {stats['p95'] * 1000:.0f} ms ({stats['count']}x)")
+            tokens = telemetry.token_summary()
+            if tokens["generations"]:
+                st.markdown(f"- **tokens/sec** (p50): {tokens['tokens_per_second_p50']}")
+
 st.markdown("---")
 st.markdown("### 🎯 Portfolio Project:")
 st.markdown("- 🤖 **AI:** Cohere command-r7b")
@@ -1,29 +1,57 @@
 import os
+import asyncio
+import contextvars
+import json
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response, Query as QueryParam
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from langchain_huggingface import HuggingFaceEmbeddings
+from typing import List
+from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+import chromadb
+from langchain_ollama import OllamaLLM
+import httpx
+from answer_cache import AnswerCache, cache_scope, normalize_question
+from geo_index import answer_nearby_question, load_geo_index
+from stat_router import answer_stat_question, load_stat_table
+from bm25_index import load_bm25_index
+from retrieval import HYBRID_CANDIDATES, hybrid_merge, lexical_search
+from startup import EMBEDDING_MODEL, ZH_EMBEDDING_MODEL, StartupState, load_embeddings
+from telemetry import Counters, Telemetry, server_timing_header
+from context_builder import budget_for, build_context
+from language import COLLECTIONS, detect_language, index_language
+from reranker import RERANK_CANDIDATES, load_reranker, rerank_depth
+from index_snapshot import load_snapshot, snapshot_exists
+from index_registry import collect_garbage, current_index_dir, current_version, read_version_info
+from query_filters import describe, extract_filters, where_clause
+from singleflight import SingleFlight
+from request_log import begin_request, log_request, log_stats, setup_logging
+
+# Configure logging: handlers run on a background thread, the request path only enqueues
+setup_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so uvicorn binds (and /live answers) immediately
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, warm_up)
+    yield
+    retrieval_executor.shutdown(wait=False, cancel_futures=True)
+    generation_executor.shutdown(wait=False, cancel_futures=True)
+
 app = FastAPI(
     title="HK Healthcare RAG Chatbot",
     description="Production RAG system for Hong Kong healthcare data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for Streamlit
@@ -35,117 +63,1086 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Metrics storage
-query_metrics = {
+# Worker pools: retrieval is CPU-bound (MiniLM + HNSW), generation blocks on Ollama
+RETRIEVAL_WORKERS = int(os.environ.get("RETRIEVAL_WORKERS", "4"))
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "2"))
+MAX_INFLIGHT_QUERIES = int(os.environ.get("MAX_INFLIGHT_QUERIES", "16"))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "5"))
+BATCH_MAX_QUESTIONS = int(os.environ.get("BATCH_MAX_QUESTIONS", "500"))
+BATCH_GENERATION_CONCURRENCY = int(os.environ.get("BATCH_GENERATION_CONCURRENCY", str(GENERATION_WORKERS)))
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "0") == "1"  # per-request stage timings
+
+# Ollama client: one keep-alive httpx pool reused by every generation
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL")  # None -> OLLAMA_HOST or localhost:11434
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", str(GENERATION_WORKERS + 2)))
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))
+OLLAMA_KEEPALIVE_SECONDS = float(os.environ.get("OLLAMA_KEEPALIVE_SECONDS", "60"))
+
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+
+# Metrics storage (thread-safe counters; stage histograms live in telemetry)
+query_metrics = Counters({
     "total_queries": 0,
     "total_latency": 0.0,
     "errors": 0,
+    "in_flight": 0,
+    "rejected": 0,
+    "streamed_queries": 0,
+    "total_time_to_first_token": 0.0,
+    "batches": 0,
+    "batch_questions": 0,
+    "batch_generations": 0,
+    "context_tokens": 0,
+    "context_tokens_saved": 0,
+    "coalesced_queries": 0,
+    "reranked_queries": 0,
+    "rerank_skipped": 0,
+    "filtered_queries": 0,
+    "index_reloads": 0,
     "start_time": datetime.now().isoformat()
-}
-
-# Load vector store
-logger.info("Loading vector store...")
-try:
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma(
-        persist_directory="./chroma_db",
-        embedding_function=embeddings
+})
+telemetry = Telemetry()
+
+CHROMA_DIR = "./chroma_db"  # registry root; the live index version is resolved from it
+INDEX_WATCH_SECONDS = float(os.environ.get("INDEX_WATCH_SECONDS", "30"))  # CURRENT poll interval (0 = admin endpoint only)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # required as X-Admin-Token by /admin/* when set
+RETRIEVAL_K = 4
+LLM_MODEL = "llama3.2:3b"
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "auto")  # auto (snapshot if exported) | snapshot | chroma
+EMBEDDING_MODEL_CHECK = os.environ.get("EMBEDDING_MODEL_CHECK", "warn")  # warn | strict | off
+CONTEXT_TOKEN_BUDGET = budget_for(LLM_MODEL)
+
+# Answer cache (exact + semantic tiers, cleared when a new index version is swapped in)
+answer_cache = AnswerCache()
+
+# Identical concurrent questions share one retrieval + generation
+coalescer = SingleFlight()
+
+# Startup state - everything below is loaded by warm_up() after the server binds
+WARMUP_LLM = os.environ.get("WARMUP_LLM", "0") == "1"  # also load llama3.2 into Ollama memory
+startup = StartupState()
+
+# Gauges are read at scrape time
+telemetry.gauge("queue_depth", "Queries currently in flight", lambda: query_metrics["in_flight"])
+telemetry.gauge("queue_capacity", "Max queries in flight before 429", lambda: MAX_INFLIGHT_QUERIES)
+telemetry.gauge("retrieval_backlog", "Tasks waiting for a retrieval worker", lambda: retrieval_executor._work_queue.qsize())
+telemetry.gauge("generation_backlog", "Tasks waiting for a generation worker", lambda: generation_executor._work_queue.qsize())
+telemetry.gauge("coalesced_flights", "Distinct questions currently being computed", lambda: len(coalescer))
+telemetry.gauge("answer_cache_size", "Entries in the answer cache", lambda: answer_cache.snapshot()["size"])
+telemetry.gauge("answer_cache_hit_rate", "Answer cache hit rate (%)", lambda: answer_cache.snapshot()["hit_rate"])
+telemetry.gauge("ready", "1 once warm-up has finished", lambda: startup.ready)
+telemetry.gauge("uptime_seconds", "Seconds since the process started", lambda: round(time.time() - startup.started_at, 1))
+embeddings = None
+zh_embeddings = None  # multilingual embedder for Chinese questions
+reranker = None
+stat_table = None
+llm = None
+active_index = None  # LoadedIndex every new query reads
+reload_lock = threading.Lock()
+
+class LoadedIndex:
+    """One index version's stores, swapped as a unit so a query never mixes versions"""
+
+    def __init__(self, version, path, vectorstore, zh_vectorstore, bm25_index, geo_index):
+        self.version = version  # None for an unversioned chroma_db
+        self.path = path
+        self.vectorstore = vectorstore
+        self.zh_vectorstore = zh_vectorstore  # None when no Chinese collection was ingested
+        self.bm25_index = bm25_index
+        self.geo_index = geo_index
+        self.loaded_at = time.time()
+
+def open_vector_store(index_dir, collection_name, embedding_function):
+    """Attach to the shared mmap snapshot when one is exported, else open Chroma"""
+    if VECTOR_STORE != "chroma":
+        store = load_snapshot(index_dir, collection_name, embedding_function)
+        if store is not None:
+            logger.info(f"🧊 Attached to snapshot of '{collection_name}' (read-only, shared)")
+            return store
+        if VECTOR_STORE == "snapshot":
+            raise RuntimeError(f"No snapshot of '{collection_name}' in {index_dir} - run python index_snapshot.py")
+    return Chroma(
+        collection_name=collection_name,
+        persist_directory=index_dir,
+        embedding_function=embedding_function
     )
-    logger.info("✅ Vector store loaded successfully!")
-except Exception as e:
-    logger.error(f"Failed to load vector store: {e}")
-    raise
-
-# Initialize LLM
-try:
-    llm = Ollama(model="llama3.2:3b", temperature=0.3)
-    logger.info("✅ LLM initialized successfully!")
-except Exception as e:
-    logger.error(f"Failed to initialize LLM: {e}")
-    raise
+
+def has_collection(index_dir, collection_name):
+    if VECTOR_STORE != "chroma" and snapshot_exists(index_dir, collection_name):
+        return True
+    if VECTOR_STORE == "snapshot":
+        return False
+    client = chromadb.PersistentClient(path=index_dir)
+    return collection_name in {getattr(c, "name", c) for c in client.list_collections()}
+
+def same_model(recorded, configured):
+    """'sentence-transformers/all-MiniLM-L6-v2' and './models/all-MiniLM-L6-v2/' name the same model"""
+    return os.path.basename(recorded.rstrip("/")) == os.path.basename(configured.rstrip("/"))
+
+def mismatched_collections(version):
+    """Collections whose recorded embedding model differs from the one queries are embedded with
+
+    Returns {collection: recorded model}; versions built before models were recorded pass.
+    """
+    if version is None or EMBEDDING_MODEL_CHECK == "off":
+        return {}
+    recorded = read_version_info(CHROMA_DIR, version).get("collection_models", {})
+    configured = {COLLECTIONS["en"]: EMBEDDING_MODEL, COLLECTIONS["zh"]: ZH_EMBEDDING_MODEL}
+    mismatched = {
+        collection: model for collection, model in recorded.items()
+        if collection in configured and not same_model(model, configured[collection])
+    }
+    for collection, model in mismatched.items():
+        message = (f"Collection '{collection}' of version {version} was embedded with {model}, "
+                   f"but queries use {configured[collection]} - rebuild it with INGEST_EMBEDDINGS=local")
+        if EMBEDDING_MODEL_CHECK == "strict":
+            raise ValueError(message)
+        logger.warning(f"⚠️ {message}")
+    return mismatched
+
+def load_index(index_dir, version, phase=lambda name, required=True: nullcontext()):
+    """Open the vector stores, BM25 and geo index of one index version
+
+    Warm-up passes startup.phase to time each step; a reload passes nothing, so
+    any failure aborts it and the live version keeps serving.
+    """
+    global zh_embeddings
+    zh_vectorstore = bm25_index = geo_index = None
+    mismatched = mismatched_collections(version)
+
+    with phase("vector_store"):
+        vectorstore = open_vector_store(index_dir, COLLECTIONS["en"], embeddings)
+        logger.info(f"✅ Vector store loaded: {vectorstore._collection.count()} chunks (version {version})")
+
+    # Chinese chunks live in their own collection, embedded with a multilingual model
+    with phase("zh_index", required=False):
+        if COLLECTIONS["zh"] in mismatched:
+            # Neighbours from another model's vectors are meaningless - use the English index instead
+            logger.warning("⚠️ Skipping the Chinese collection - Chinese questions use the English index")
+        elif has_collection(index_dir, COLLECTIONS["zh"]):
+            if zh_embeddings is None:
+                zh_embeddings = load_embeddings(ZH_EMBEDDING_MODEL)
+            zh_vectorstore = open_vector_store(index_dir, COLLECTIONS["zh"], zh_embeddings)
+            logger.info(f"✅ Chinese index loaded: {zh_vectorstore._collection.count()} chunks")
+        else:
+            logger.info("ℹ️ No Chinese collection - Chinese questions use the English index")
+
+    # BM25 index over the same chunks (built from the collection if ingest hasn't saved one)
+    with phase("bm25_index", required=False):
+        bm25_index = load_bm25_index(index_dir, vectorstore._collection)
+        logger.info(f"✅ BM25 index loaded: {len(bm25_index)} chunks")
+
+    # Nearest-facility index (built by ingest_data.py, or from data/ as a fallback)
+    with phase("geo_index", required=False):
+        geo_index = load_geo_index(index_dir)
+        if geo_index is not None:
+            logger.info(f"✅ Geo index loaded: {len(geo_index)} facilities")
+
+    return LoadedIndex(version, index_dir, vectorstore, zh_vectorstore, bm25_index, geo_index)
+
+def reload_index(force=False):
+    """Swap in the version CURRENT points at, if it isn't live already
+
+    Queries already running finish on the LoadedIndex they started with.
+    Answers from the old version are dropped from the cache.
+    """
+    global active_index
+    with reload_lock:
+        previous = active_index
+        version = current_version(CHROMA_DIR)
+        if previous is not None and version == previous.version and not force:
+            return {"reloaded": False, "version": version}
+
+        start = time.perf_counter()
+        active_index = load_index(current_index_dir(CHROMA_DIR), version)
+        answer_cache.invalidate()
+        seconds = time.perf_counter() - start
+
+    query_metrics.inc("index_reloads")
+    telemetry.observe("index_reload", seconds)
+    previous_version = previous.version if previous is not None else None
+    logger.info(f"🔀 Index swapped: {previous_version} -> {version} in {seconds:.2f}s")
+    return {"reloaded": True, "version": version, "previous": previous_version, "seconds": round(seconds, 2)}
+
+def watch_index():
+    """Poll CURRENT for versions published by ingest_data.py; collect retired ones after their grace period"""
+    while True:
+        time.sleep(INDEX_WATCH_SECONDS)
+        try:
+            reload_index()
+            removed = collect_garbage(CHROMA_DIR)
+            if removed:
+                logger.info(f"🗑️ Removed retired index versions: {', '.join(removed)}")
+        except Exception as e:
+            logger.error(f"❌ Index reload failed, still serving version {active_index.version}: {e}")
+
+def warm_up():
+    """Load models and indexes phase by phase, then mark the service ready"""
+    global embeddings, reranker, stat_table, llm, active_index
+
+    try:
+        with startup.phase("embedding_model"):
+            embeddings = load_embeddings()
+
+        # First encode pays for lazy init (tokenizer, kernels) - do it before traffic
+        with startup.phase("embedding_warmup", required=False):
+            embeddings.embed_query("warm up")
+
+        # The live index version: vector stores, BM25 and geo index
+        active_index = load_index(current_index_dir(CHROMA_DIR), current_version(CHROMA_DIR), startup.phase)
+
+        # Cross-encoder second stage (skipped when disabled or not installed)
+        with startup.phase("reranker", required=False):
+            reranker = load_reranker()
+            if reranker is not None:
+                reranker.score_many([("warm up", [Document(page_content="warm up")])])
+                logger.info("✅ Cross-encoder reranker loaded")
+
+        # Healthstat tables for direct indicator x year answers
+        with startup.phase("stat_tables", required=False):
+            stat_table = load_stat_table()
+            if stat_table is not None:
+                logger.info(f"✅ Stat tables loaded: {len(stat_table)} series x {len(stat_table.years)} years")
+
+        with startup.phase("llm"):
+            llm = OllamaLLM(
+                model=LLM_MODEL,
+                temperature=0.3,
+                base_url=OLLAMA_BASE_URL,
+                client_kwargs={
+                    "timeout": httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+                    "limits": httpx.Limits(
+                        max_connections=OLLAMA_POOL_SIZE,
+                        max_keepalive_connections=OLLAMA_POOL_SIZE,
+                        keepalive_expiry=OLLAMA_KEEPALIVE_SECONDS
+                    )
+                }
+            )
+            logger.info("✅ LLM initialized successfully!")
+
+        if WARMUP_LLM:
+            with startup.phase("llm_warmup", required=False):
+                llm.invoke("Reply with OK.")
+
+        startup.mark_ready()
+        if INDEX_WATCH_SECONDS > 0:
+            threading.Thread(target=watch_index, name="index-watch", daemon=True).start()
+    except Exception:
+        # Already logged by the phase; /ready keeps reporting 503 with the error
+        pass
+
+def require_ready():
+    """Reject queries with 503 until warm-up has finished"""
+    if not startup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=startup.error or "Service is starting up, please retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
 
 class Query(BaseModel):
     question: str
 
-@app.post("/query")
-async def query_documents(query: Query):
-    start_time = time.time()
-    query_metrics["total_queries"] += 1
+class BatchQuery(BaseModel):
+    questions: List[str]
+    stream: bool = False
 
-    logger.info(f"Received query: {query.question[:100]}...")
+async def run_in_pool(executor, func, *args):
+    """Run a blocking call in a worker pool without stalling the event loop
 
-    try:
-        # Retrieve documents
-        docs = vectorstore.similarity_search(query.question, k=4)
-        logger.info(f"Retrieved {len(docs)} documents")
+    The caller's context goes along, so worker log lines keep the request id.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+def acquire_query_slot():
+    """Reserve an in-flight slot or reject with 429 when the queue is full"""
+    in_flight = query_metrics.inc("in_flight")
+    if in_flight > MAX_INFLIGHT_QUERIES:
+        query_metrics.inc("in_flight", -1)
+        query_metrics.inc("rejected")
+        logger.warning(f"Query rejected: {in_flight - 1} queries in flight")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queries in flight, please retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+def release_query_slot():
+    query_metrics.inc("in_flight", -1)
 
-        # Build context
-        context = "\n\n".join([doc.page_content for doc in docs])
+class CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse whose cleanup runs however the response ends
 
-        # Create prompt
-        prompt = f"""You are a helpful AI assistant specializing in Hong Kong healthcare policy.
+    A body generator's finally never runs if the body is not iterated (client
+    gone before the first chunk), so the in-flight slot is freed here as well;
+    cleanup must be safe to call twice.
+    """
+
+    def __init__(self, content, cleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.cleanup()
+
+def build_prompt(question, docs):
+    """Build the generation prompt from retrieved documents (deduplicated, within the token budget)"""
+    built = build_context(question, docs, CONTEXT_TOKEN_BUDGET)
+    context = built["context"]
+    query_metrics.inc("context_tokens", built["tokens_after"])
+    query_metrics.inc("context_tokens_saved", built["tokens_saved"])
+    logger.info(f"Context: {built['tokens_after']} tokens from {built['docs_used']} sections (saved {built['tokens_saved']})")
+
+    return f"""You are a helpful AI assistant specializing in Hong Kong healthcare policy.
 Use the following context to answer the question. If you don't know, say so.
 
 Context:
 {context}
 
-Question: {query.question}
+Question: {question}
 
 Answer:"""
 
-        # Get LLM response
-        answer = llm.invoke(prompt)
+async def plan_without_vectors(question, index, timings=None, lexical=True, filters=None):
+    """Routes that need no query embedding: geo, stats, exact cache, confident BM25
+
+    Returns (plan, lexical_docs); plan is None when the vector search is still needed.
+    lexical=False skips BM25 (its index only covers the English collection).
+    BM25 only scores chunks matching the metadata filters.
+    """
+    # Nearest-facility questions are answered from the spatial index - no LLM
+    with telemetry.timer("geo_lookup", timings):
+        nearby = answer_nearby_question(question, index.geo_index)
+    if nearby is not None:
+        return {"route": "geo", "cache": "bypass", "answer": nearby["answer"], "sources": nearby["sources"]}, []
+
+    # Table lookups ("life expectancy in 2023") are answered from the exact cell - no LLM
+    with telemetry.timer("stats_lookup", timings):
+        stat = answer_stat_question(question, stat_table, index.geo_index)
+    if stat is not None:
+        return {"route": "stats", "cache": "bypass", "answer": stat["answer"], "sources": stat["sources"]}, []
+
+    # Exact tier needs no embedding at all
+    with telemetry.timer("cache_lookup", timings):
+        cached = answer_cache.get_exact(question)
+    if cached is not None:
+        return {"route": "cache", "cache": "exact", "answer": cached["answer"], "sources": cached["sources"]}, []
+
+    if not lexical:
+        return None, []
+
+    # BM25 first: a confident exact-term hit skips embedding the query entirely
+    with telemetry.timer("bm25_search", timings):
+        lexical_docs, confident = await run_in_pool(retrieval_executor, lexical_search, index.bm25_index, question, HYBRID_CANDIDATES, filters)
+    if confident:
+        return rag_plan(question, lexical_docs[:RETRIEVAL_K], None, "lexical", timings), lexical_docs
+
+    return None, lexical_docs
+
+def semantic_cache_plan(embedding, scope, timings=None):
+    """Cached answer for a near-identical question with the same filters and language"""
+    with telemetry.timer("cache_lookup", timings):
+        cached = answer_cache.get_similar(embedding, scope)
+    if cached is None:
+        return None
+    return {"route": "cache", "cache": "semantic", "answer": cached["answer"], "sources": cached["sources"]}
+
+def question_filters(question, index):
+    """Metadata constraints named in the question (cluster, facility type, A&E), checked against the BM25 index"""
+    filters = extract_filters(question, index.bm25_index.metadata_index if index.bm25_index is not None else None)
+    if filters:
+        query_metrics.inc("filtered_queries")
+        logger.info(f"Metadata filters: {describe(filters)}")
+    return filters
+
+def search_vectors(store, embedding, k, where=None):
+    """(doc, distance) hits within the where clause - the whole collection if nothing matches it"""
+    hits = store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where)
+    if not hits and where is not None:
+        hits = store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+    return hits
+
+def routes_to_chinese(language, index):
+    """Chinese questions go to the Chinese collection when one was ingested"""
+    return index_language(language) == "zh" and index.zh_vectorstore is not None
+
+async def retrieve_chinese(question, language, index, timings=None, filters=None):
+    """Multilingual embedding + search of the Chinese collection, limited to the question's script
+    and any metadata filters
+
+    The embedding comes from a different model than the answer cache's, so it
+    is not used for the semantic tier.
+    """
+    with telemetry.timer("embed", timings):
+        embedding = await run_in_pool(retrieval_executor, zh_embeddings.embed_query, question)
+
+    with telemetry.timer("vector_search", timings):
+        hits = await run_in_pool(
+            retrieval_executor, search_vectors, index.zh_vectorstore, embedding, RETRIEVAL_K, where_clause(filters or {}, language)
+        )
+    return rag_plan(question, [doc for doc, _ in hits], None, f"vector_{language}", timings)
+
+def candidate_count():
+    """Vector hits to fetch - over-fetched when a reranker may pick from them"""
+    return max(HYBRID_CANDIDATES, RERANK_CANDIDATES) if reranker is not None else HYBRID_CANDIDATES
+
+def fuse_candidates(hits, lexical_docs):
+    """RRF-fuse (doc, distance) vector hits with BM25
+
+    Returns (docs, rerank): the top RETRIEVAL_K docs when the vector search has a
+    clear winner, otherwise the closest candidates for the cross-encoder to rank.
+    """
+    vector_docs = [doc for doc, _ in hits]
+    depth = rerank_depth([distance for _, distance in hits], RETRIEVAL_K) if reranker is not None else 0
+    if not depth:
+        if reranker is not None:
+            query_metrics.inc("rerank_skipped")
+        return hybrid_merge(vector_docs[:HYBRID_CANDIDATES], lexical_docs, RETRIEVAL_K), False
+
+    query_metrics.inc("reranked_queries")
+    return hybrid_merge(vector_docs[:depth], lexical_docs, depth), True
+
+async def retrieve_context(question, timings=None):
+    """Check the answer cache, otherwise embed once and search the vector store
+
+    Returns a plan dict: "rag" plans carry docs and prompt for generation,
+    every other route already carries its answer. Stage durations are added
+    to `timings` when given.
+    """
+    index = active_index  # a concurrent reload doesn't affect this query
+    language = detect_language(question)
+    chinese = routes_to_chinese(language, index)
+    filters = question_filters(question, index)
+    plan, lexical_docs = await plan_without_vectors(question, index, timings, lexical=not chinese, filters=filters)
+    if plan is not None:
+        return plan
+    if chinese:
+        return await retrieve_chinese(question, language, index, timings, filters)
+
+    with telemetry.timer("embed", timings):
+        embedding = await run_in_pool(retrieval_executor, embeddings.embed_query, question)
+
+    scope = cache_scope(filters, language)
+    plan = semantic_cache_plan(embedding, scope, timings)
+    if plan is not None:
+        return plan
+
+    # Reuse the query embedding for the search instead of embedding again
+    with telemetry.timer("vector_search", timings):
+        hits = await run_in_pool(
+            retrieval_executor, search_vectors, index.vectorstore, embedding, candidate_count(), where_clause(filters)
+        )
+
+    # Fuse with the BM25 ranking (reciprocal rank fusion)
+    with telemetry.timer("fusion", timings):
+        docs, rerank = fuse_candidates(hits, lexical_docs)
+    if rerank:
+        with telemetry.timer("rerank", timings):
+            docs = await run_in_pool(retrieval_executor, reranker.rerank, question, docs, RETRIEVAL_K)
+    return rag_plan(question, docs, embedding, "reranked" if rerank else "hybrid", timings, scope)
+
+async def retrieve_batch(questions, timings=None):
+    """Plans for many questions: one embed_documents call and one batched Chroma query
+
+    Returns {question: plan}.
+    """
+    index = active_index  # the whole batch is answered from one version
+    plans = {}
+    lexical = {}
+    filters = {}
+    scopes = {}
+    for question in questions:
+        language = detect_language(question)
+        chinese = routes_to_chinese(language, index)
+        filters[question] = question_filters(question, index)
+        scopes[question] = cache_scope(filters[question], language)
+        plan, lexical[question] = await plan_without_vectors(question, index, lexical=not chinese, filters=filters[question])
+        if plan is None and chinese:
+            plan = await retrieve_chinese(question, language, index, filters=filters[question])
+        if plan is not None:
+            plans[question] = plan
+
+    pending = [question for question in questions if question not in plans]
+    if not pending:
+        return plans
+
+    # MiniLM encodes the whole list as batched tensors
+    with telemetry.timer("batch_embed", timings):
+        vectors = await run_in_pool(retrieval_executor, embeddings.embed_documents, pending)
+
+    searched = []
+    for question, embedding in zip(pending, vectors):
+        plan = semantic_cache_plan(embedding, scopes[question])
+        if plan is not None:
+            plans[question] = plan
+        else:
+            searched.append((question, embedding))
+    if not searched:
+        return plans
+
+    # One batched Chroma query per distinct metadata filter (usually just the unfiltered one)
+    groups = {}
+    for question, embedding in searched:
+        groups.setdefault(describe(filters[question]), []).append((question, embedding))
+
+    def search_group(group):
+        where = where_clause(filters[group[0][0]])
+        results = index.vectorstore._collection.query(
+            query_embeddings=[embedding for _, embedding in group],
+            n_results=candidate_count(),
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return {
+            question: [
+                (Document(id=doc_id, page_content=text, metadata=metadata or {}), distance)
+                for doc_id, text, metadata, distance in zip(
+                    results["ids"][i], results["documents"][i], results["metadatas"][i], results["distances"][i]
+                )
+            ] or (search_vectors(index.vectorstore, embedding, candidate_count()) if where else [])
+            for i, (question, embedding) in enumerate(group)
+        }
+
+    hits_by_question = {}
+    with telemetry.timer("batch_vector_search", timings):
+        for group in groups.values():
+            hits_by_question.update(await run_in_pool(retrieval_executor, search_group, group))
+
+    candidates = {}
+    to_rerank = []
+    for question, embedding in searched:
+        candidates[question], rerank = fuse_candidates(hits_by_question[question], lexical[question])
+        if rerank:
+            to_rerank.append(question)
+
+    # Every question's uncached pairs are scored in one cross-encoder batch
+    if to_rerank:
+        with telemetry.timer("batch_rerank", timings):
+            reranked = await run_in_pool(
+                retrieval_executor,
+                reranker.rerank_many, [(question, candidates[question]) for question in to_rerank], RETRIEVAL_K
+            )
+        candidates.update(zip(to_rerank, reranked))
+
+    for question, embedding in searched:
+        retrieval = "reranked" if question in to_rerank else "hybrid"
+        plans[question] = rag_plan(question, candidates[question], embedding, retrieval, scope=scopes[question])
+
+    return plans
+
+def rag_plan(question, docs, embedding, retrieval, timings=None, scope=None):
+    """Plan for the generation path (scope: the answer cache scope its answer is stored under)"""
+    logger.info(f"Retrieved {len(docs)} documents ({retrieval})")
+
+    with telemetry.timer("prompt_build", timings):
+        prompt = build_prompt(question, docs)
+
+    return {
+        "route": "rag",
+        "cache": "miss",
+        "retrieval": retrieval,
+        "embedding": embedding,
+        "scope": scope,
+        "docs": docs,
+        "sources": [doc.metadata.get("source", "unknown") for doc in docs],
+        "prompt": prompt
+    }
+
+def generate_answer(prompt):
+    """Blocking Ollama generation that records token counts and tokens/sec"""
+    start = time.perf_counter()
+    result = llm.generate([prompt])
+    seconds = time.perf_counter() - start
+
+    generation = result.generations[0][0]
+    info = generation.generation_info or {}
+    # Ollama reports exact counts and decode time; fall back to a word count
+    completion_tokens = info.get("eval_count") or len(generation.text.split())
+    decode_seconds = info["eval_duration"] / 1e9 if info.get("eval_duration") else seconds
+    telemetry.record_generation(completion_tokens, decode_seconds, info.get("prompt_eval_count") or 0)
+    return generation.text
+
+async def stream_tokens(prompt):
+    """Yield LLM tokens from the generation pool as Ollama produces them"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for token in llm.stream(prompt):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, token)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    loop.run_in_executor(generation_executor, produce)
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop generating if the client went away mid-stream
+        cancelled.set()
+
+def flight_key(question):
+    """Coalescing key: the normalised question plus everything that shapes its answer
+
+    Includes the loaded index, so questions arriving after a swap don't join flights on the old one.
+    """
+    return (normalize_question(question), RETRIEVAL_K, HYBRID_CANDIDATES, reranker is not None,
+            LLM_MODEL, CONTEXT_TOKEN_BUDGET, active_index.version, active_index.loaded_at)
+
+async def answer_question(question, timings):
+    """Retrieval + generation for one question - shared by coalesced /query requests"""
+    plan = await retrieve_context(question, timings)
+    if plan["route"] != "rag":
+        return plan, plan["answer"]
+
+    with telemetry.timer("generate", timings):
+        answer = await run_in_pool(generation_executor, generate_answer, plan["prompt"])
+    answer_cache.put(question, answer, plan["sources"], plan["embedding"], plan["scope"])
+    return plan, answer
+
+async def answer_stream(question, timings):
+    """The plan, then answer tokens as Ollama produces them - fanned out to coalesced /query/stream requests"""
+    plan = await retrieve_context(question, timings)
+    yield plan
+    if plan["route"] != "rag":
+        return
+
+    tokens = []
+    generation_start = time.time()
+    first_token_at = None
+    async for token in stream_tokens(plan["prompt"]):
+        if first_token_at is None:
+            first_token_at = time.time()
+            telemetry.observe("time_to_first_token", first_token_at - generation_start, timings)
+        tokens.append(token)
+        yield token
+    telemetry.observe("generate", time.time() - generation_start, timings)
+    # Ollama streams one token per chunk
+    if first_token_at is not None:
+        telemetry.record_generation(len(tokens), time.time() - first_token_at)
+    answer_cache.put(question, "".join(tokens), plan["sources"], plan["embedding"], plan["scope"])
+
+@app.post("/query")
+async def query_documents(query: Query, response: Response, x_request_id: str = Header(None)):
+    request_id = begin_request(x_request_id)
+    response.headers["X-Request-ID"] = request_id
+    require_ready()
+    acquire_query_slot()
+    start_time = time.time()
+    timings = {}
+    query_metrics.inc("total_queries")
+
+    try:
+        # Retrieve and generate - or attach to an identical question already in flight
+        (plan, answer), coalesced = await coalescer.do(
+            flight_key(query.question), lambda: answer_question(query.question, timings)
+        )
+        if coalesced:
+            query_metrics.inc("coalesced_queries")
+            telemetry.observe("coalesced_wait", time.time() - start_time, timings)
 
         # Calculate latency
         latency = time.time() - start_time
-        query_metrics["total_latency"] += latency
+        query_metrics.inc("total_latency", latency)
+        telemetry.observe(f"total_{plan['route']}", latency, timings)
+        if SERVER_TIMING_HEADER:
+            response.headers["Server-Timing"] = server_timing_header(timings)
 
-        logger.info(f"Query completed in {latency:.2f}s")
+        log_request("query", latency, timings, query.question,
+                    route=plan["route"], cache=plan["cache"], coalesced=coalesced)
 
         return {
             "answer": answer,
-            "sources": [doc.metadata.get("source", "unknown") for doc in docs],
-            "latency_seconds": round(latency, 2)
+            "sources": plan["sources"],
+            "latency_seconds": round(latency, 2),
+            "route": plan["route"],
+            "cache": plan["cache"],
+            "coalesced": coalesced
         }
 
     except Exception as e:
-        query_metrics["errors"] += 1
-        logger.error(f"Query failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        query_metrics.inc("errors")
+        log_request("query", time.time() - start_time, timings, query.question, error=e)
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Request-ID": request_id})
+
+    finally:
+        release_query_slot()
+
+@app.post("/query/stream")
+async def query_documents_stream(query: Query, x_request_id: str = Header(None)):
+    """Stream NDJSON events: sources first, then tokens, then a done marker"""
+    request_id = begin_request(x_request_id)
+    require_ready()
+    acquire_query_slot()
+    start_time = time.time()
+    query_metrics.inc("total_queries")
+    query_metrics.inc("streamed_queries")
+    timings = {}
+
+    # Attach to an identical question already streaming, or start it; the plan comes first
+    stream, coalesced = coalescer.stream(flight_key(query.question), lambda: answer_stream(query.question, timings))
+    if coalesced:
+        query_metrics.inc("coalesced_queries")
+    try:
+        plan = await stream.__anext__()
+    except Exception as e:
+        query_metrics.inc("errors")
+        release_query_slot()
+        log_request("query_stream", time.time() - start_time, timings, query.question, error=e)
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Request-ID": request_id})
+    if coalesced:
+        telemetry.observe("coalesced_wait", time.time() - start_time, timings)
+
+    finished = False
+
+    async def finish():
+        """Close the stream and free the slot - once, from the body or the response"""
+        nonlocal finished
+        if not finished:
+            finished = True
+            await stream.aclose()
+            release_query_slot()
+
+    async def events():
+        first_token_at = None
+        try:
+            yield json.dumps({"type": "sources", "sources": plan["sources"]}) + "\n"
+
+            if plan["route"] == "rag":
+                # Late joiners replay the tokens produced so far, then follow live
+                async for token in stream:
+                    if first_token_at is None:
+                        first_token_at = time.time()
+                        query_metrics.inc("total_time_to_first_token", first_token_at - start_time)
+                    yield json.dumps({"type": "token", "content": token}) + "\n"
+            else:
+                query_metrics.inc("total_time_to_first_token", time.time() - start_time)
+                yield json.dumps({"type": "token", "content": plan["answer"]}) + "\n"
+
+            latency = time.time() - start_time
+            query_metrics.inc("total_latency", latency)
+            telemetry.observe(f"total_{plan['route']}", latency)
+            log_request("query_stream", latency, timings, query.question,
+                        route=plan["route"], cache=plan["cache"], coalesced=coalesced,
+                        time_to_first_token_ms=round((first_token_at - start_time) * 1000, 1) if first_token_at else None)
+
+            yield json.dumps({
+                "type": "done",
+                "latency_seconds": round(latency, 2),
+                "route": plan["route"],
+                "cache": plan["cache"],
+                "coalesced": coalesced
+            }) + "\n"
+
+        except Exception as e:
+            query_metrics.inc("errors")
+            log_request("query_stream", time.time() - start_time, timings, query.question, error=e)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+        finally:
+            await finish()
+
+    # Headers go out before generation, so only the retrieval stages are included
+    headers = {"X-Request-ID": request_id}
+    if SERVER_TIMING_HEADER:
+        headers["Server-Timing"] = server_timing_header(timings)
+    return CleanupStreamingResponse(events(), finish, media_type="application/x-ndjson", headers=headers)
+
+@app.post("/query/batch")
+async def query_documents_batch(batch: BatchQuery, response: Response, x_request_id: str = Header(None)):
+    """Answer many questions with shared embedding, retrieval and deduplicated generation
+
+    Returns results in request order, or with stream=true an NDJSON line per
+    question as it finishes (tagged with its index), then a done marker.
+    """
+    request_id = begin_request(x_request_id)
+    response.headers["X-Request-ID"] = request_id
+    require_ready()
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+
+    # One in-flight slot for the whole batch; its generations share the bounded pool
+    acquire_query_slot()
+    start_time = time.time()
+    timings = {}
+    query_metrics.inc("batches")
+    query_metrics.inc("batch_questions", len(batch.questions))
+
+    # Identical questions (after normalisation) are planned and answered once
+    unique = {}
+    for question in batch.questions:
+        unique.setdefault(normalize_question(question), question)
+
+    try:
+        plans = await retrieve_batch(list(unique.values()), timings)
+    except Exception as e:
+        query_metrics.inc("errors")
+        release_query_slot()
+        log_request("query_batch", time.time() - start_time, timings, error=e, questions=len(batch.questions))
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Request-ID": request_id})
+
+    # Identical prompts (same question, same context) are generated once
+    generations = {}
+    failures = []  # indexes of questions whose generation failed
+    semaphore = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+    async def generate(prompt):
+        async with semaphore:
+            query_metrics.inc("batch_generations")
+            with telemetry.timer("generate"):
+                return await run_in_pool(generation_executor, generate_answer, prompt)
+
+    def answer_for(question):
+        plan = plans[question]
+        if plan["route"] != "rag":
+            return plan
+        if plan["prompt"] not in generations:
+            generations[plan["prompt"]] = asyncio.ensure_future(generate(plan["prompt"]))
+        return plan
+
+    async def resolve(index, question):
+        plan = answer_for(unique[normalize_question(question)])
+        result = {
+            "index": index,
+            "question": question,
+            "sources": plan["sources"],
+            "route": plan["route"],
+            "cache": plan["cache"]
+        }
+        try:
+            if plan["route"] == "rag":
+                result["answer"] = await generations[plan["prompt"]]
+                answer_cache.put(question, result["answer"], plan["sources"], plan["embedding"], plan["scope"])
+            else:
+                result["answer"] = plan["answer"]
+        except Exception as e:
+            query_metrics.inc("errors")
+            failures.append(index)
+            logger.error(f"Batch question {index} failed: {str(e)}")
+            result["answer"] = None
+            result["error"] = str(e)
+        return result
+
+    def summary():
+        latency = time.time() - start_time
+        telemetry.observe("total_batch", latency)
+        log_request("query_batch", latency, timings, error=f"{len(failures)} questions failed" if failures else None,
+                    questions=len(batch.questions), unique_questions=len(unique), generations=len(generations),
+                    failed=failures)
+        return {
+            "count": len(batch.questions),
+            "unique_questions": len(unique),
+            "generations": len(generations),
+            "latency_seconds": round(latency, 2)
+        }
+
+    if not batch.stream:
+        try:
+            results = await asyncio.gather(*(resolve(i, q) for i, q in enumerate(batch.questions)))
+            if SERVER_TIMING_HEADER:
+                response.headers["Server-Timing"] = server_timing_header(timings)
+            return {"results": results, **summary()}
+        finally:
+            release_query_slot()
+
+    tasks = []
+    finished = False
+
+    async def finish():
+        """Drop unfinished work and free the slot - once, from the body or the response"""
+        nonlocal finished
+        if not finished:
+            finished = True
+            # Client went away: drop generations that haven't started
+            for task in tasks + list(generations.values()):
+                task.cancel()
+            release_query_slot()
+
+    async def events():
+        tasks.extend(asyncio.ensure_future(resolve(i, q)) for i, q in enumerate(batch.questions))
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps({"type": "result", **(await task)}) + "\n"
+            yield json.dumps({"type": "done", **summary()}) + "\n"
+        finally:
+            await finish()
+
+    headers = {"X-Request-ID": request_id}
+    if SERVER_TIMING_HEADER:
+        headers["Server-Timing"] = server_timing_header(timings)
+    return CleanupStreamingResponse(events(), finish, media_type="application/x-ndjson", headers=headers)
+
+@app.get("/facilities/nearby")
+async def facilities_nearby(
+    lat: float = QueryParam(..., ge=-90, le=90),
+    lon: float = QueryParam(..., ge=-180, le=180),
+    k: int = QueryParam(5, ge=1, le=50),
+    ae_only: bool = False,
+    facility_type: str = QueryParam(None, pattern="^(hosp|sop|fmc)$")
+):
+    """Nearest hospitals / clinics from the precomputed KD-tree (no LLM, no embedding)"""
+    require_ready()
+    geo_index = active_index.geo_index
+    if geo_index is None:
+        raise HTTPException(status_code=503, detail="Geo index not available - run ingest_data.py")
+
+    start_time = time.perf_counter()
+    facilities = geo_index.nearest(
+        lat, lon, k=k, ae_only=ae_only,
+        facility_types=(facility_type,) if facility_type else None
+    )
+
+    return {
+        "facilities": facilities,
+        "lookup_microseconds": round((time.perf_counter() - start_time) * 1e6, 1)
+    }
 
 @app.get("/")
 async def root():
     return {
         "message": "HK Healthcare RAG API is running! 🏥",
         "docs": "/docs",
-        "metrics": "/metrics"
+        "metrics": "/metrics",
+        "ready": startup.ready
     }
 
+@app.get("/live")
+async def live():
+    """Liveness: the process is up and serving (models may still be loading)"""
+    return {"status": "alive", "uptime_seconds": round(time.time() - startup.started_at, 1)}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once warm-up finished, 503 with phase timings until then"""
+    snapshot = startup.snapshot()
+    if not snapshot["ready"]:
+        return JSONResponse(status_code=503, content={"status": "failed" if snapshot["error"] else "starting", **snapshot})
+    return {"status": "ready", **snapshot}
+
 @app.get("/health")
 async def health():
+    require_ready()
     try:
-        doc_count = vectorstore._collection.count()
+        doc_count = active_index.vectorstore._collection.count()
         return {
             "status": "healthy",
             "documents": doc_count,
+            "index_version": active_index.version,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
+@app.post("/admin/reload")
+async def admin_reload(force: bool = False, x_admin_token: str = Header(None)):
+    """Swap to the index version ingest_data.py last published (force reloads the live one too)"""
+    require_ready()
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        # Loading takes seconds - keep it off the event loop and the query pools
+        result = await asyncio.get_running_loop().run_in_executor(None, reload_index, force)
+    except Exception as e:
+        logger.error(f"❌ Index reload failed, still serving version {active_index.version}: {e}")
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving version {active_index.version}: {e}")
+    return result
+
 @app.get("/metrics")
-async def metrics():
+async def metrics(format: str = QueryParam("prometheus", pattern="^(prometheus|json)$")):
+    """Prometheus text by default; ?format=json for the JSON summary"""
+    logs = log_stats.snapshot()
+    if format == "prometheus":
+        cache_stats = answer_cache.snapshot()
+        counters = {
+            "queries_total": ("Queries received (single and streamed)", query_metrics["total_queries"]),
+            "streamed_queries_total": ("Streamed queries received", query_metrics["streamed_queries"]),
+            "errors_total": ("Failed queries", query_metrics["errors"]),
+            "rejected_queries_total": ("Queries rejected with 429", query_metrics["rejected"]),
+            "batches_total": ("Batch requests received", query_metrics["batches"]),
+            "batch_questions_total": ("Questions received in batches", query_metrics["batch_questions"]),
+            "batch_generations_total": ("LLM generations run for batches", query_metrics["batch_generations"]),
+            "context_tokens_total": ("Estimated tokens of context sent to the LLM", query_metrics["context_tokens"]),
+            "context_tokens_saved_total": ("Estimated context tokens removed by merging, dedup and budgeting", query_metrics["context_tokens_saved"]),
+            "coalesced_queries_total": ("Queries answered by attaching to an identical in-flight query", query_metrics["coalesced_queries"]),
+            "filtered_queries_total": ("Queries searched with cluster / facility type / A&E metadata filters", query_metrics["filtered_queries"]),
+            "index_reloads_total": ("Index versions swapped in without a restart", query_metrics["index_reloads"]),
+            "reranked_queries_total": ("Queries whose candidates were cross-encoder reranked", query_metrics["reranked_queries"]),
+            "rerank_skipped_total": ("Queries with a clear top hit that skipped the rerank", query_metrics["rerank_skipped"]),
+            "answer_cache_exact_hits_total": ("Exact answer cache hits", cache_stats["exact_hits"]),
+            "answer_cache_semantic_hits_total": ("Semantic answer cache hits", cache_stats["semantic_hits"]),
+            "answer_cache_misses_total": ("Answer cache misses", cache_stats["misses"]),
+            "requests_logged_total": ("Query records written to the request log", logs["requests_logged"]),
+            "requests_sampled_out_total": ("Successful query records skipped by LOG_SAMPLE_RATE", logs["requests_sampled_out"]),
+            "log_records_dropped_total": ("Log records dropped because the log queue was full", logs["records_dropped"]),
+        }
+        return PlainTextResponse(
+            telemetry.render_prometheus(counters),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     avg_latency = (
         query_metrics["total_latency"] / query_metrics["total_queries"] 
         if query_metrics["total_queries"] > 0 else 0
     )
 
+    avg_ttft = (
+        query_metrics["total_time_to_first_token"] / query_metrics["streamed_queries"]
+        if query_metrics["streamed_queries"] > 0 else 0
+    )
+
     return {
         "total_queries": query_metrics["total_queries"],
         "total_errors": query_metrics["errors"],
         "average_latency_seconds": round(avg_latency, 2),
+        "average_time_to_first_token_seconds": round(avg_ttft, 2),
         "uptime_since": query_metrics["start_time"],
+        "queue_depth": query_metrics["in_flight"],
+        "queue_capacity": MAX_INFLIGHT_QUERIES,
+        "rejected_queries": query_metrics["rejected"],
+        "batches": query_metrics["batches"],
+        "batch_questions": query_metrics["batch_questions"],
+        "batch_generations": query_metrics["batch_generations"],
+        "context_tokens": query_metrics["context_tokens"],
+        "context_tokens_saved": query_metrics["context_tokens_saved"],
+        "coalesced_queries": query_metrics["coalesced_queries"],
+        "filtered_queries": query_metrics["filtered_queries"],
+        "index": {
+            "version": active_index.version if active_index else None,
+            "loaded_at": datetime.fromtimestamp(active_index.loaded_at).isoformat() if active_index else None,
+            "reloads": query_metrics["index_reloads"],
+        },
+        "rerank": {
+            "reranked_queries": query_metrics["reranked_queries"],
+            "skipped": query_metrics["rerank_skipped"],
+            "cache": reranker.snapshot() if reranker is not None else None
+        },
+        "stages": telemetry.stage_summary(),
+        "llm_tokens": telemetry.token_summary(),
+        "answer_cache": answer_cache.snapshot(),
+        "logging": logs,
+        "startup": startup.snapshot(),
         "error_rate": (
             round(query_metrics["errors"] / query_metrics["total_queries"] * 100, 2)
             if query_metrics["total_queries"] > 0 else 0
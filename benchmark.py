@@ -0,0 +1,431 @@
+"""
+Offline Benchmark - retrieval quality and latency of app_local.py, no network needed
+Builds a throwaway Chroma index from data/ with ingest_data.py's chunking, then
+runs a labelled question set through app_local.py with a deterministic fake LLM
+and a hashing embedder (or the real MiniLM with --embedder minilm).
+
+Measures recall@k / MRR against labelled source chunks, throughput, request and
+per-stage latency percentiles, and memory, and writes a JSON report that can be
+diffed between commits:
+
+    python benchmark.py --output benchmarks/results/baseline.json
+    python benchmark.py --chunk-size 500 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")  # keep Chroma offline
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import Generation, LLMResult
+
+from telemetry import Telemetry
+from language import COLLECTIONS, collection_for
+
+QUESTIONS_FILE = "./benchmarks/questions.jsonl"
+DATA_DIR = "./data"
+HASH_DIMENSIONS = 384
+WORD_PATTERN = re.compile(r"[a-z0-9]+|[㐀-鿿]")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words feature hashing - lexical similarity, no model download"""
+
+    def __init__(self, dimensions=HASH_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for token in WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class FakeLLM:
+    """Stand-in for Ollama: fixed answer, paced at a fixed tokens/sec"""
+
+    def __init__(self, tokens=64, tokens_per_second=50.0, prompt_seconds=0.05):
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.prompt_seconds = prompt_seconds
+
+    def _tokens(self, prompt):
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return [f"{seed[i % 64]}{i} " for i in range(self.tokens)]
+
+    def stream(self, prompt):
+        time.sleep(self.prompt_seconds)
+        for token in self._tokens(prompt):
+            time.sleep(1.0 / self.tokens_per_second)
+            yield token
+
+    def invoke(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def generate(self, prompts):
+        generations = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            text = self.invoke(prompt)
+            info = {
+                "eval_count": self.tokens,
+                "eval_duration": int((time.perf_counter() - start - self.prompt_seconds) * 1e9),
+                "prompt_eval_count": len(prompt.split()),
+            }
+            generations.append([Generation(text=text, generation_info=info)])
+        return LLMResult(generations=generations)
+
+
+def load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(values):
+    """Exact p50/p95/p99 of a list of seconds"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(pick(50), 4),
+        "p95": round(pick(95), 4),
+        "p99": round(pick(99), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def label_matches(label, source, content):
+    if os.path.basename(source or "") != label["source"]:
+        return False
+    return label.get("contains") is None or label["contains"].lower() in (content or "").lower()
+
+
+def build_index(index_dir, embeddings, chunk_size, chunk_overlap):
+    """Chunk data/ exactly like ingest_data.py and load it into a fresh Chroma directory"""
+    import ingest_data
+    from langchain_community.vectorstores import Chroma
+
+    ingest_data.CHUNK_SIZE = chunk_size
+    ingest_data.CHUNK_OVERLAP = chunk_overlap
+
+    start = time.perf_counter()
+    chunks = []
+    for path in ingest_data.discover_files(DATA_DIR):
+        chunks.extend(ingest_data.chunk_file(path))
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = [ingest_data.chunk_id(chunk) for chunk in chunks]
+    unique = dict(zip(ids, chunks))
+    # Same per-language collections as ingest_data.py (one embedder for both here)
+    for collection_name in set(COLLECTIONS.values()):
+        items = [(cid, chunk) for cid, chunk in unique.items()
+                 if collection_for(chunk.metadata.get("language", "en")) == collection_name]
+        vectorstore = Chroma(collection_name=collection_name, persist_directory=index_dir, embedding_function=embeddings)
+        for i in range(0, len(items), ingest_data.UPSERT_BATCH_SIZE):
+            batch = items[i:i + ingest_data.UPSERT_BATCH_SIZE]
+            vectorstore._collection.upsert(
+                ids=[cid for cid, _ in batch],
+                embeddings=embeddings.embed_documents([chunk.page_content for _, chunk in batch]),
+                documents=[chunk.page_content for _, chunk in batch],
+                metadatas=[chunk.metadata for _, chunk in batch]
+            )
+
+    return {
+        "chunks": len(unique),
+        "chunk_seconds": round(chunk_seconds, 3),
+        "embed_and_index_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def start_app(index_dir, embeddings, llm, k, vector_store="chroma", rerank=False, coalesce=False):
+    """Import app_local with fakes swapped in, then run its warm-up synchronously
+
+    The cross-encoder is only loaded with rerank=True - it is downloaded from the
+    Hugging Face hub and its latency would be mixed into every other number.
+    Without coalesce, every request gets its own flight key, so concurrent repeats
+    of a question are each computed instead of sharing one computation.
+    """
+    import app_local
+    from answer_cache import AnswerCache
+
+    if vector_store == "snapshot":
+        from index_snapshot import export_all
+        export_all(index_dir)
+    app_local.VECTOR_STORE = vector_store
+    app_local.CHROMA_DIR = index_dir
+    app_local.RETRIEVAL_K = k
+    app_local.load_embeddings = lambda *args: embeddings
+    app_local.OllamaLLM = lambda **kwargs: llm
+    if not rerank:
+        app_local.load_reranker = lambda: None
+    if not coalesce:
+        app_local.flight_key = lambda question: object()
+    app_local.answer_cache = AnswerCache(index_dir=index_dir)
+    app_local.warm_up()
+    if not app_local.startup.ready:
+        raise RuntimeError(f"app_local failed to start: {app_local.startup.error}")
+    reset_telemetry(app_local)
+    return app_local
+
+
+def reset_telemetry(app_local):
+    """Fresh histograms (keeping the registered gauges) so each phase is measured alone"""
+    fresh = Telemetry()
+    fresh.gauges = app_local.telemetry.gauges
+    app_local.telemetry = fresh
+
+
+async def measure_retrieval(app_local, questions, k):
+    """recall@k and MRR of the chunks (or, for direct routes, sources) each question gets"""
+    per_question = []
+    for item in questions:
+        app_local.answer_cache.invalidate()
+        plan = await app_local.retrieve_context(item["question"])
+        if plan.get("docs") is not None:
+            candidates = [(doc.metadata.get("source"), doc.page_content) for doc in plan["docs"][:k]]
+        else:
+            # Direct answers (stats, nearby) quote their table or records, so match labels on the answer
+            candidates = [(source, plan.get("answer")) for source in plan["sources"][:k]]
+
+        labels = item.get("relevant", [])
+        found = [any(label_matches(label, s, c) for s, c in candidates) for label in labels]
+        first_hit = next(
+            (rank for rank, (s, c) in enumerate(candidates, 1) if any(label_matches(l, s, c) for l in labels)),
+            None
+        )
+        per_question.append({
+            "question": item["question"],
+            "route": plan["route"],
+            "recall": round(sum(found) / len(found), 3) if found else None,
+            "reciprocal_rank": round(1.0 / first_hit, 3) if first_hit else 0.0,
+        })
+
+    scored = [q for q in per_question if q["recall"] is not None]
+    routes = {}
+    for q in per_question:
+        routes[q["route"]] = routes.get(q["route"], 0) + 1
+    return {
+        f"recall@{k}": round(sum(q["recall"] for q in scored) / len(scored), 4) if scored else None,
+        "mrr": round(sum(q["reciprocal_rank"] for q in scored) / len(scored), 4) if scored else None,
+        "routes": routes,
+        "per_question": per_question,
+    }
+
+
+async def measure_throughput(app_local, questions, concurrency, repeat, use_cache):
+    """Fire the question set at /query with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app_local.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+        async def one(question):
+            nonlocal errors
+            async with semaphore:
+                if not use_cache:
+                    app_local.answer_cache.invalidate()
+                start = time.perf_counter()
+                response = await client.post("/query", json={"question": question})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        workload = [item["question"] for item in questions] * repeat
+        coalesced_before = app_local.query_metrics["coalesced_queries"]
+        start = time.perf_counter()
+        await asyncio.gather(*(one(question) for question in workload))
+        elapsed = time.perf_counter() - start
+        coalesced = app_local.query_metrics["coalesced_queries"] - coalesced_before
+
+    return {
+        "requests": len(workload),
+        "errors": errors,
+        "coalesced": coalesced,
+        "concurrency": concurrency,
+        "wall_seconds": round(elapsed, 3),
+        "queries_per_second": round(len(workload) / elapsed, 2) if elapsed else 0.0,
+        "latency_seconds": percentiles(latencies),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline_path):
+    """Print headline deltas against an earlier report"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def metric(r, path):
+        for key in path:
+            r = r.get(key) if isinstance(r, dict) else None
+        return r
+
+    k = report["config"]["k"]
+    rows = [
+        (f"recall@{k}", ("retrieval", f"recall@{k}"), True),
+        ("mrr", ("retrieval", "mrr"), True),
+        ("queries/sec", ("throughput", "queries_per_second"), True),
+        ("latency p50 (s)", ("throughput", "latency_seconds", "p50"), False),
+        ("latency p95 (s)", ("throughput", "latency_seconds", "p95"), False),
+        ("peak traced MB", ("memory", "traced_peak_mb"), False),
+    ]
+    print(f"\n📊 vs {baseline_path} ({baseline['meta'].get('commit')}):")
+    for name, path, higher_is_better in rows:
+        old, new = metric(baseline, path), metric(report, path)
+        if old is None or new is None:
+            continue
+        delta = new - old
+        better = (delta > 0) == higher_is_better if delta else None
+        mark = "✅" if better else "⚠️" if better is False else "  "
+        print(f"  {mark} {name:<18} {old:>10} -> {new:<10} ({delta:+.4g})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval/latency benchmark for app_local.py")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4, help="Documents retrieved per question")
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "minilm"])
+    parser.add_argument("--vector-store", default="chroma", choices=["chroma", "snapshot"],
+                        help="Serve from Chroma or from an exported mmap snapshot")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the question set")
+    parser.add_argument("--use-cache", action="store_true", help="Let repeats hit the answer cache")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="Let concurrent identical questions share one computation (inflates throughput)")
+    parser.add_argument("--rerank", action="store_true",
+                        help="Load the cross-encoder reranker (downloads it; needs sentence-transformers)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Earlier report to diff against")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if args.embedder == "minilm":
+        from startup import load_embeddings
+        embeddings = load_embeddings()
+    else:
+        embeddings = HashingEmbeddings()
+    llm = FakeLLM(tokens=args.llm_tokens, tokens_per_second=args.llm_tokens_per_second)
+
+    print(f"🧪 Benchmarking {len(questions)} questions (embedder: {args.embedder}, k={args.k})")
+    index_dir = tempfile.mkdtemp(prefix="bench_chroma_")
+    tracemalloc.start()
+    try:
+        index = build_index(index_dir, embeddings, args.chunk_size, args.chunk_overlap)
+        print(f"📚 Indexed {index['chunks']} chunks in {index['embed_and_index_seconds']}s")
+
+        start = time.perf_counter()
+        app_local = start_app(index_dir, embeddings, llm, args.k, args.vector_store, args.rerank, args.coalesce)
+        startup_seconds = time.perf_counter() - start
+
+        retrieval = asyncio.run(measure_retrieval(app_local, questions, args.k))
+        print(f"🎯 recall@{args.k}: {retrieval[f'recall@{args.k}']}  MRR: {retrieval['mrr']}")
+
+        reset_telemetry(app_local)  # stages from the throughput run only
+        throughput = asyncio.run(
+            measure_throughput(app_local, questions, args.concurrency, args.repeat, args.use_cache)
+        )
+        print(f"⚡ {throughput['queries_per_second']} queries/s, "
+              f"p50 {throughput['latency_seconds']['p50']}s, p95 {throughput['latency_seconds']['p95']}s, "
+              f"{throughput['coalesced']} coalesced")
+
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "questions": len(questions),
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "k": args.k,
+            "embedder": args.embedder,
+            "vector_store": args.vector_store,
+            "llm_tokens": args.llm_tokens,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "use_cache": args.use_cache,
+            "rerank": args.rerank,
+            "coalesce": args.coalesce,
+        },
+        "index": index,
+        "startup_seconds": round(startup_seconds, 3),
+        "retrieval": retrieval,
+        "throughput": throughput,
+        "stages": app_local.telemetry.stage_summary(),
+        "llm_tokens": app_local.telemetry.token_summary(),
+        "memory": {
+            "traced_peak_mb": round(traced_peak / 1e6, 2),
+            # ru_maxrss is KB on Linux, bytes on macOS
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                                / (1e6 if platform.system() == "Darwin" else 1e3), 2),
+        },
+    }
+
+    print("\n⏱️ Stage latency (p50 / p95 / p99 ms):")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<22} {stats['p50'] * 1000:8.1f} {stats['p95'] * 1000:8.1f} {stats['p99'] * 1000:8.1f}")
+    print(f"\n🧠 Peak traced memory: {report['memory']['traced_peak_mb']} MB, "
+          f"max RSS: {report['memory']['max_rss_mb']} MB")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Report written to {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
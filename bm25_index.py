@@ -0,0 +1,159 @@
+"""
+BM25 Index - in-process inverted index over the same chunks as chroma_db
+Exact-term lookups (facility names, districts) that dense MiniLM/Cohere
+embeddings rank poorly. Built by ingest_data.py and saved next to chroma_db.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from query_filters import MetadataIndex
+
+BM25_INDEX_FILE = "bm25_index.json"
+BM25_INDEX_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[㐀-鿿]")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "many", "much", "of", "on", "or", "tell", "that", "the",
+    "there", "this", "to", "was", "what", "when", "where", "which", "who", "with", "about",
+    "any", "can", "give", "list", "show", "all", "hk", "hong", "kong",
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with plural 's' stripped; CJK text is indexed per character"""
+    tokens = []
+    for token in WORD_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, with the chunks stored for direct return"""
+
+    def __init__(self, ids, texts, metadatas, doc_lengths, postings, k1=BM25_K1, b=BM25_B):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.doc_lengths = doc_lengths
+        self.postings = postings  # term -> [[doc index, term frequency], ...]
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.idf = {
+            term: math.log(1 + (len(ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+        # cluster / facility type / A&E rows, for filtered searches
+        self.metadata_index = MetadataIndex(metadatas)
+
+    @classmethod
+    def build(cls, chunks):
+        """Build from an iterable of (id, text, metadata)"""
+        ids, texts, metadatas, doc_lengths = [], [], [], []
+        postings = {}
+
+        for index, (chunk_id, text, metadata) in enumerate(chunks):
+            tokens = tokenize(text)
+            ids.append(chunk_id)
+            texts.append(text)
+            metadatas.append(metadata or {})
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([index, tf])
+
+        return cls(ids, texts, metadatas, doc_lengths, postings)
+
+    @classmethod
+    def from_collection(cls, collection, page_size=1000):
+        """Build from every chunk in a Chroma collection, paging through it"""
+        def pages():
+            offset = 0
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                if not page["ids"]:
+                    return
+                yield from zip(page["ids"], page["documents"], page["metadatas"])
+                offset += len(page["ids"])
+
+        return cls.build(pages())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != BM25_INDEX_VERSION:
+            raise ValueError(f"Unsupported BM25 index version in {path}")
+        return cls(data["ids"], data["texts"], data["metadatas"], data["doc_lengths"],
+                   data["postings"], data["k1"], data["b"])
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": BM25_INDEX_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=10, rows=None):
+        """Top-k (Document, score) pairs for the query, optionally only among the given rows"""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                if rows is not None and index not in rows:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / self.avg_length)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.document(index), score) for index, score in top]
+
+    def document(self, index):
+        return Document(id=self.ids[index], page_content=self.texts[index], metadata=self.metadatas[index])
+
+    def coverage(self, query, document):
+        """IDF-weighted share of the query's terms present in the document (0..1)"""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        max_idf = max(self.idf.values(), default=1.0)
+        doc_terms = set(tokenize(document.page_content))
+        # Terms the corpus has never seen count at full weight - they can't be matched
+        total = sum(self.idf.get(term, max_idf) for term in terms)
+        matched = sum(self.idf[term] for term in terms if term in doc_terms and term in self.idf)
+        return matched / total if total else 0.0
+
+
+def load_bm25_index(index_dir, collection=None):
+    """Load the saved index, or build it from the Chroma collection if it's missing"""
+    path = os.path.join(index_dir, BM25_INDEX_FILE)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    if collection is not None:
+        return BM25Index.from_collection(collection)
+    return None
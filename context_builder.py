@@ -0,0 +1,160 @@
+"""
+Context Builder - token-budgeted prompt context from retrieved chunks
+Shared by app_local.py and app.py.
+
+- Adjacent / overlapping chunks of the same document (start_index metadata) are
+  merged, so the CHUNK_OVERLAP text appears once
+- Duplicate chunks (e.g. the same facility in the hospital and SOP files) are dropped
+- Bilingual records keep only the lines in the question's language
+  (English, Traditional or Simplified Chinese)
+- The result is packed, in retrieval order, into a per-model token budget
+"""
+
+import os
+import re
+
+from language import CJK_PATTERN, detect_language
+
+# Rough per-model context budgets (tokens) - small local models get less to read
+CONTEXT_TOKEN_BUDGETS = {
+    "llama3.2:3b": 1200,
+    "command-r7b-12-2024": 2000,
+    "command-r-08-2024": 3000,
+    "command-r-plus-08-2024": 4000,
+}
+DEFAULT_TOKEN_BUDGET = 1500
+CONTEXT_TOKEN_BUDGET = os.environ.get("CONTEXT_TOKEN_BUDGET")  # overrides the per-model value
+MIN_TRUNCATED_TOKENS = 40  # don't bother packing a fragment smaller than this
+
+
+def budget_for(model_name):
+    """Token budget for a model, overridable with CONTEXT_TOKEN_BUDGET"""
+    if CONTEXT_TOKEN_BUDGET:
+        return int(CONTEXT_TOKEN_BUDGET)
+    return CONTEXT_TOKEN_BUDGETS.get(model_name, DEFAULT_TOKEN_BUDGET)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: ~4 characters per token, one token per CJK character"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def filter_language(text, language):
+    """Drop lines written in another language; untagged ('zh') lines count as either script"""
+    lines = text.split("\n")
+    if len({detect_language(line) for line in lines if line.strip()}) <= 1:
+        return text  # monolingual - nothing to drop
+
+    def keep(line):
+        if not line.strip():
+            return True
+        line_language = detect_language(line)
+        if language == "en":
+            return line_language == "en"
+        return line_language == language or "zh" in (line_language, language) and line_language != "en"
+
+    kept = [line for line in lines if keep(line)]
+    # Never filter a chunk down to nothing - better the wrong language than no context
+    return "\n".join(kept) if any(line.strip() for line in kept) else text
+
+
+def _overlap(left, right, expected):
+    """Length of the suffix of `left` that starts `right`, checking `expected` first"""
+    if 0 < expected <= min(len(left), len(right)) and left.endswith(right[:expected]):
+        return expected
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_adjacent(docs):
+    """Merge chunks of the same document whose start_index ranges touch or overlap
+
+    Returns [(rank, text, metadata)] where rank is the best retrieval rank in the group.
+    """
+    groups = {}
+    merged = []
+    for rank, doc in enumerate(docs):
+        start = doc.metadata.get("start_index")
+        if start is None:
+            merged.append((rank, doc.page_content, doc.metadata))
+            continue
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        groups.setdefault(key, []).append((int(start), rank, doc))
+
+    for chunks in groups.values():
+        chunks.sort(key=lambda item: item[0])
+        start, rank, doc = chunks[0]
+        text, end, metadata = doc.page_content, start + len(doc.page_content), doc.metadata
+        for next_start, next_rank, next_doc in chunks[1:]:
+            if next_start <= end:
+                overlap = _overlap(text, next_doc.page_content, end - next_start)
+                text += next_doc.page_content[overlap:]
+                end = max(end, next_start + len(next_doc.page_content))
+                rank = min(rank, next_rank)
+            else:
+                merged.append((rank, text, metadata))
+                text, end, metadata, rank = next_doc.page_content, next_start + len(next_doc.page_content), next_doc.metadata, next_rank
+        merged.append((rank, text, metadata))
+
+    merged.sort(key=lambda item: item[0])
+    return merged
+
+
+def _truncate(text, max_tokens):
+    """Cut text to roughly max_tokens at a line or sentence boundary"""
+    kept = []
+    used = 0
+    for piece in re.split(r"(?<=[\n.。])", text):
+        cost = estimate_tokens(piece)
+        if used + cost > max_tokens:
+            break
+        kept.append(piece)
+        used += cost
+    return "".join(kept).strip()
+
+
+def build_context(question, docs, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Deduplicated, language-filtered context packed into the token budget
+
+    Returns {"context", "docs_used", "tokens_before", "tokens_after", "tokens_saved"},
+    where tokens_before is the naive join of every page_content.
+    """
+    naive = "\n\n".join(doc.page_content for doc in docs)
+    tokens_before = estimate_tokens(naive)
+    language = detect_language(question)
+
+    sections = []
+    seen_lines = []  # line sets of the sections already kept
+    used = 0
+    for _, text, _ in merge_adjacent(docs):
+        text = filter_language(text, language).strip()
+        lines = {line.strip() for line in text.split("\n") if line.strip()}
+        if not lines or any(lines <= earlier for earlier in seen_lines):
+            continue  # duplicate of something already in the context
+
+        cost = estimate_tokens(text)
+        if used + cost > token_budget:
+            remaining = token_budget - used
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = _truncate(text, remaining)
+                if text:
+                    sections.append(text)
+                    used += estimate_tokens(text)
+            break
+
+        sections.append(text)
+        seen_lines.append(lines)
+        used += cost
+
+    context = "\n\n".join(sections)
+    tokens_after = estimate_tokens(context)
+    return {
+        "context": context,
+        "docs_used": len(sections),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+    }
@@ -0,0 +1,266 @@
+"""
+Structured Data Loaders - HK facility JSON and healthstat CSV tables
+Each record becomes its own document, so nothing is split mid-record.
+
+- facility-*.json: JSON array of Hospital Authority facilities (hospital / SOP / FMC)
+- healthstat_*.csv: UTF-16, tab-separated Department of Health statistic tables
+
+Files are streamed: JSON arrays are decoded one element at a time and CSV tables
+row by row, so memory stays constant regardless of file size.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Iterator
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+FACILITY_GLOB = "facility-*.json"
+HEALTHSTAT_GLOB = "healthstat_*.csv"
+
+FACILITY_TYPES = {
+    "hosp": "Hospital",
+    "sop": "Specialist Outpatient Clinic",
+    "fmc": "Family Medicine Clinic",
+}
+
+# Field suffix, facility type names and line labels for each document language
+FACILITY_LANGUAGES = {
+    "en": {
+        "suffix": "eng",
+        "types": FACILITY_TYPES,
+        "labels": ("Cluster: ", "Address: ", "A&E service: "),
+    },
+    "zh-hant": {
+        "suffix": "tc",
+        "types": {"hosp": "醫院", "sop": "專科門診", "fmc": "家庭醫學診所"},
+        "labels": ("聯網：", "地址：", "急症室服務："),
+    },
+    "zh-hans": {
+        "suffix": "sc",
+        "types": {"hosp": "医院", "sop": "专科门诊", "fmc": "家庭医学诊所"},
+        "labels": ("联网：", "地址：", "急症室服务："),
+    },
+}
+
+YEAR_PATTERN = re.compile(r"^(19|20)\d{2}$")
+FOOTNOTE_PATTERN = re.compile(r"\s*\((\d+|[a-z])\)")
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        buffer = buffer[1:]
+
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+
+            if buffer.startswith("]"):
+                return
+            if not buffer and eof:
+                raise ValueError(f"{path}: unexpected end of JSON array")
+
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Element is split across reads - pull in more text
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buffer += more
+                continue
+
+            yield item
+            buffer = buffer[end:]
+
+
+def facility_type_from_path(path):
+    """facility-hosp.json -> 'hosp'"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.split("-", 1)[-1]
+
+
+def iter_facility_records(path):
+    """Yield facility dicts with their facility type attached"""
+    facility_type = facility_type_from_path(path)
+    for record in iter_json_array(path):
+        yield {**record, "facility_type": facility_type}
+
+
+def facility_metadata(record, source):
+    """Flat, Chroma-compatible metadata for one facility record"""
+    metadata = {
+        "source": source,
+        "record_type": "facility",
+        "facility_type": record["facility_type"],
+        "institution": record.get("institution_eng", ""),
+        "cluster": record.get("cluster_eng", ""),
+        "address": record.get("address_eng", ""),
+        "latitude": float(record["latitude"]),
+        "longitude": float(record["longitude"]),
+    }
+    # Only hospitals carry an A&E flag
+    if "with_AE_service_eng" in record:
+        metadata["with_ae"] = record["with_AE_service_eng"].strip().lower() == "yes"
+    return metadata
+
+
+def facility_text(record, language="en"):
+    """Readable text for one facility record in one language (English, Traditional or Simplified)"""
+    spec = FACILITY_LANGUAGES[language]
+    suffix = spec["suffix"]
+    cluster_label, address_label, ae_label = spec["labels"]
+    label = spec["types"].get(record["facility_type"], "Facility")
+    # Chinese fields can be blank - fall back to the English value rather than an empty line
+    name = record.get(f"institution_{suffix}") or record.get("institution_eng", "")
+    lines = [
+        f"{name} ({label})" if language == "en" else f"{name}（{label}）",
+        f"{cluster_label}{record.get(f'cluster_{suffix}') or record.get('cluster_eng', '')}",
+        f"{address_label}{record.get(f'address_{suffix}') or record.get('address_eng', '')}",
+    ]
+    if "with_AE_service_eng" in record:
+        lines.append(f"{ae_label}{record.get(f'with_AE_service_{suffix}') or record['with_AE_service_eng']}")
+
+    return "\n".join(lines)
+
+
+class FacilityJSONLoader(BaseLoader):
+    """One Document per facility record and language in a facility-*.json file"""
+
+    def __init__(self, file_path, languages=tuple(FACILITY_LANGUAGES)):
+        self.file_path = file_path
+        self.languages = languages
+
+    def lazy_load(self) -> Iterator[Document]:
+        for record in iter_facility_records(self.file_path):
+            metadata = facility_metadata(record, self.file_path)
+            for language in self.languages:
+                yield Document(
+                    page_content=facility_text(record, language),
+                    metadata={**metadata, "language": language}
+                )
+
+
+def clean_label(label):
+    """Strip footnote markers: 'Mid-year population ('000)(a)' -> "Mid-year population ('000)" """
+    return FOOTNOTE_PATTERN.sub("", label).strip()
+
+
+def parse_stat_value(value):
+    """'7 524' -> 7524.0, '' -> None"""
+    value = value.replace(" ", "").replace(",", "")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def iter_healthstat_rows(path):
+    """Yield one dict per (indicator row, year) cell of a healthstat table
+
+    Rows are read one at a time. Indicators with sub-series (e.g. 'Hospital beds'
+    Series A/B, life expectancy Male/Female) carry the series label separately.
+    Footnotes listed under 'Notes' are yielded last as record_type 'note'.
+    """
+    title = None
+    unit = ""
+    years = None  # [(column index, year)]
+    indicator = None
+    section = "header"
+
+    with open(path, encoding="utf-16", newline="") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            cells = [cell.strip() for cell in row]
+            if not any(cells):
+                continue
+            first = cells[0]
+
+            if title is None:
+                title = " ".join(first.split())
+                continue
+
+            if first == "Notes":
+                section = "notes"
+                continue
+            if first == "Sources":
+                section = "sources"
+                continue
+
+            if section == "notes":
+                note_id = first.rstrip(".")
+                text = next((cell for cell in cells[1:] if cell), "")
+                if text:
+                    yield {"record_type": "note", "table": title, "note": note_id, "text": text}
+                continue
+            if section == "sources":
+                continue
+
+            if years is None:
+                year_cells = [(i, int(cell)) for i, cell in enumerate(cells) if YEAR_PATTERN.match(cell)]
+                if len(year_cells) >= 2:
+                    years = year_cells
+                elif len([cell for cell in cells if cell]) == 1:
+                    # Lone header cell like "(per 1 000 population)"
+                    unit = next(cell for cell in cells if cell)
+                continue
+
+            if first:
+                indicator = first
+            if indicator is None:
+                continue
+            series = next((cell for cell in cells[1:years[0][0]] if cell), "")
+
+            for column, year in years:
+                raw = cells[column] if column < len(cells) else ""
+                if not raw:
+                    continue
+                yield {
+                    "record_type": "statistic",
+                    "table": title,
+                    "indicator": clean_label(indicator),
+                    "series": clean_label(series),
+                    "unit": unit,
+                    "year": year,
+                    "value": raw,
+                    "numeric_value": parse_stat_value(raw),
+                    "footnotes": ",".join(FOOTNOTE_PATTERN.findall(indicator + series)),
+                }
+
+
+def healthstat_text(row):
+    """'Table 1. Health Care Resources - Hospital beds, Series A (per 1 000 population), 2024: 4.9'"""
+    if row["record_type"] == "note":
+        return f"{row['table']} - Note {row['note']}: {row['text']}"
+
+    label = row["indicator"]
+    if row["series"]:
+        label += f", {row['series']}"
+    if row["unit"]:
+        label += f" {row['unit']}"
+    return f"{row['table']} - {label}, {row['year']}: {row['value']}"
+
+
+class HealthStatCSVLoader(BaseLoader):
+    """One Document per indicator and year of a healthstat_*.csv table"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def lazy_load(self) -> Iterator[Document]:
+        for row in iter_healthstat_rows(self.file_path):
+            metadata = {"source": self.file_path, "language": "en"}
+            metadata.update({
+                key: value for key, value in row.items()
+                if value is not None and key != "text"
+            })
+            yield Document(page_content=healthstat_text(row), metadata=metadata)
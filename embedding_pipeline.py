@@ -0,0 +1,281 @@
+"""
+Embedding Pipeline - batched, rate-limited embedding with checkpoint/resume
+Used by ingest_data.py to stay under Cohere's free-tier limits.
+
+- Texts are embedded in fixed-size batches, several batches in flight at once
+- A token bucket caps request rate (e.g. 100 requests/minute)
+- 429 / rate-limit errors are retried with exponential backoff (honouring Retry-After)
+- Every finished batch is appended to a JSONL checkpoint keyed by chunk id,
+  so a rerun after a failure only embeds what is still missing
+- embed_stream() consumes chunks as an upstream stage produces them and yields
+  each finished batch, so no stage holds the whole corpus in memory
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "96"))  # Cohere accepts up to 96 texts per call
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "2"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate_per_minute` tokens refill continuously up to `capacity`"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 10.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_seconds = (tokens - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class EmbeddingHTTPError(Exception):
+    """HTTP error from an embedding endpoint, carrying status and Retry-After"""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class HTTPEmbeddings(Embeddings):
+    """Minimal client for a JSON embedding endpoint: POST {"texts": [...]} -> {"embeddings": [...]}
+
+    Used with fake_embedding_server.py to exercise the pipeline without Cohere.
+    """
+
+    def __init__(self, endpoint, timeout=30):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def embed_documents(self, texts):
+        response = self.session.post(self.endpoint, json={"texts": texts}, timeout=self.timeout)
+        if response.status_code != 200:
+            retry_after = response.headers.get("Retry-After")
+            raise EmbeddingHTTPError(
+                response.status_code,
+                response.text[:200],
+                float(retry_after) if retry_after else None
+            )
+        return response.json()["embeddings"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def is_rate_limit_error(error):
+    """Recognise 429s from Cohere's SDK, requests/httpx, or our HTTP client"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def retry_after_seconds(error):
+    """Server-suggested wait, if the error carries one"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("Retry-After") if hasattr(headers, "get") else None
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def embed_batch(embeddings, texts, limiter, max_retries=EMBED_MAX_RETRIES, backoff=EMBED_BACKOFF_SECONDS):
+    """Embed one batch, retrying rate-limit errors with exponential backoff + jitter"""
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            delay = retry_after_seconds(e) or backoff * (2 ** attempt)
+            delay += random.uniform(0, delay * 0.1)
+            print(f"  ⏳ Rate limited - retrying batch in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+class EmbeddingCheckpoint:
+    """Append-only JSONL of finished embeddings, keyed by chunk id
+
+    The first line records which embedding model produced the vectors; a checkpoint
+    from a different model is discarded rather than mixed in. Only each record's
+    file offset is kept in memory - vectors are read back on demand.
+    """
+
+    def __init__(self, path, model_id):
+        self.path = path
+        self.model_id = model_id
+        self.offsets = {}  # chunk id -> byte offset of its record
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                header = _read_json_line(f)
+                if header is None or header.get("embedding_model") != model_id:
+                    print(f"  ⚠️ Ignoring checkpoint from a different embedding model: {path}")
+                    end = 0
+                else:
+                    end = f.tell()
+                    while True:
+                        record = _read_json_line(f)
+                        if record is None:
+                            break
+                        self.offsets[record["id"]] = end
+                        end = f.tell()
+            # Cut any torn tail so new batches append cleanly
+            if end:
+                os.truncate(path, end)
+            else:
+                os.remove(path)
+
+    def __contains__(self, cid):
+        return cid in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, cid):
+        with self.lock, open(self.path, "rb") as f:
+            f.seek(self.offsets[cid])
+            return _read_json_line(f)["embedding"]
+
+    def add(self, ids, vectors):
+        """Persist a finished batch before it is counted as done"""
+        with self.lock:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "ab") as f:
+                if new_file:
+                    f.write((json.dumps({"embedding_model": self.model_id}) + "\n").encode("utf-8"))
+                for cid, vector in zip(ids, vectors):
+                    self.offsets[cid] = f.tell()
+                    f.write((json.dumps({"id": cid, "embedding": vector}) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """Remove the checkpoint once its embeddings are safely in the vector store"""
+        with self.lock:
+            self.offsets = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _read_json_line(f):
+    """Next JSON record, or None at EOF or on a torn line from an interrupted write"""
+    line = f.readline()
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def embed_stream(embedders, items, checkpoint, batch_size=EMBED_BATCH_SIZE,
+                 requests_per_minute=EMBED_REQUESTS_PER_MINUTE, max_in_flight=EMBED_MAX_IN_FLIGHT):
+    """Embed (group, chunk id, text, payload) items as they arrive; yields (group, batch, vectors)
+
+    `embedders` maps each group (e.g. an index language) to its Embeddings. Items
+    are only pulled while a batch slot is free, so a slow embedding API holds the
+    producer back instead of letting chunks pile up. Chunks already in the
+    checkpoint are yielded with their saved vectors. If a batch ultimately fails,
+    the error is raised after in-flight batches finish, and everything completed
+    so far stays in the checkpoint for the next run.
+    """
+    limiter = TokenBucket(requests_per_minute, capacity=max_in_flight)
+    source = iter(items)
+    exhausted = False
+    pending = {}  # group -> items waiting for a full batch
+    restored = {}  # group -> checkpointed items waiting to be yielded
+    start = time.time()
+    done = resumed = 0
+    failure = None
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed") as executor:
+        in_flight = {}
+
+        while True:
+            # Keep up to max_in_flight batches running, pulling items only as needed
+            while failure is None and len(in_flight) < max_in_flight:
+                group = next((g for g, queued in pending.items() if len(queued) >= batch_size or (exhausted and queued)), None)
+                if group is not None:
+                    batch, pending[group] = pending[group][:batch_size], pending[group][batch_size:]
+                    future = executor.submit(embed_batch, embedders[group], [text for _, text, _ in batch], limiter)
+                    in_flight[future] = (group, batch)
+                    continue
+                if exhausted:
+                    break
+
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    continue
+                group, cid, text, payload = item
+                queue = restored if cid in checkpoint else pending
+                queue.setdefault(group, []).append((cid, text, payload))
+                if queue is restored and len(restored[group]) >= batch_size:
+                    break  # yield it before pulling more
+
+            for group, queued in restored.items():
+                while len(queued) >= batch_size or (exhausted and queued):
+                    batch, queued[:] = queued[:batch_size], queued[batch_size:]
+                    resumed += len(batch)
+                    yield group, batch, [checkpoint.get(cid) for cid, _, _ in batch]
+
+            if not in_flight:
+                if exhausted or failure is not None:
+                    break
+                continue
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                group, batch = in_flight.pop(future)
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    failure = failure or e
+                    continue
+                checkpoint.add([cid for cid, _, _ in batch], vectors)
+                done += len(batch)
+                rate = done / max(time.time() - start, 1e-6)
+                print(f"  ✅ {done} embedded ({rate:.1f} chunks/s)")
+                yield group, batch, vectors
+
+    if resumed:
+        print(f"  ♻️ Resumed: {resumed} embeddings restored from checkpoint")
+    if failure is not None:
+        print(f"  💾 {len(checkpoint)} embeddings saved to {checkpoint.path} - rerun to resume")
+        raise failure
@@ -0,0 +1,61 @@
+"""
+Export all-MiniLM-L6-v2 as an int8-quantised ONNX model for app_local.py
+Run once at build time (e.g. in the Docker image) so containers load the
+small, pre-serialised model instead of downloading and converting on start.
+
+    python export_embedding_model.py --output ./models/minilm-onnx
+    EMBEDDING_MODEL=./models/minilm-onnx EMBEDDING_BACKEND=onnx \
+        EMBEDDING_ONNX_FILE=onnx/model_qint8_avx2.onnx uvicorn app_local:app
+
+Requires: pip install "sentence-transformers[onnx]"
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+SAMPLE_SENTENCES = [
+    "Which hospitals in Kowloon have A&E services?",
+    "Life expectancy at birth in Hong Kong, 2023",
+    "Queen Mary Hospital, 102 Pok Fu Lam Road, Hong Kong",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a quantised ONNX embedding model")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output", default="./models/minilm-onnx")
+    parser.add_argument("--config", default="avx2", choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+                        help="Quantisation target - match the CPUs you deploy on")
+    args = parser.parse_args()
+
+    print(f"📦 Exporting {args.model} to ONNX...")
+    model = SentenceTransformer(args.model, backend="onnx")
+    model.save_pretrained(args.output)
+
+    print(f"🔢 Quantising to int8 ({args.config})...")
+    export_dynamic_quantized_onnx_model(model, args.config, args.output)
+    onnx_file = f"onnx/model_qint8_{args.config}.onnx"
+
+    # Quantisation should barely move the vectors - check before shipping it
+    reference = SentenceTransformer(args.model)
+    start = time.perf_counter()
+    quantised = SentenceTransformer(args.output, backend="onnx", model_kwargs={"file_name": onnx_file})
+    load_seconds = time.perf_counter() - start
+
+    expected = reference.encode(SAMPLE_SENTENCES, normalize_embeddings=True)
+    actual = quantised.encode(SAMPLE_SENTENCES, normalize_embeddings=True)
+    similarity = float(np.min(np.sum(expected * actual, axis=1)))
+
+    size_mb = os.path.getsize(os.path.join(args.output, onnx_file)) / 1e6
+    print(f"\n✅ Saved {onnx_file} in {args.output} ({size_mb:.1f} MB, loads in {load_seconds:.2f}s)")
+    print(f"📐 Min cosine similarity vs. float model: {similarity:.4f}")
+    print("\n🚀 Use it with:")
+    print(f"  EMBEDDING_MODEL={args.output} EMBEDDING_BACKEND=onnx EMBEDDING_ONNX_FILE={onnx_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Fake Embedding Server - local stand-in for the Cohere embed API
+Deterministic hash-based vectors, with an optional rate limit that answers 429,
+so the ingestion pipeline can be exercised offline.
+
+Usage:
+    python fake_embedding_server.py --port 8765 --rate-limit 100
+    EMBEDDING_ENDPOINT=http://localhost:8765/embed python ingest_data.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text, dimensions=384):
+    """Deterministic unit vector derived from the text's SHA-256"""
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2**31 for v in struct.unpack("<8i", digest))
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+class RateWindow:
+    """Fixed one-minute window request counter"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return 0 if allowed, else seconds until the window resets"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.count = 0
+            if self.limit and self.count >= self.limit:
+                return 60 - (now - self.window_start)
+            self.count += 1
+            return 0
+
+
+def make_handler(window, dimensions, latency):
+    class EmbedHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/embed":
+                self.send_error(404)
+                return
+
+            wait_seconds = window.allow()
+            if wait_seconds:
+                self.send_response(429)
+                self.send_header("Retry-After", str(math.ceil(wait_seconds)))
+                self.end_headers()
+                self.wfile.write(b"rate limit exceeded")
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if latency:
+                time.sleep(latency)
+
+            payload = json.dumps({
+                "embeddings": [fake_embedding(text, dimensions) for text in body["texts"]]
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet
+
+    return EmbedHandler
+
+
+def serve(port=8765, rate_limit=0, dimensions=384, latency=0.0):
+    """Start the server in a background thread and return it"""
+    window = RateWindow(rate_limit)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(window, dimensions, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake embedding server for offline ingestion tests")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limit", type=int, default=100, help="Requests per minute (0 = unlimited)")
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to each request")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.rate_limit, args.dimensions, args.latency)
+    print(f"🧪 Fake embedding server on http://127.0.0.1:{args.port}/embed "
+          f"({args.rate_limit or 'unlimited'} req/min)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,37 @@
+import os
 import streamlit as st
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.environ.get("API_URL", "http://localhost:8000")
+API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "10"))  # keep-alive connections to the API
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "5"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "60"))  # between streamed chunks
+HEALTH_CACHE_SECONDS = int(os.environ.get("HEALTH_CACHE_SECONDS", "5"))
+
+@st.cache_resource
+def get_session():
+    """One keep-alive connection pool shared by every rerun and browser session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=API_POOL_SIZE,
+        # Retry connection failures only - never replay a question mid-answer
+        max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.2, allowed_methods=["GET"])
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=HEALTH_CACHE_SECONDS)
+def api_status():
+    """Readiness status code, cached so reruns don't hit the API every time"""
+    try:
+        return get_session().get(f"{API_URL}/ready", timeout=(API_CONNECT_TIMEOUT, 2)).status_code
+    except requests.RequestException:
+        return None
 
 # Page config
 st.set_page_config(
@@ -33,14 +64,28 @@ with st.sidebar:
     """)
 
     # API status check
-    try:
-        response = requests.get("http://localhost:8000/")
-        if response.status_code == 200:
-            st.success("✅ API Connected")
-        else:
-            st.error("❌ API Error")
-    except:
+    status = api_status()
+    if status == 200:
+        st.success("✅ API Connected")
+    elif status == 503:
+        st.warning("⏳ API starting up...")
+    elif status is None:
         st.error("❌ API Offline")
+    else:
+        st.error("❌ API Error")
+
+def stream_answer(response, sources):
+    """Yield answer tokens from the NDJSON stream, collecting sources on the way"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        event = json.loads(line)
+        if event["type"] == "sources":
+            sources.extend(event["sources"])
+        elif event["type"] == "token":
+            yield event["content"]
+        elif event["type"] == "error":
+            raise RuntimeError(event["detail"])
 
 # Chat interface
 if "messages" not in st.session_state:
@@ -64,20 +109,21 @@ if prompt := st.chat_input("Ask a question about HK healthcare..."):
 
     # Get bot response
     with st.chat_message("assistant"):
-        with st.spinner("Searching documents..."):
-            try:
-                response = requests.post(
-                    "http://localhost:8000/query",
+        try:
+            with st.spinner("Searching documents..."):
+                # (connect, read) timeout - read applies between streamed chunks
+                response = get_session().post(
+                    f"{API_URL}/query/stream",
                     json={"question": prompt},
-                    timeout=30
+                    stream=True,
+                    timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
                 )
 
+            # Closing the response hands the connection back to the pool
+            with response:
                 if response.status_code == 200:
-                    data = response.json()
-                    answer = data["answer"]
-                    sources = data.get("sources", [])
-
-                    st.markdown(answer)
+                    sources = []
+                    answer = st.write_stream(stream_answer(response, sources))
 
                     # Show sources
                     if sources:
@@ -94,9 +140,9 @@ if prompt := st.chat_input("Ask a question about HK healthcare..."):
                 else:
                     st.error(f"Error: {response.status_code}")
 
-            except Exception as e:
-                st.error(f"Connection error: {str(e)}")
-                st.info("Make sure the API is running: `uvicorn app:app --port 8000`")
+        except Exception as e:
+            st.error(f"Connection error: {str(e)}")
+            st.info("Make sure the API is running: `uvicorn app:app --port 8000`")
 
 # Footer
 st.divider()
@@ -0,0 +1,299 @@
+"""
+Facility Geo Index - nearest hospital / clinic lookups without the LLM
+Built at ingest time from the facility-*.json coordinates and saved next to chroma_db.
+
+The index is a static KD-tree stored implicitly in array order (median split,
+alternating axes), over coordinates projected to kilometres around Hong Kong.
+A small gazetteer of place names - taken from facility addresses, plus the 18
+districts and common areas - lets questions like "nearest A&E to Chai Wan"
+resolve to coordinates offline. Names match regardless of spacing, so
+"Sha Tin" finds the addresses' "Shatin" and "Mongkok" finds "Mong Kok".
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+
+from data_loaders import FACILITY_TYPES, iter_facility_records
+
+GEO_INDEX_FILE = "facility_geo_index.json"
+GEO_INDEX_VERSION = 1
+
+EARTH_RADIUS_KM = 6371.0
+REFERENCE_LATITUDE = 22.35  # Hong Kong - keeps the flat projection accurate to metres
+
+# Not "around" - "hospitals around Kowloon" asks what is in a region, not a distance ranking
+NEARBY_PATTERN = re.compile(r"\b(nearest|closest|near|nearby|close to)\b", re.IGNORECASE)
+AE_PATTERN = re.compile(r"\b(a\s*&\s*e|a and e|accident and emergency|emergency)\b", re.IGNORECASE)
+# District / area name -> approximate centroid; covers names facility addresses spell
+# differently or never mention. Address-derived places take precedence.
+DISTRICT_PLACES = {
+    "Central and Western": (22.2820, 114.1450), "Wan Chai": (22.2760, 114.1750),
+    "Eastern District": (22.2830, 114.2250), "Southern District": (22.2470, 114.1580),
+    "Yau Tsim Mong": (22.3110, 114.1700), "Sham Shui Po": (22.3303, 114.1622),
+    "Kowloon City": (22.3282, 114.1916), "Wong Tai Sin": (22.3419, 114.1953),
+    "Kwun Tong": (22.3133, 114.2257), "Kwai Tsing": (22.3540, 114.1260),
+    "Tsuen Wan": (22.3711, 114.1139), "Tuen Mun": (22.3908, 113.9725),
+    "Yuen Long": (22.4445, 114.0222), "North District": (22.4940, 114.1380),
+    "Tai Po": (22.4505, 114.1641), "Sha Tin": (22.3817, 114.1886),
+    "Sai Kung": (22.3814, 114.2705), "Islands District": (22.2611, 113.9461),
+    "Mong Kok": (22.3193, 114.1694), "Tsim Sha Tsui": (22.2976, 114.1722),
+    "Yau Ma Tei": (22.3120, 114.1706), "Causeway Bay": (22.2803, 114.1838),
+    "Admiralty": (22.2790, 114.1650), "Kowloon Tong": (22.3370, 114.1760),
+    "Tseung Kwan O": (22.3075, 114.2600), "Tung Chung": (22.2890, 113.9411),
+    "Ma On Shan": (22.4250, 114.2320), "Tai Wai": (22.3726, 114.1787),
+    "Tin Shui Wai": (22.4600, 114.0030), "Kwai Chung": (22.3634, 114.1313),
+}
+TYPE_PATTERNS = [
+    (("hosp",), re.compile(r"\bhospitals?\b", re.IGNORECASE)),
+    (("sop",), re.compile(r"\b(specialist|sop|soc)\b", re.IGNORECASE)),
+    (("fmc",), re.compile(r"\b(family medicine|gopc|general out-?patient)\b", re.IGNORECASE)),
+    (("sop", "fmc"), re.compile(r"\bclinics?\b", re.IGNORECASE)),
+]
+
+
+def project(lat, lon):
+    """Equirectangular projection to km (fine at city scale)"""
+    x = math.radians(lon) * EARTH_RADIUS_KM * math.cos(math.radians(REFERENCE_LATITUDE))
+    y = math.radians(lat) * EARTH_RADIUS_KM
+    return x, y
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _layout_kdtree(points, depth=0):
+    """Reorder points so each [lo, hi) range has its median split point at the middle"""
+    if len(points) <= 1:
+        return points
+    axis = depth % 2
+    points = sorted(points, key=lambda p: p["xy"][axis])
+    mid = len(points) // 2
+    return _layout_kdtree(points[:mid], depth + 1) + [points[mid]] + _layout_kdtree(points[mid + 1:], depth + 1)
+
+
+def address_places(address):
+    """Place-name components of an address: '3 Lok Man Road, Chai Wan, HK' -> ['Chai Wan']"""
+    places = []
+    for part in address.split(","):
+        part = part.strip()
+        # Floors like 'G/F' and 'LG' aren't places
+        if len(part) < 3 or "/" in part or any(ch.isdigit() for ch in part):
+            continue
+        if part.upper() not in ("HK", "HONG KONG", "KLN", "NT", "N.T."):
+            places.append(part)
+    return places
+
+
+def place_key(name):
+    """Spacing- and case-insensitive key: 'Sha Tin', 'Shatin' and 'sha-tin' -> 'shatin'"""
+    return re.sub(r"[\s-]+", "", name.lower())
+
+
+def _place_regex(key):
+    """Match a place key with any spacing / hyphens between its characters"""
+    return r"[\s-]*".join(re.escape(ch) for ch in key)
+
+
+class FacilityGeoIndex:
+    """Static KD-tree over facility coordinates with a place-name gazetteer"""
+
+    def __init__(self, points, places):
+        self.points = points  # KD layout order
+        self.places = places  # lowercase place name -> (lat, lon)
+        # Looked up by spacing-insensitive key; districts fill in what addresses lack
+        self._place_coords = {}
+        for name, coords in places.items():
+            self._place_coords.setdefault(place_key(name), coords)
+        for name, coords in DISTRICT_PLACES.items():
+            self._place_coords.setdefault(place_key(name), coords)
+        self._place_pattern = None
+        if self._place_coords:
+            keys = sorted(self._place_coords, key=len, reverse=True)  # longest match wins
+            self._place_pattern = re.compile(r"\b(" + "|".join(_place_regex(k) for k in keys) + r")\b", re.IGNORECASE)
+
+    @classmethod
+    def build(cls, facility_files):
+        """Build from facility-*.json files"""
+        points = []
+        place_coords = {}
+
+        for path in facility_files:
+            for record in iter_facility_records(path):
+                lat, lon = float(record["latitude"]), float(record["longitude"])
+                points.append({
+                    "name": record.get("institution_eng", ""),
+                    "name_tc": record.get("institution_tc", ""),
+                    "facility_type": record["facility_type"],
+                    "cluster": record.get("cluster_eng", ""),
+                    "address": record.get("address_eng", ""),
+                    "with_ae": record.get("with_AE_service_eng", "").strip().lower() == "yes",
+                    "latitude": lat,
+                    "longitude": lon,
+                    "source": path,
+                    "xy": project(lat, lon),
+                })
+                for place in address_places(record.get("address_eng", "")):
+                    place_coords.setdefault(place.lower(), []).append((lat, lon))
+                place_coords.setdefault(record.get("institution_eng", "").lower(), []).append((lat, lon))
+
+        # A place's location is the centroid of the facilities that mention it
+        places = {
+            name: (sum(c[0] for c in coords) / len(coords), sum(c[1] for c in coords) / len(coords))
+            for name, coords in place_coords.items() if name
+        }
+        return cls(_layout_kdtree(points), places)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != GEO_INDEX_VERSION:
+            raise ValueError(f"Unsupported geo index version in {path}")
+        for point in data["points"]:
+            point["xy"] = tuple(point["xy"])
+        return cls(data["points"], {name: tuple(c) for name, c in data["places"].items()})
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": GEO_INDEX_VERSION, "points": self.points, "places": self.places},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, lat, lon, k=5, ae_only=False, facility_types=None):
+        """k nearest facilities to (lat, lon), optionally A&E-only or limited to some types"""
+        target = project(lat, lon)
+        heap = []  # max-heap of (-dist2, index) holding the best k so far
+        in_heap = set()  # (name, lat, lon) of the heap entries
+
+        def identity(point):
+            # A hospital listed in several facility files is one result
+            return point["name"].lower(), point["latitude"], point["longitude"]
+
+        def accept(point):
+            if ae_only and not point["with_ae"]:
+                return False
+            if identity(point) in in_heap:
+                return False
+            return facility_types is None or point["facility_type"] in facility_types
+
+        def search(lo, hi, depth):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            point = self.points[mid]
+            axis = depth % 2
+            dx = target[0] - point["xy"][0]
+            dy = target[1] - point["xy"][1]
+
+            if accept(point):
+                dist2 = dx * dx + dy * dy
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist2, mid))
+                    in_heap.add(identity(point))
+                elif dist2 < -heap[0][0]:
+                    _, evicted = heapq.heapreplace(heap, (-dist2, mid))
+                    in_heap.discard(identity(self.points[evicted]))
+                    in_heap.add(identity(point))
+
+            diff = dx if axis == 0 else dy
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(near[0], near[1], depth + 1)
+            # Only cross the split plane if it is closer than the current k-th best
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                search(far[0], far[1], depth + 1)
+
+        search(0, len(self.points), 0)
+
+        results = []
+        for _, index in sorted(heap, reverse=True):
+            point = self.points[index]
+            result = {key: value for key, value in point.items() if key != "xy"}
+            result["distance_km"] = round(haversine_km(lat, lon, point["latitude"], point["longitude"]), 2)
+            results.append(result)
+        return results
+
+    def find_place(self, text):
+        """Resolve the longest known place or facility name in the text to (name, lat, lon)"""
+        if self._place_pattern is None:
+            return None
+        match = self._place_pattern.search(text)
+        if not match:
+            return None
+        name = match.group(1)
+        lat, lon = self._place_coords[place_key(name)]
+        return name, lat, lon
+
+
+def answer_nearby_question(question, index, k=3):
+    """Answer 'nearest X to <place>' questions from the geo index, or None if it isn't one"""
+    if index is None or not NEARBY_PATTERN.search(question):
+        return None
+
+    place = index.find_place(question)
+    if place is None:
+        return None
+    name, lat, lon = place
+
+    # Look for the facility type outside the place name ("clinics near Queen Mary Hospital")
+    rest = re.sub(re.escape(name), " ", question, flags=re.IGNORECASE)
+    ae_only = bool(AE_PATTERN.search(rest))
+    facility_types = None
+    for types, pattern in TYPE_PATTERNS:
+        if pattern.search(rest):
+            facility_types = types
+            break
+    if ae_only:
+        facility_types = ("hosp",)  # only hospitals run A&E
+
+    facilities = [f for f in index.nearest(lat, lon, k=k + 1, ae_only=ae_only, facility_types=facility_types)
+                  if place_key(f["name"]) != place_key(name)][:k]
+    if not facilities:
+        return None
+
+    if ae_only:
+        label = "A&E hospitals"
+    elif facility_types and len(facility_types) == 1:
+        label = FACILITY_TYPES[facility_types[0]] + "s"
+    elif facility_types:
+        label = "clinics"
+    else:
+        label = "facilities"
+    lines = [f"Nearest {label} to {name}:"]
+    for i, facility in enumerate(facilities, 1):
+        lines.append(f"{i}. {facility['name']} - {facility['address']} ({facility['distance_km']} km)")
+
+    return {
+        "answer": "\n".join(lines),
+        "sources": sorted({facility["source"] for facility in facilities}),
+        "facilities": facilities,
+        "place": name
+    }
+
+
+def load_geo_index(index_dir, data_dir="./data"):
+    """Load the saved index, or build it from data/ if ingestion hasn't written one yet"""
+    path = os.path.join(index_dir, GEO_INDEX_FILE)
+    if os.path.exists(path):
+        return FacilityGeoIndex.load(path)
+
+    facility_files = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(data_dir)
+        for name in names if name.startswith("facility-") and name.endswith(".json")
+    )
+    if not facility_files:
+        return None
+    return FacilityGeoIndex.build(facility_files)
@@ -0,0 +1,199 @@
+"""
+Index Registry - versioned index directories behind an atomic CURRENT pointer
+Written by ingest_data.py, followed by app_local.py and app.py.
+
+    chroma_db/
+      CURRENT                      # name of the live version
+      versions/<version>/          # Chroma, BM25, geo index, snapshot, ingest manifest
+        version.json               # when and from what it was built
+      embedding_checkpoint.jsonl   # survives failed runs, so they resume
+
+Ingestion copies the live version into a new directory, applies its changes
+there and only then replaces CURRENT, so readers never see a half-written
+index. Servers notice the new CURRENT, load the version next to the old one
+and swap; queries already running finish on the version they started with.
+Retired versions are deleted once INDEX_GRACE_SECONDS have passed.
+
+A chroma_db/ without CURRENT is a pre-versioning index and is served as is.
+
+Usage:
+    python index_registry.py list
+    python index_registry.py activate <version>   # roll back / forward
+    python index_registry.py gc
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+
+from index_snapshot import SNAPSHOT_DIR
+
+# Configuration
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+VERSION_FILE = "version.json"
+RETIRED_FILE = "RETIRED"  # written into a version when CURRENT moves off it
+INDEX_GRACE_SECONDS = float(os.environ.get("INDEX_GRACE_SECONDS", "600"))  # retired versions live this long
+INDEX_KEEP_VERSIONS = int(os.environ.get("INDEX_KEEP_VERSIONS", "0"))  # retired versions never collected (rollback)
+# Root-level files that belong to the registry, not to an index version
+REGISTRY_FILES = {CURRENT_FILE, CURRENT_FILE + ".tmp", VERSIONS_DIR, "embedding_checkpoint.jsonl"}
+
+
+def current_version(root):
+    """Name of the live version, or None for an unversioned (legacy) index"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(root, version):
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def current_index_dir(root):
+    """Directory of the live index: the CURRENT version, else the root itself"""
+    version = current_version(root)
+    return version_dir(root, version) if version else root
+
+
+def list_versions(root):
+    """Version names, oldest first (names sort by creation time)"""
+    path = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def read_version_info(root, version):
+    try:
+        with open(os.path.join(version_dir(root, version), VERSION_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def new_version(root, copy=True):
+    """Create the next version directory; returns (version, path)
+
+    With copy=True it starts as a copy of the live index (without its snapshot,
+    which is re-exported), so incremental ingestion only applies the changes.
+    """
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = version_dir(root, version)
+    source = current_index_dir(root)
+
+    if copy and os.path.isdir(source):
+        skip = REGISTRY_FILES | {SNAPSHOT_DIR}
+        shutil.copytree(source, path, ignore=lambda directory, names: [
+            name for name in names if directory == source and name in skip
+        ])
+    else:
+        os.makedirs(path)
+    return version, path
+
+
+def discard_version(root, version):
+    """Remove a version that was never published (e.g. a failed ingestion)"""
+    if version != current_version(root):
+        shutil.rmtree(version_dir(root, version), ignore_errors=True)
+
+
+def publish(root, version, info=None):
+    """Make version live: record its info, retire the previous one and replace CURRENT atomically
+
+    Returns the previous version (None for a first or legacy index).
+    """
+    path = version_dir(root, version)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No index version {version} in {root}")
+
+    info = {**read_version_info(root, version), **(info or {}), "version": version}
+    info.setdefault("created_at", time.time())
+    info["published_at"] = time.time()
+    with open(os.path.join(path, VERSION_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=1)
+    # Re-publishing a retired version (rollback) makes it live again
+    retired = os.path.join(path, RETIRED_FILE)
+    if os.path.exists(retired):
+        os.remove(retired)
+
+    previous = current_version(root)
+    tmp_path = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+    if previous and previous != version and os.path.isdir(version_dir(root, previous)):
+        with open(os.path.join(version_dir(root, previous), RETIRED_FILE), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+    return previous
+
+
+def retired_at(root, version):
+    """When CURRENT moved off this version (None if it is live or never published)"""
+    try:
+        with open(os.path.join(version_dir(root, version), RETIRED_FILE), encoding="utf-8") as f:
+            return float(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def collect_garbage(root, grace_seconds=INDEX_GRACE_SECONDS, keep=INDEX_KEEP_VERSIONS):
+    """Delete retired versions older than the grace period, keeping the newest `keep`
+
+    Unpublished versions are left alone - they may be an ingestion still running.
+    Returns the deleted version names.
+    """
+    live = current_version(root)
+    retired = sorted(
+        ((retired_at(root, version), version) for version in list_versions(root) if version != live),
+        key=lambda item: item[0] or 0, reverse=True
+    )
+    retired = [(when, version) for when, version in retired if when is not None]
+
+    removed = []
+    now = time.time()
+    for when, version in retired[keep:]:
+        if now - when >= grace_seconds:
+            shutil.rmtree(version_dir(root, version), ignore_errors=True)
+            removed.append(version)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List, activate or garbage-collect index versions")
+    parser.add_argument("command", choices=["list", "activate", "gc"])
+    parser.add_argument("version", nargs="?", help="Version to activate")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    args = parser.parse_args()
+    root = args.persist_directory
+
+    if args.command == "activate":
+        if not args.version:
+            parser.error("activate needs a version")
+        previous = publish(root, args.version)
+        print(f"✅ {args.version} is live (was {previous or 'unversioned'})")
+        return
+
+    if args.command == "gc":
+        removed = collect_garbage(root)
+        print(f"🗑️ Removed {len(removed)} retired versions: {', '.join(removed) or '-'}")
+        return
+
+    live = current_version(root)
+    if live is None:
+        print(f"ℹ️ {root} is not versioned yet (the next ingestion creates the first version)")
+    for version in list_versions(root):
+        info = read_version_info(root, version)
+        state = "live" if version == live else "retired" if retired_at(root, version) else "unpublished"
+        print(f"{'👉' if version == live else '  '} {version}  {state:<11}  "
+              f"{info.get('chunks', '?')} chunks  {info.get('embedding_model', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Index Snapshot - immutable, memory-mapped export of a Chroma collection
+Written by ingest_data.py (or `python index_snapshot.py`) and attached by app_local.py.
+
+Every uvicorn/gunicorn worker that opens Chroma loads its own copy of the HNSW
+segment and metadata. A snapshot is a read-only directory of flat files that
+workers np.load / mmap instead, so N workers share one page-cached copy and
+attaching takes milliseconds:
+
+    chroma_db/snapshot/<collection>/
+        manifest.json            count, dimension, dtype, created
+        vectors.npy              (n, d) float16 or float32 matrix
+        norms.npy                squared row norms (float32) for L2 distances
+        ids.*, documents.*,      UTF-8 string tables: one blob + int64 offsets
+        metadatas.*              (metadata rows are JSON)
+        hnsw.bin                 HNSW graph, only for collections too big for exact search
+        sq8_* / pq<M>_*          optional quantised codes (see quantization.py)
+
+Search is exact (blocked matrix products over the shared matrix) up to
+SNAPSHOT_EXACT_LIMIT vectors; hnswlib loads its graph into private memory, so
+it is only worth it for much larger collections. With SNAPSHOT_QUANTIZATION the
+scan runs over int8 / PQ codes and only the shortlist is rescored exactly.
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+from langchain_core.documents import Document
+
+from quantization import build_quantizer, load_quantizer, save_quantizer, shortlist_search
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SNAPSHOT_DIR = "snapshot"  # inside the Chroma persist directory
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DTYPE = os.environ.get("SNAPSHOT_DTYPE", "float16")  # float16 halves memory; float32 is exact
+SNAPSHOT_EXACT_LIMIT = int(os.environ.get("SNAPSHOT_EXACT_LIMIT", "200000"))  # above this, export an HNSW graph
+SNAPSHOT_QUANTIZATION = os.environ.get("SNAPSHOT_QUANTIZATION", "")  # "", sq8 or pq<M> (e.g. pq48)
+SEARCH_BLOCK_ROWS = 8192  # rows per matrix product - bounds the float32 temporary
+EXPORT_PAGE_SIZE = 1000
+
+
+def snapshot_path(persist_directory, collection_name):
+    return os.path.join(persist_directory, SNAPSHOT_DIR, collection_name)
+
+
+def snapshot_exists(persist_directory, collection_name):
+    return os.path.exists(os.path.join(snapshot_path(persist_directory, collection_name), "manifest.json"))
+
+
+def where_matches(metadata, where):
+    """Evaluate a Chroma-style `where` clause ($eq/$ne/$in/$nin/$gt/$gte/$lt/$lte, $and/$or)"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(where_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(where_matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > expected:
+                        return False
+                    if op == "$gte" and not value >= expected:
+                        return False
+                    if op == "$lt" and not value < expected:
+                        return False
+                    if op == "$lte" and not value <= expected:
+                        return False
+    return True
+
+
+def write_string_table(directory, name, strings):
+    """One UTF-8 blob plus an offsets array, so rows are sliced straight out of the mmap"""
+    offsets = [0]
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for value in strings:
+            encoded = value.encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+
+class StringTable:
+    """Read-only, memory-mapped string table written by write_string_table"""
+
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+        with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])].decode("utf-8")
+
+
+def export_snapshot(collection, persist_directory, dtype=SNAPSHOT_DTYPE, quantization=SNAPSHOT_QUANTIZATION):
+    """Write an immutable snapshot of a Chroma collection and swap it into place"""
+    start = time.perf_counter()
+    target = snapshot_path(persist_directory, collection.name)
+    tmp_dir = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ids, documents, metadatas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset,
+                              include=["embeddings", "documents", "metadatas"])
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        vectors.extend(page["embeddings"])
+        offset += len(page["ids"])
+
+    # Norms come from the stored (possibly float16) values so distances stay consistent
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1).astype(dtype).astype(np.float32)
+    np.save(os.path.join(tmp_dir, "vectors.npy"), matrix.astype(dtype))
+    np.save(os.path.join(tmp_dir, "norms.npy"), np.einsum("ij,ij->i", matrix, matrix))
+    write_string_table(tmp_dir, "ids", ids)
+    write_string_table(tmp_dir, "documents", [document or "" for document in documents])
+    write_string_table(tmp_dir, "metadatas", [json.dumps(metadata or {}, ensure_ascii=False) for metadata in metadatas])
+
+    hnsw = len(ids) > SNAPSHOT_EXACT_LIMIT and _write_hnsw(tmp_dir, matrix)
+    if quantization and len(ids):
+        save_quantizer(build_quantizer(quantization, matrix), tmp_dir)
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": SNAPSHOT_VERSION,
+            "collection": collection.name,
+            "count": len(ids),
+            "dimension": int(matrix.shape[1]) if len(ids) else 0,
+            "dtype": dtype,
+            "hnsw": bool(hnsw),
+            "quantization": quantization or None,
+            "created": datetime.now().isoformat(),
+        }, f, indent=1)
+
+    # Swap directories; workers still attached to the old files keep their mappings
+    old_dir = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, old_dir)
+    os.replace(tmp_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    sizes = {name: os.path.getsize(os.path.join(target, name)) for name in os.listdir(target)}
+    size_mb = sum(sizes.values()) / 1e6
+    vectors_mb = (sizes["vectors.npy"] + sizes["norms.npy"]) / 1e6
+    codes_mb = sum(size for name, size in sizes.items() if name.startswith(("sq8_", "pq"))) / 1e6
+    # Quantised snapshots keep the float vectors for rescoring, so both count towards the mapped footprint
+    breakdown = f"vectors {vectors_mb:.1f} MB" + (f" + codes {codes_mb:.1f} MB" if quantization else "")
+    print(f"🧊 Snapshot '{collection.name}': {len(ids)} vectors ({dtype}{', ' + quantization if quantization else ''}), "
+          f"{size_mb:.1f} MB on disk ({breakdown}) in {time.perf_counter() - start:.2f}s")
+    return target
+
+
+def _write_hnsw(directory, matrix):
+    try:
+        import hnswlib
+    except ImportError:
+        print("  ⚠️ hnswlib not installed - snapshot will use exact search")
+        return False
+    index = hnswlib.Index(space="l2", dim=matrix.shape[1])
+    index.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+    index.add_items(matrix, np.arange(len(matrix)))
+    index.save_index(os.path.join(directory, "hnsw.bin"))
+    return True
+
+
+class SnapshotCollection:
+    """Read-only stand-in for the parts of a Chroma collection the apps use (count/get/query)"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {directory}")
+
+        self.name = self.manifest["collection"]
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(directory, "norms.npy"), mmap_mode="r")
+        self.ids = StringTable(directory, "ids")
+        self.documents = StringTable(directory, "documents")
+        self.metadatas = StringTable(directory, "metadatas")
+        self._filters = {}  # where clause (as JSON) -> row indices
+        self.quantizer = load_quantizer(directory)
+
+        self.hnsw = None
+        if self.manifest.get("hnsw"):
+            import hnswlib
+            self.hnsw = hnswlib.Index(space="l2", dim=self.manifest["dimension"])
+            self.hnsw.load_index(os.path.join(directory, "hnsw.bin"))
+            self.hnsw.set_ef(100)
+
+    def count(self):
+        return len(self.ids)
+
+    def metadata(self, index):
+        return json.loads(self.metadatas[index])
+
+    def filter_rows(self, where):
+        """Row indices matching a where clause (cached per clause)"""
+        key = json.dumps(where, sort_keys=True)
+        rows = self._filters.get(key)
+        if rows is None:
+            rows = np.asarray([i for i in range(self.count()) if where_matches(self.metadata(i), where)], dtype=np.int64)
+            self._filters[key] = rows
+        return rows
+
+    def search(self, embedding, k, where=None):
+        """[(row, squared L2 distance)] nearest first - Chroma's default distance"""
+        query = np.asarray(embedding, dtype=np.float32)
+        rows = self.filter_rows(where) if where else None
+        if self.hnsw is not None and rows is None:
+            labels, distances = self.hnsw.knn_query(query, k=min(k, self.count()))
+            return list(zip(labels[0].tolist(), distances[0].tolist()))
+
+        total = self.count() if rows is None else len(rows)
+        if total == 0:
+            return []
+        if self.quantizer is not None:
+            return shortlist_search(self.quantizer, self.vectors, self.norms, query, k, rows)
+        distances = np.empty(total, dtype=np.float32)
+        query_norm = float(query @ query)
+        for block in range(0, total, SEARCH_BLOCK_ROWS):
+            index = slice(block, block + SEARCH_BLOCK_ROWS)
+            selected = index if rows is None else rows[index]
+            distances[index] = self.norms[selected] - 2.0 * (self.vectors[selected] @ query) + query_norm
+
+        k = min(k, total)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(int(i if rows is None else rows[i]), max(float(distances[i]), 0.0)) for i in top]
+
+    def _row(self, index, include):
+        row = {"id": self.ids[index]}
+        if "documents" in include:
+            row["document"] = self.documents[index]
+        if "metadatas" in include:
+            row["metadata"] = self.metadata(index)
+        if "embeddings" in include:
+            row["embedding"] = np.asarray(self.vectors[index], dtype=np.float32)
+        return row
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        if ids is not None:
+            wanted = set(ids)
+            indices = [i for i in range(self.count()) if self.ids[i] in wanted]
+        else:
+            indices = self.filter_rows(where).tolist() if where else range(self.count())
+            indices = list(indices)[offset:offset + limit if limit is not None else None]
+        rows = [self._row(i, include) for i in indices]
+        result = {"ids": [row["id"] for row in rows]}
+        for name in ("documents", "metadatas", "embeddings"):
+            if name in include:
+                result[name] = [row[name[:-1]] for row in rows]
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for embedding in query_embeddings:
+            hits = self.search(embedding, n_results, where)
+            result["ids"].append([self.ids[i] for i, _ in hits])
+            result["documents"].append([self.documents[i] for i, _ in hits])
+            result["metadatas"].append([self.metadata(i) for i, _ in hits])
+            result["distances"].append([distance for _, distance in hits])
+        return result
+
+
+class SnapshotVectorStore:
+    """The LangChain vector store calls app_local.py makes, served from a snapshot"""
+
+    def __init__(self, collection, embedding_function=None):
+        self._collection = collection
+        self.embeddings = embedding_function
+
+    def _document(self, index):
+        return Document(
+            id=self._collection.ids[index],
+            page_content=self._collection.documents[index],
+            metadata=self._collection.metadata(index)
+        )
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return [(self._document(i), distance) for i, distance in self._collection.search(embedding, k, filter)]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, filter)
+
+
+def load_snapshot(persist_directory, collection_name, embedding_function=None):
+    """Attach to a snapshot (zero-copy), or None if none has been exported"""
+    if not snapshot_exists(persist_directory, collection_name):
+        return None
+    collection = SnapshotCollection(snapshot_path(persist_directory, collection_name))
+    return SnapshotVectorStore(collection, embedding_function)
+
+
+def export_all(persist_directory, dtype=SNAPSHOT_DTYPE, quantization=SNAPSHOT_QUANTIZATION):
+    """Snapshot every collection in a Chroma persist directory"""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    for entry in client.list_collections():
+        export_snapshot(client.get_collection(getattr(entry, "name", entry)), persist_directory, dtype, quantization)
+
+
+def main():
+    from index_registry import collect_garbage, discard_version, new_version, publish  # imports this module
+
+    parser = argparse.ArgumentParser(description="Export read-only, mmap-able snapshots of the Chroma collections")
+    parser.add_argument("--persist-directory", default="./chroma_db",
+                        help="Index root (the live version is copied, re-exported and published)")
+    parser.add_argument("--dtype", default=SNAPSHOT_DTYPE, choices=["float16", "float32"])
+    parser.add_argument("--quantization", default=SNAPSHOT_QUANTIZATION, help="sq8 or pq<M>; see quantization.py")
+    args = parser.parse_args()
+    root = args.persist_directory
+
+    # Published versions are immutable: export into a copy of the live one and publish that
+    version, index_dir = new_version(root)
+    print(f"🆕 Exporting into index version {version}")
+    try:
+        export_all(index_dir, args.dtype, args.quantization)
+    except Exception as e:
+        print(f"❌ Snapshot export failed: {e}")
+        discard_version(root, version)
+        raise
+    previous = publish(root, version, {
+        "created_at": time.time(),
+        "snapshot": {"dtype": args.dtype, "quantization": args.quantization or None},
+    })
+    print(f"🔀 Published {version} (previous: {previous or 'unversioned'})")
+    collect_garbage(root)
+
+
+if __name__ == "__main__":
+    main()
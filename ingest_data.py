@@ -2,66 +2,97 @@
 Data Ingestion Script - Create Chroma Vector Database
 Uses Cohere FREE embeddings - NO CREDIT CARD NEEDED!
 Run this locally BEFORE deploying to Streamlit Cloud
+
+Ingestion is incremental: a manifest in chroma_db/ records a content hash for
+every source file and every chunk, so re-runs only embed new or changed chunks
+and delete vectors whose source chunks disappeared.
+
+Chunks are tagged with their language: English goes to the default collection,
+Traditional / Simplified Chinese to a second one with a multilingual embedder.
+
+Changed files are parsed and split by a pool of worker processes and streamed
+straight into embedding and upserting, so only a bounded number of files'
+chunks is in memory at any time, whatever the corpus size.
+
+Each run that changes anything writes a new index version (index_registry.py):
+the live version is copied, the changes are applied to the copy and it is
+published atomically, so running servers swap to it without a restart.
 """
 
 import os
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader, TextLoader
+import fnmatch
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_cohere import CohereEmbeddings
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
+from data_loaders import FACILITY_GLOB, HEALTHSTAT_GLOB, FacilityJSONLoader, HealthStatCSVLoader
+from embedding_pipeline import EmbeddingCheckpoint, HTTPEmbeddings, embed_stream
+from geo_index import GEO_INDEX_FILE, FacilityGeoIndex
+from bm25_index import BM25_INDEX_FILE, BM25Index
+from language import COLLECTIONS, detect_language, index_language
+from index_snapshot import SNAPSHOT_DIR, export_all
+from index_registry import collect_garbage, current_index_dir, discard_version, new_version, publish
 
 load_dotenv()
 
 # Configuration
 DATA_DIR = "./data"  # Put your healthcare PDFs/TXTs here
-CHROMA_DIR = "./chroma_db"
+CHROMA_DIR = "./chroma_db"  # registry root - each index version lives in its own directory below
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+EMBEDDING_MODEL = "embed-english-light-v3.0"
+ZH_EMBEDDING_MODEL = "embed-multilingual-light-v3.0"  # same 384 dimensions, understands Chinese
+# Queries must be embedded with the model the index was built with:
+# cohere for app.py, local (app_local.py's MiniLM / multilingual MiniLM) for app_local.py
+INGEST_EMBEDDINGS = os.getenv("INGEST_EMBEDDINGS", "cohere")  # cohere | local
+if INGEST_EMBEDDINGS == "local":
+    from startup import EMBEDDING_MODEL as LOCAL_EMBEDDING_MODEL, ZH_EMBEDDING_MODEL as LOCAL_ZH_EMBEDDING_MODEL
+    EMBEDDING_MODELS = {"en": LOCAL_EMBEDDING_MODEL, "zh": LOCAL_ZH_EMBEDDING_MODEL}
+else:
+    EMBEDDING_MODELS = {"en": EMBEDDING_MODEL, "zh": ZH_EMBEDDING_MODEL}
+EMBEDDING_ENDPOINT = os.getenv("EMBEDDING_ENDPOINT")  # e.g. fake_embedding_server.py for offline runs
+EMBEDDING_ID = EMBEDDING_ENDPOINT or f"{EMBEDDING_MODELS['en']}+{EMBEDDING_MODELS['zh']}"
+MANIFEST_FILE = "ingest_manifest.json"
+MANIFEST_VERSION = 3  # 2: per-language facility documents and collections, 3: language in chunk ids
+CHECKPOINT_PATH = os.path.join(CHROMA_DIR, "embedding_checkpoint.jsonl")  # outside the versions, so failed runs resume
+UPSERT_BATCH_SIZE = 1000
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))  # parser processes (1 = in-process)
+PARSE_PREFETCH = 2  # files parsed ahead per worker - bounds chunks waiting for the embedder
 
-def load_documents(data_dir):
-    """Load documents from directory"""
-    print(f"📂 Loading documents from {data_dir}...")
+def is_structured_file(path):
+    """Facility JSON / healthstat CSV files are loaded one document per record"""
+    name = os.path.basename(path)
+    return fnmatch.fnmatch(name, FACILITY_GLOB) or fnmatch.fnmatch(name, HEALTHSTAT_GLOB)
 
-    documents = []
+def discover_files(data_dir):
+    """List every ingestible file under the data directory"""
+    files = []
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith(('.pdf', '.txt')) or is_structured_file(path):
+                files.append(path)
+    return sorted(files)
 
-    # Load PDFs
-    if os.path.exists(data_dir):
-        try:
-            pdf_loader = DirectoryLoader(
-                data_dir,
-                glob="**/*.pdf",
-                loader_cls=PyPDFLoader,
-                show_progress=True
-            )
-            pdf_docs = pdf_loader.load()
-            documents.extend(pdf_docs)
-            print(f"  ✅ Loaded {len(pdf_docs)} PDF documents")
-        except Exception as e:
-            print(f"  ⚠️ No PDFs found or error loading: {e}")
-
-        # Load text files
-        try:
-            txt_loader = DirectoryLoader(
-                data_dir,
-                glob="**/*.txt",
-                loader_cls=TextLoader,
-                show_progress=True,
-                loader_kwargs={"encoding": "utf-8"}
-            )
-            txt_docs = txt_loader.load()
-            documents.extend(txt_docs)
-            print(f"  ✅ Loaded {len(txt_docs)} TXT documents")
-        except Exception as e:
-            print(f"  ⚠️ No TXT files found or error loading: {e}")
-
-    print(f"\n✅ Total: {len(documents)} documents loaded")
-    return documents
+def load_file(path):
+    """Load one file into documents with the loader for its type"""
+    name = os.path.basename(path)
+    if fnmatch.fnmatch(name, FACILITY_GLOB):
+        return FacilityJSONLoader(path).load()
+    if fnmatch.fnmatch(name, HEALTHSTAT_GLOB):
+        return HealthStatCSVLoader(path).load()
+    if name.endswith(".pdf"):
+        return PyPDFLoader(path).load()
+    return TextLoader(path, encoding="utf-8").load()
 
 def split_documents(documents):
     """Split documents into chunks"""
-    print("\n✂️ Splitting documents into chunks...")
-
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
@@ -69,14 +100,208 @@ def split_documents(documents):
         add_start_index=True
     )
 
-    chunks = text_splitter.split_documents(documents)
-    print(f"✅ Created {len(chunks)} chunks")
+    return text_splitter.split_documents(documents)
 
+def chunk_file(path):
+    """Load a file and return its chunks; structured records are already chunk-sized"""
+    documents = load_file(path)
+    chunks = documents if is_structured_file(path) else split_documents(documents)
+    for chunk in chunks:
+        # Facility records are tagged by the loader; PDFs/TXTs are detected per chunk
+        if chunk.metadata.get("language") is None:
+            chunk.metadata["language"] = detect_language(chunk.page_content)
     return chunks
 
-def create_vector_store(chunks):
-    """Create and persist Chroma vector store with Cohere embeddings"""
-    print("\n🔮 Creating vector embeddings with Cohere (FREE!)...")
+def file_hash(path):
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(chunk):
+    """Content-addressed chunk id: identical text from the same source keeps its vector
+
+    The language is part of it, so zh-Hant and zh-Hans records with the same text
+    (place names are often identical) stay separate chunks with their own tags.
+    """
+    source = chunk.metadata.get("source", "")
+    language = chunk.metadata.get("language", "")
+    return hashlib.sha256(f"{source}\n{language}\n{chunk.page_content}".encode("utf-8")).hexdigest()
+
+def load_manifest(index_dir):
+    """Read an index version's ingestion manifest, or None if this is a first run"""
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("embedding_model") != EMBEDDING_ID:
+        print("  ⚠️ Manifest is from a different version or embedding model - rebuilding")
+        return None
+    return manifest
+
+def save_manifest(files, index_dir):
+    """Write the manifest atomically so an interrupted run never leaves it half-written"""
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "embedding_model": EMBEDDING_ID,
+        "files": files
+    }
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+class StageStats:
+    """Chunks and busy seconds per pipeline stage, for the throughput report"""
+
+    def __init__(self):
+        self.stages = {}  # stage -> [chunks, seconds]
+        self.started = time.perf_counter()
+
+    def add(self, stage, chunks, seconds):
+        totals = self.stages.setdefault(stage, [0, 0.0])
+        totals[0] += chunks
+        totals[1] += seconds
+
+    def report(self):
+        print(f"\n⏱️ Pipeline: {time.perf_counter() - self.started:.1f}s wall")
+        for stage, (chunks, seconds) in self.stages.items():
+            rate = chunks / seconds if seconds else 0.0
+            print(f"  {stage:<7} {chunks:>8} chunks {seconds:>8.1f}s {rate:>9.1f} chunks/s")
+
+def scan_files(files, manifest):
+    """Hash every file against the manifest - nothing is loaded yet
+
+    Returns ([(path, sha256)] of new or changed files, manifest entries of
+    unchanged files, removed paths).
+    """
+    previous = manifest["files"] if manifest else {}
+    changed = []
+    entries = {}
+
+    for path in files:
+        digest = file_hash(path)
+        old = previous.get(path)
+        if old and old["sha256"] == digest:
+            entries[path] = old
+            continue
+        print(f"  🔄 {'Changed' if old else 'New'}: {path}")
+        changed.append((path, digest))
+
+    removed = [path for path in previous if path not in set(files)]
+    for path in removed:
+        print(f"  🗑️ Removed: {path}")
+    return changed, entries, removed
+
+def parse_file(path):
+    """Load and split one file (runs in a worker process)
+
+    Returns (path, [(chunk id, text, metadata)], seconds).
+    """
+    start = time.perf_counter()
+    chunks = []
+    seen = set()
+    for chunk in chunk_file(path):
+        cid = chunk_id(chunk)
+        if cid in seen:
+            continue  # identical text twice in one file - keep one vector
+        seen.add(cid)
+        chunks.append((cid, chunk.page_content, chunk.metadata))
+    return path, chunks, time.perf_counter() - start
+
+def iter_parsed_files(paths, workers=INGEST_WORKERS):
+    """parse_file results in completion order, up to `workers` files parsed in parallel
+
+    At most workers * PARSE_PREFETCH parsed files wait for the consumer, so a slow
+    embedding stage holds the parsers back instead of filling memory.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield parse_file(path)
+        return
+
+    # spawn, not fork: the parent already runs Chroma's background threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        queue = iter(paths)
+        running = set()
+        try:
+            while True:
+                while len(running) < workers * PARSE_PREFETCH:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    running.add(executor.submit(parse_file, path))
+                if not running:
+                    return
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+def iter_changes(changed, manifest, entries, to_delete, stats):
+    """Stream the chunks to embed from the changed files as they are parsed
+
+    Yields (index language, chunk id, text, metadata) for chunks not already
+    embedded. As each file finishes, its manifest entry is added to `entries`
+    and the ids of its vanished chunks to `to_delete`.
+    """
+    previous = manifest["files"] if manifest else {}
+    digests = dict(changed)
+    parsed = iter_parsed_files(list(digests))
+
+    for done, (path, chunks, seconds) in enumerate(parsed, 1):
+        old = previous.get(path)
+        old_ids = set(old["chunks"]) if old else set()
+        chunk_ids = [cid for cid, _, _ in chunks]
+        entries[path] = {"sha256": digests[path], "chunks": chunk_ids}
+        to_delete |= old_ids - set(chunk_ids)
+        stats.add("parse", len(chunks), seconds)
+
+        new_chunks = [(cid, text, metadata) for cid, text, metadata in chunks if cid not in old_ids]
+        print(f"  📄 [{done}/{len(digests)}] {path}: {len(chunks)} chunks, {len(new_chunks)} to embed ({seconds:.1f}s)")
+        for cid, text, metadata in new_chunks:
+            yield index_language(metadata.get("language", "en")), cid, text, metadata
+
+def build_geo_index(files, index_dir):
+    """Precompute the nearest-facility KD-tree from the facility JSON coordinates"""
+    facility_files = [path for path in files if fnmatch.fnmatch(os.path.basename(path), FACILITY_GLOB)]
+    if not facility_files:
+        return None
+
+    index = FacilityGeoIndex.build(facility_files)
+    os.makedirs(index_dir, exist_ok=True)
+    index.save(os.path.join(index_dir, GEO_INDEX_FILE))
+    print(f"📍 Geo index: {len(index)} facilities, {len(index.places)} place names")
+    return index
+
+def build_bm25_index(index_dir, vectorstore=None):
+    """Rebuild the BM25 index from exactly the chunks stored in the vector store"""
+    if vectorstore is None:
+        vectorstore = Chroma(persist_directory=index_dir)
+
+    index = BM25Index.from_collection(vectorstore._collection)
+    index.save(os.path.join(index_dir, BM25_INDEX_FILE))
+    print(f"🔤 BM25 index: {len(index)} chunks, {len(index.postings)} terms")
+    return index
+
+def get_embeddings(index="en"):
+    """Cohere embeddings (FREE tier!) for one index language, app_local.py's models with
+    INGEST_EMBEDDINGS=local, or a local endpoint if EMBEDDING_ENDPOINT is set"""
+    if EMBEDDING_ENDPOINT:
+        print(f"🧪 Using embedding endpoint {EMBEDDING_ENDPOINT}")
+        return HTTPEmbeddings(EMBEDDING_ENDPOINT)
+
+    if INGEST_EMBEDDINGS == "local":
+        from startup import load_embeddings
+        print(f"🖥️ Loading local embedding model ({EMBEDDING_MODELS[index]})...")
+        return load_embeddings(EMBEDDING_MODELS[index])
 
     # Get Cohere API key
     cohere_api_key = os.getenv("COHERE_API_KEY")
@@ -89,38 +314,95 @@ def create_vector_store(chunks):
         print("4. Create .env file with: COHERE_API_KEY=your_key_here")
         raise ValueError("Missing COHERE_API_KEY")
 
-    # Initialize Cohere embeddings (FREE tier!)
-    print("🔑 Initializing Cohere embeddings...")
-    embeddings = CohereEmbeddings(
+    print(f"🔑 Initializing Cohere embeddings ({EMBEDDING_MODELS[index]})...")
+    return CohereEmbeddings(
         cohere_api_key=cohere_api_key,
-        model="embed-english-light-v3.0"  # FREE model, works great!
+        model=EMBEDDING_MODELS[index]  # FREE models, work great!
     )
 
-    print(f"\n📊 Processing {len(chunks)} chunks...")
-    print("⏳ This may take a few minutes for large datasets...")
-    print("💡 Tip: Cohere FREE tier = 100 embeds/minute")
+def open_vector_store(index, embeddings, index_dir, rebuild=False):
+    """Chroma collection for one index language, cleared first on a rebuild"""
+    vectorstore = Chroma(
+        collection_name=COLLECTIONS[index],
+        persist_directory=index_dir,
+        embedding_function=embeddings
+    )
 
-    # Create vector store (with progress updates)
-    try:
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory=CHROMA_DIR
+    if rebuild and vectorstore._collection.count() > 0:
+        # Vectors without a manifest can't be matched to chunks - start clean
+        print(f"  ⚠️ Existing '{index}' vectors have no manifest - clearing collection for a clean rebuild")
+        vectorstore.delete_collection()
+        vectorstore = Chroma(
+            collection_name=COLLECTIONS[index],
+            persist_directory=index_dir,
+            embedding_function=embeddings
         )
+    return vectorstore
 
-        print(f"\n✅ Vector store created successfully!")
-        print(f"📁 Location: {CHROMA_DIR}")
-        print(f"📊 Total vectors: {vectorstore._collection.count()}")
+def sync_vector_store(chunks, to_delete, index_dir, rebuild=False, stats=None):
+    """Embed and upsert streamed chunks into the Chroma collections of one index version
 
+    `chunks` yields (index language, chunk id, text, metadata); each embedded
+    batch is upserted as soon as it is ready. `to_delete` is only complete once
+    the stream is exhausted, so deletions are applied last.
+    Returns (English vector store, {index language: chunks upserted}).
+    """
+    if INGEST_EMBEDDINGS == "local" and not EMBEDDING_ENDPOINT:
+        print("\n🔮 Syncing vector embeddings with the local models (for app_local.py)...")
+    else:
+        print("\n🔮 Syncing vector embeddings with Cohere (FREE!)...")
+        print("💡 Tip: Cohere FREE tier = 100 embeds/minute - batches are rate limited to match")
+
+    checkpoint = EmbeddingCheckpoint(CHECKPOINT_PATH, EMBEDDING_ID)
+    stats = stats or StageStats()
+    embedders = {}
+    vectorstores = {}
+    for index in COLLECTIONS:
+        embedders[index] = get_embeddings(index)
+        vectorstores[index] = open_vector_store(index, embedders[index], index_dir, rebuild)
+
+    upserted = dict.fromkeys(COLLECTIONS, 0)
+    upsert_seconds = 0.0
+    started = time.perf_counter()
+    try:
+        # Batched, rate-limited, resumable embedding - fed while files are still being parsed
+        for index, batch, vectors in embed_stream(embedders, chunks, checkpoint):
+            upsert_start = time.perf_counter()
+            vectorstores[index]._collection.upsert(
+                ids=[cid for cid, _, _ in batch],
+                embeddings=vectors,
+                documents=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch]
+            )
+            upsert_seconds += time.perf_counter() - upsert_start
+            upserted[index] += len(batch)
     except Exception as e:
-        print(f"\n❌ Error creating vector store: {e}")
+        print(f"\n❌ Error updating vector store: {e}")
         print("\n💡 Common issues:")
         print("- Check your COHERE_API_KEY is valid")
         print("- Ensure you have internet connection")
-        print("- Try reducing chunk size if you have many documents")
+        print("- Rerun to resume: finished batches are kept in the checkpoint")
         raise
 
-    return vectorstore
+    # Time spent waiting on the stream: embedding, or parsing when that is the bottleneck
+    total = sum(upserted.values())
+    stats.add("embed", total, time.perf_counter() - started - upsert_seconds)
+    stats.add("upsert", total, upsert_seconds)
+
+    if to_delete:
+        # Chunk ids are content hashes, so each id lives in exactly one collection
+        for index, vectorstore in vectorstores.items():
+            print(f"🗑️ Deleting up to {len(to_delete)} stale '{index}' vectors...")
+            vectorstore.delete(ids=sorted(to_delete))
+
+    checkpoint.clear()
+
+    print("\n✅ Vector store up to date!")
+    print(f"📁 Location: {index_dir}")
+    for index, vectorstore in vectorstores.items():
+        print(f"📊 Total '{index}' vectors: {vectorstore._collection.count()} ({upserted[index]} embedded this run)")
+
+    return vectorstores["en"], upserted
 
 def main():
     """Main ingestion pipeline"""
@@ -134,7 +416,7 @@ def main():
         os.makedirs(DATA_DIR)
         print(f"\n📁 Created {DATA_DIR} directory.")
         print("\n⚠️ Please add your Hong Kong healthcare documents there!")
-        print("\nSupported formats: PDF, TXT")
+        print("\nSupported formats: PDF, TXT, facility JSON, healthstat CSV")
         print("\nExample files to add:")
         print("- HK hospital directories")
         print("- Healthcare service guides")
@@ -144,9 +426,9 @@ def main():
         return
 
     # Check if directory has files
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith(('.pdf', '.txt'))]
+    files = discover_files(DATA_DIR)
     if not files:
-        print(f"\n⚠️ No PDF or TXT files found in {DATA_DIR}")
+        print(f"\n⚠️ No supported files found in {DATA_DIR}")
         print("\nPlease add documents first!")
         print("\nExample test file you can create:")
         print(f"  echo 'Hong Kong healthcare test document' > {DATA_DIR}/test.txt")
@@ -158,35 +440,96 @@ def main():
     if len(files) > 5:
         print(f"  ... and {len(files)-5} more")
 
-    # Load documents
-    documents = load_documents(DATA_DIR)
+    # Compare against the live version's manifest - only new/changed files are loaded and split
+    print("\n🔍 Checking for changes...")
+    live_dir = current_index_dir(CHROMA_DIR)
+    manifest = load_manifest(live_dir)
+    changed, entries, removed = scan_files(files, manifest)
 
-    if not documents:
-        print("\n❌ No documents loaded. Check your data directory!")
+    if manifest and not changed and not removed:
+        print("\n✅ No changes since last ingestion - nothing to embed!")
+        missing = [name for name in (GEO_INDEX_FILE, BM25_INDEX_FILE, SNAPSHOT_DIR)
+                   if not os.path.exists(os.path.join(live_dir, name))]
+        if not missing:
+            return
+        # Fill in indexes an older ingestion didn't write - in a new version, published ones are never modified
+        version, index_dir = new_version(CHROMA_DIR)
+        print(f"\n🆕 Building index version {version} (adding {', '.join(missing)})")
+        try:
+            if GEO_INDEX_FILE in missing:
+                build_geo_index(files, index_dir)
+            if BM25_INDEX_FILE in missing:
+                build_bm25_index(index_dir)
+            export_all(index_dir)  # snapshots are never copied between versions
+        except Exception as e:
+            print(f"\n❌ Failed to build missing indexes: {e}")
+            discard_version(CHROMA_DIR, version)
+            raise
+        previous = publish(CHROMA_DIR, version, {"created_at": time.time()})
+        print(f"🔀 Published {version} (previous: {previous or 'unversioned'})")
         return
 
-    # Split into chunks
-    chunks = split_documents(documents)
+    print(f"\n📋 Plan: {len(changed)} new or changed files, {len(removed)} removed, {len(entries)} unchanged "
+          f"({INGEST_WORKERS} parser processes)")
+    to_delete = set()
+    for path in removed:
+        to_delete |= set(manifest["files"][path]["chunks"])
 
-    if not chunks:
-        print("\n❌ No chunks created. Check your documents!")
-        return
+    # Changes go into a copy of the live version - servers keep reading the old one meanwhile
+    version, index_dir = new_version(CHROMA_DIR, copy=manifest is not None)
+    print(f"\n🆕 Building index version {version}")
 
-    # Create vector store
     try:
-        vectorstore = create_vector_store(chunks)
+        # Spatial index needs no embeddings - always rebuild it (milliseconds)
+        build_geo_index(files, index_dir)
+
+        # Parse -> split -> embed -> upsert, streamed file by file
+        stats = StageStats()
+        chunks = iter_changes(changed, manifest, entries, to_delete, stats)
+        vectorstore, upserted = sync_vector_store(chunks, to_delete, index_dir, rebuild=manifest is None, stats=stats)
+
+        # Lexical index mirrors the synced collection (no embeddings needed)
+        build_bm25_index(index_dir, vectorstore)
+
+        # Read-only mmap snapshots that app_local.py workers share instead of opening Chroma
+        export_all(index_dir)
+
+        # Only record the new state once the vector store matches it
+        save_manifest(entries, index_dir)
     except Exception as e:
-        print(f"\n❌ Failed to create vector store: {e}")
-        return
+        print(f"\n❌ Failed to update vector store: {e}")
+        discard_version(CHROMA_DIR, version)
+        raise
+
+    stats.report()
+    total_chunks = sum(len(entry["chunks"]) for entry in entries.values())
+    embedded = sum(upserted.values())
+
+    # Atomic switch: running servers pick this up on their next CURRENT check (or POST /admin/reload)
+    previous = publish(CHROMA_DIR, version, {
+        "files": len(files),
+        "chunks": total_chunks,
+        "embedded": embedded,
+        "deleted": len(to_delete),
+        "embedding_model": EMBEDDING_ID,
+        # Checked by app_local.py against the models it embeds queries with
+        "collection_models": {COLLECTIONS[index]: EMBEDDING_ENDPOINT or EMBEDDING_MODELS[index] for index in COLLECTIONS},
+    })
+    print(f"🔀 Published {version} (previous: {previous or 'unversioned'})")
+    removed = collect_garbage(CHROMA_DIR)
+    if removed:
+        print(f"🗑️ Removed retired versions: {', '.join(removed)}")
 
     print("\n" + "="*60)
     print("✨ Ingestion Complete! Your vector database is ready.")
     print("="*60)
-    print(f"\n📊 Summary:")
-    print(f"  - Documents: {len(documents)}")
-    print(f"  - Chunks: {len(chunks)}")
-    print(f"  - Vector DB: {CHROMA_DIR}")
-    print(f"\n🚀 Next steps:")
+    print("\n📊 Summary:")
+    print(f"  - Files: {len(files)}")
+    print(f"  - Chunks: {total_chunks}")
+    print(f"  - Embedded this run: {embedded}")
+    print(f"  - Deleted this run: {len(to_delete)}")
+    print(f"  - Vector DB: {index_dir}")
+    print("\n🚀 Next steps:")
     print("  1. Test locally: streamlit run streamlit_app.py")
     print("  2. Upload chroma_db/ folder to GitHub")
     print("  3. Deploy to Streamlit Cloud!")
@@ -0,0 +1,52 @@
+"""
+Language - script detection and per-language index routing
+Shared by ingest_data.py, app_local.py, app.py and context_builder.py.
+
+English chunks live in the default Chroma collection; Traditional and
+Simplified Chinese chunks live in a second collection embedded with a
+multilingual model, tagged with a "language" metadata field so a query only
+searches chunks in its own script.
+"""
+
+import re
+
+LANGUAGES = ("en", "zh-hant", "zh-hans")
+COLLECTIONS = {
+    "en": "langchain",  # Chroma's default - existing indexes keep working
+    "zh": "langchain_zh",
+}
+
+CJK_PATTERN = re.compile(r"[㐀-鿿]")
+# Characters that only appear in Simplified Chinese (their Traditional forms differ)
+SIMPLIFIED_CHARS = set("医联号诊岛区东门楼龙湾爱专这为们临疗务发会时办气电车长问书买卖见观")
+TRADITIONAL_CHARS = set("醫聯號診島區東門樓龍灣愛專這為們臨療務發會時辦氣電車長問書買賣見觀")
+
+
+def detect_language(text):
+    """'en', 'zh-hant', 'zh-hans' (or 'zh' when the script can't be told apart)"""
+    cjk = len(CJK_PATTERN.findall(text))
+    if cjk == 0 or cjk < len(text.strip()) * 0.2:
+        return "en"
+    simplified = sum(ch in SIMPLIFIED_CHARS for ch in text)
+    traditional = sum(ch in TRADITIONAL_CHARS for ch in text)
+    if simplified > traditional:
+        return "zh-hans"
+    if traditional > simplified:
+        return "zh-hant"
+    return "zh"
+
+
+def index_language(language):
+    """Which index serves a language: 'en' or 'zh' (both Chinese scripts share one)"""
+    return "zh" if language.startswith("zh") else "en"
+
+
+def collection_for(language):
+    return COLLECTIONS[index_language(language)]
+
+
+def language_filter(language):
+    """Chroma `where` clause for the question's script (None searches both scripts)"""
+    if language in LANGUAGES and language != "en":
+        return {"language": language}
+    return None
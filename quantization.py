@@ -0,0 +1,318 @@
+"""
+Quantization - int8 scalar / product-quantised codes for the index snapshot
+Used by index_snapshot.py; run directly for a recall-vs-memory report.
+
+Approximate distances are computed on compact codes (int8 per dimension, or
+one byte per PQ subspace) to pick a shortlist, which is then rescored exactly
+against the float vectors, so only shortlisted rows of the full matrix are
+read per query.
+
+    python quantization.py                        # report for every collection
+    python quantization.py --modes sq8 pq48 --k 4
+    SNAPSHOT_QUANTIZATION=sq8 python index_snapshot.py   # export with codes
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+# Configuration
+RESCORE_FACTOR = int(os.environ.get("QUANTIZATION_RESCORE_FACTOR", "8"))  # shortlist = k x factor
+PQ_CENTROIDS = 256  # one byte per subspace
+PQ_TRAIN_SAMPLE = 20000
+PQ_ITERATIONS = 15
+BLOCK_ROWS = 8192
+QUANTIZATION_FILE = "quantization.json"
+
+
+class ScalarQuantizer:
+    """Per-dimension min/max int8 (uint8) codes - 4x smaller than float32"""
+
+    mode = "sq8"
+
+    def __init__(self, minimum, scale, codes=None):
+        self.minimum = minimum.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        self.codes = codes
+        self.norms = None if codes is None else self._decoded_norms()
+
+    @classmethod
+    def train(cls, matrix):
+        minimum = matrix.min(axis=0)
+        scale = (matrix.max(axis=0) - minimum) / 255.0
+        scale[scale == 0] = 1.0
+        return cls(minimum, scale)
+
+    def encode(self, matrix):
+        self.codes = np.clip(np.rint((matrix - self.minimum) / self.scale), 0, 255).astype(np.uint8)
+        self.norms = self._decoded_norms()
+        return self.codes
+
+    def _decoded_norms(self):
+        norms = np.empty(len(self.codes), dtype=np.float32)
+        for block in range(0, len(self.codes), BLOCK_ROWS):
+            decoded = self.codes[block:block + BLOCK_ROWS] * self.scale + self.minimum
+            norms[block:block + BLOCK_ROWS] = np.einsum("ij,ij->i", decoded, decoded)
+        return norms
+
+    def distances(self, query, rows=None):
+        """Approximate squared L2 distances: ||x'||^2 - 2 x'.q + ||q||^2 with x' = min + code * scale"""
+        codes = self.codes if rows is None else self.codes[rows]
+        norms = self.norms if rows is None else self.norms[rows]
+        scaled_query = self.scale * query
+        offset = float(self.minimum @ query)
+        result = np.empty(len(codes), dtype=np.float32)
+        for block in range(0, len(codes), BLOCK_ROWS):
+            dots = codes[block:block + BLOCK_ROWS] @ scaled_query + offset
+            result[block:block + BLOCK_ROWS] = norms[block:block + BLOCK_ROWS] - 2.0 * dots
+        return result + float(query @ query)
+
+    def bytes_per_vector(self):
+        return self.codes.shape[1] + 4  # codes + decoded norm
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "sq8_codes.npy"), self.codes)
+        np.save(os.path.join(directory, "sq8_params.npy"), np.stack([self.minimum, self.scale]))
+        return {"mode": self.mode}
+
+    @classmethod
+    def load(cls, directory, info):
+        minimum, scale = np.load(os.path.join(directory, "sq8_params.npy"))
+        return cls(minimum, scale, np.load(os.path.join(directory, "sq8_codes.npy"), mmap_mode="r"))
+
+
+class ProductQuantizer:
+    """M subspaces x 256 k-means centroids - one byte per subspace"""
+
+    def __init__(self, codebooks, codes=None):
+        self.codebooks = codebooks.astype(np.float32)  # (M, K, d / M)
+        self.subspaces = codebooks.shape[0]
+        self.codes = codes
+        self.mode = f"pq{self.subspaces}"
+
+    @classmethod
+    def train(cls, matrix, subspaces, seed=0):
+        if matrix.shape[1] % subspaces:
+            raise ValueError(f"Dimension {matrix.shape[1]} is not divisible by {subspaces} subspaces")
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), min(len(matrix), PQ_TRAIN_SAMPLE), replace=False)]
+        centroids = min(PQ_CENTROIDS, len(sample))
+        width = matrix.shape[1] // subspaces
+
+        codebooks = np.empty((subspaces, centroids, width), dtype=np.float32)
+        for m in range(subspaces):
+            codebooks[m] = _kmeans(sample[:, m * width:(m + 1) * width], centroids, rng)
+        return cls(codebooks)
+
+    def encode(self, matrix):
+        width = self.codebooks.shape[2]
+        codes = np.empty((len(matrix), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            codes[:, m] = _nearest(matrix[:, m * width:(m + 1) * width], self.codebooks[m])
+        self.codes = codes
+        return codes
+
+    def distances(self, query, rows=None):
+        """Asymmetric distances: a (M, K) lookup table per query, summed over each row's codes"""
+        width = self.codebooks.shape[2]
+        table = np.stack([
+            ((self.codebooks[m] - query[m * width:(m + 1) * width]) ** 2).sum(axis=1)
+            for m in range(self.subspaces)
+        ])
+        codes = self.codes if rows is None else self.codes[rows]
+        result = np.empty(len(codes), dtype=np.float32)
+        columns = np.arange(self.subspaces)
+        for block in range(0, len(codes), BLOCK_ROWS):
+            result[block:block + BLOCK_ROWS] = table[columns, codes[block:block + BLOCK_ROWS]].sum(axis=1)
+        return result
+
+    def bytes_per_vector(self):
+        return self.subspaces
+
+    def save(self, directory):
+        np.save(os.path.join(directory, f"{self.mode}_codes.npy"), self.codes)
+        np.save(os.path.join(directory, f"{self.mode}_codebooks.npy"), self.codebooks)
+        return {"mode": self.mode}
+
+    @classmethod
+    def load(cls, directory, info):
+        mode = info["mode"]
+        return cls(np.load(os.path.join(directory, f"{mode}_codebooks.npy")),
+                   np.load(os.path.join(directory, f"{mode}_codes.npy"), mmap_mode="r"))
+
+
+def _nearest(vectors, centroids):
+    distances = (vectors ** 2).sum(axis=1)[:, None] - 2.0 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+    return distances.argmin(axis=1)
+
+
+def _kmeans(vectors, centroids, rng):
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points"""
+    centers = vectors[rng.choice(len(vectors), centroids, replace=False)].copy()
+    for _ in range(PQ_ITERATIONS):
+        assignment = _nearest(vectors, centers)
+        for c in range(centroids):
+            members = vectors[assignment == c]
+            centers[c] = members.mean(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+    return centers
+
+
+def build_quantizer(mode, matrix):
+    """'sq8' or 'pq<M>' (e.g. pq48) trained and encoded on a float32 matrix"""
+    if mode == "sq8":
+        quantizer = ScalarQuantizer.train(matrix)
+    elif mode.startswith("pq") and mode[2:].isdigit():
+        quantizer = ProductQuantizer.train(matrix, int(mode[2:]))
+    else:
+        raise ValueError(f"Unknown quantization mode '{mode}' (use sq8 or pq<M>)")
+    quantizer.encode(matrix)
+    return quantizer
+
+
+def save_quantizer(quantizer, directory):
+    info = quantizer.save(directory)
+    with open(os.path.join(directory, QUANTIZATION_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+def load_quantizer(directory):
+    """Quantizer saved in a snapshot directory, or None"""
+    path = os.path.join(directory, QUANTIZATION_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        info = json.load(f)
+    if info["mode"] == "sq8":
+        return ScalarQuantizer.load(directory, info)
+    return ProductQuantizer.load(directory, info)
+
+
+def shortlist_search(quantizer, vectors, norms, query, k, rows=None, rescore_factor=RESCORE_FACTOR):
+    """Top-k [(row, exact distance)]: shortlist on the codes, rescore against the float vectors"""
+    approximate = quantizer.distances(query, rows)
+    size = min(len(approximate), k * rescore_factor)
+    if size == 0:
+        return []
+    shortlist = np.argpartition(approximate, size - 1)[:size]
+    shortlist = np.sort(shortlist if rows is None else rows[shortlist])  # sorted reads from the mmap
+
+    exact = norms[shortlist] - 2.0 * (vectors[shortlist].astype(np.float32) @ query) + float(query @ query)
+    order = np.argsort(exact)[:k]
+    return [(int(shortlist[i]), max(float(exact[i]), 0.0)) for i in order]
+
+
+def exact_top_k(matrix, norms, queries, k):
+    distances = norms[None, :] - 2.0 * queries @ matrix.T + (queries ** 2).sum(axis=1)[:, None]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def report(name, matrix, modes, k=4, queries=200, rescore_factor=RESCORE_FACTOR, seed=0, rescore_dtype="float16"):
+    """Recall@k and memory of each mode against exact float32 search
+
+    Queries are stored vectors with a little noise (real question embeddings
+    need the embedding model); ground truth is the exact float32 top-k.
+    Quantised modes also keep the rescoring vectors (rescore_dtype) and their
+    norms, so their total footprint is the codes plus those.
+    """
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(len(matrix), min(queries, len(matrix)), replace=False)]
+    sample = sample + rng.normal(0, sample.std() * 0.3, sample.shape).astype(np.float32)
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+    truth = exact_top_k(matrix, norms, sample, k)
+
+    def recall(found):
+        return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+    float16 = matrix.astype(np.float16).astype(np.float32)
+    # What a snapshot stores besides the codes: rescoring vectors + float32 norms
+    stored_bytes = matrix.shape[1] * np.dtype(rescore_dtype).itemsize + 4
+    rows = [{
+        "mode": "float32", "bytes_per_vector": matrix.shape[1] * 4, "total_bytes_per_vector": matrix.shape[1] * 4 + 4,
+        "recall": 1.0, "recall_rescored": 1.0,
+    }, {
+        "mode": "float16", "bytes_per_vector": matrix.shape[1] * 2, "total_bytes_per_vector": matrix.shape[1] * 2 + 4,
+        "recall": recall(exact_top_k(float16, np.einsum("ij,ij->i", float16, float16), sample, k)),
+        "recall_rescored": None,
+    }]
+
+    for mode in modes:
+        start = time.perf_counter()
+        try:
+            quantizer = build_quantizer(mode, matrix)
+        except ValueError as e:
+            print(f"  ⚠️ {mode}: {e}")
+            continue
+        train_seconds = time.perf_counter() - start
+
+        approximate = [np.argsort(quantizer.distances(query))[:k] for query in sample]
+        start = time.perf_counter()
+        rescored = [[row for row, _ in shortlist_search(quantizer, matrix, norms, query, k, rescore_factor=rescore_factor)]
+                    for query in sample]
+        query_ms = (time.perf_counter() - start) / len(sample) * 1000
+        rows.append({
+            "mode": mode,
+            "bytes_per_vector": quantizer.bytes_per_vector(),
+            "total_bytes_per_vector": quantizer.bytes_per_vector() + stored_bytes,
+            "recall": recall(approximate),
+            "recall_rescored": recall(rescored),
+            "train_seconds": round(train_seconds, 2),
+            "query_ms": round(query_ms, 3),
+        })
+
+    print(f"\n📐 {name}: {len(matrix)} vectors x {matrix.shape[1]} dims, recall@{k} vs exact float32 "
+          f"(rescoring top {k * rescore_factor} against {rescore_dtype} vectors)")
+    # scan MB is read by every query; total MB is what the snapshot stores and maps (codes + rescoring vectors)
+    print(f"  {'mode':<8} {'bytes/vec':>9} {'scan MB':>9} {'total MB':>9} {'recall':>7} {'rescored':>9}")
+    for row in rows:
+        scan_mb = row["bytes_per_vector"] * len(matrix) / 1e6
+        total_mb = row["total_bytes_per_vector"] * len(matrix) / 1e6
+        rescored = "-" if row["recall_rescored"] is None else f"{row['recall_rescored']:.4f}"
+        print(f"  {row['mode']:<8} {row['bytes_per_vector']:>9} {scan_mb:>9.2f} {total_mb:>9.2f} "
+              f"{row['recall']:>7.4f} {rescored:>9}")
+    return {"collection": name, "vectors": len(matrix), "dimension": int(matrix.shape[1]), "k": k,
+            "rescore_dtype": rescore_dtype, "modes": rows}
+
+
+def main():
+    from index_registry import current_index_dir
+    from index_snapshot import SNAPSHOT_DIR
+
+    parser = argparse.ArgumentParser(description="Recall-vs-memory report for quantised vector indexes")
+    parser.add_argument("--persist-directory", default="./chroma_db",
+                        help="Index root (the live version's snapshot is read, never written)")
+    parser.add_argument("--modes", nargs="+", default=["sq8", "pq96", "pq48", "pq24"])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore-factor", type=int, default=RESCORE_FACTOR)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    # Read the snapshot's vectors (the matrix exports quantise) rather than opening Chroma,
+    # which writes to its directory - the live version must stay untouched
+    snapshot_dir = os.path.join(current_index_dir(args.persist_directory), SNAPSHOT_DIR)
+    if not os.path.isdir(snapshot_dir):
+        print(f"❌ No snapshot in {snapshot_dir} - run ingest_data.py or index_snapshot.py first")
+        return
+    results = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        path = os.path.join(snapshot_dir, name, "vectors.npy")
+        if not os.path.exists(path):
+            continue
+        vectors = np.load(path, mmap_mode="r")
+        if not len(vectors):
+            continue
+        results.append(report(name, vectors.astype(np.float32), args.modes, args.k, args.queries, args.rescore_factor,
+                              rescore_dtype=vectors.dtype.name))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"\n📝 Report written to {args.output}")
+    print("\n💡 Export with the chosen mode: SNAPSHOT_QUANTIZATION=<mode> python index_snapshot.py")
+
+
+if __name__ == "__main__":
+    main()
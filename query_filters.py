@@ -0,0 +1,136 @@
+"""
+Query Filters - structured constraints pushed down into retrieval
+Shared by app_local.py, app.py and bm25_index.py.
+
+Questions like "hospitals with A&E in Kowloon West" name a hospital cluster,
+a facility type or the A&E flag - all stored as chunk metadata by
+data_loaders.py. They are extracted here and applied as a Chroma `where`
+clause, and through an inverted metadata index for BM25, so only matching
+chunks are scanned at all.
+
+A facility type on its own is not a filter: "hospital" appears in most Annual
+Report questions, whose chunks carry no facility metadata.
+"""
+
+import os
+import re
+
+from language import language_filter
+
+# Configuration
+METADATA_FILTERS = os.environ.get("METADATA_FILTERS", "1") == "1"
+
+FILTER_FIELDS = ("cluster", "facility_type", "with_ae")
+
+# Cluster metadata value -> ways a question names it
+CLUSTER_ALIASES = {
+    "Hong Kong East Cluster": ("hong kong east", "hk east", "hkec", "港島東", "港岛东"),
+    "Hong Kong West Cluster": ("hong kong west", "hk west", "hkwc", "港島西", "港岛西"),
+    "Kowloon Central Cluster": ("kowloon central", "kcc", "九龍中", "九龙中"),
+    "Kowloon East Cluster": ("kowloon east", "kec", "九龍東", "九龙东"),
+    "Kowloon West Cluster": ("kowloon west", "kwc", "九龍西", "九龙西"),
+    "New Territories East Cluster": ("new territories east", "nt east", "ntec", "新界東", "新界东"),
+    "New Territories West Cluster": ("new territories west", "nt west", "ntwc", "新界西"),
+}
+
+FACILITY_TYPE_PATTERNS = {
+    "hosp": re.compile(r"\bhospitals?\b|醫院|医院", re.IGNORECASE),
+    "sop": re.compile(r"\bspecialist out-?patient|\bsopcs?\b|專科門診|专科门诊", re.IGNORECASE),
+    "fmc": re.compile(r"\bfamily medicine|\bgeneral out-?patient|\bgopcs?\b|家庭醫學|家庭医学|普通科門診|普通科门诊",
+                      re.IGNORECASE),
+}
+
+AE_TERM = r"(?:a\s*&\s*e|a and e|accident (?:and|&) emergency|emergency (?:services?|departments?|rooms?))"
+# A&E as a facility attribute ("with A&E", "A&E hospitals") - not "A&E waiting times"
+WITH_AE_PATTERN = re.compile(
+    rf"\b(?:with|has|have|having|provid\w*|offer\w*)\s+(?:an?\s+|24.hour\s+)*{AE_TERM}"
+    rf"|{AE_TERM}\s+(?:services?|hospitals?|facilit\w*)\b"
+    r"|有急症室|提供急症室|急症室服務|急症室服务",
+    re.IGNORECASE,
+)
+WITHOUT_AE_PATTERN = re.compile(
+    rf"\b(?:without|no|lacking)\s+(?:an?\s+)?{AE_TERM}|沒有急症室|没有急症室|無急症室|无急症室",
+    re.IGNORECASE,
+)
+
+
+def alias_pattern(alias):
+    """Word-bounded for Latin aliases; Chinese has no word boundaries"""
+    escaped = re.escape(alias).replace(r"\ ", r"\s+")
+    return rf"\b{escaped}\b" if alias.isascii() else escaped
+
+
+CLUSTER_PATTERNS = {
+    cluster: re.compile("|".join(alias_pattern(alias) for alias in aliases), re.IGNORECASE)
+    for cluster, aliases in CLUSTER_ALIASES.items()
+}
+
+
+class MetadataIndex:
+    """Inverted index (field, value) -> chunk rows, over the filter fields"""
+
+    def __init__(self, metadatas, fields=FILTER_FIELDS):
+        self.postings = {}
+        for row, metadata in enumerate(metadatas):
+            for field in fields:
+                if field in metadata:
+                    self.postings.setdefault((field, metadata[field]), set()).add(row)
+
+    def rows(self, filters):
+        """Rows matching every filter (an empty set when none do)"""
+        matched = None
+        for field, value in filters.items():
+            rows = self.postings.get((field, value), set())
+            matched = rows if matched is None else matched & rows
+        return matched if matched is not None else set()
+
+
+def extract_filters(question, metadata_index=None):
+    """{field: value} constraints named in the question ({} for none)
+
+    Filters no indexed chunk satisfies are relaxed or dropped rather than
+    returning an empty search.
+    """
+    if not METADATA_FILTERS:
+        return {}
+
+    filters = {}
+    clusters = [cluster for cluster, pattern in CLUSTER_PATTERNS.items() if pattern.search(question)]
+    if len(clusters) == 1:
+        filters["cluster"] = clusters[0]
+
+    if WITHOUT_AE_PATTERN.search(question):
+        filters["with_ae"] = False
+    elif WITH_AE_PATTERN.search(question):
+        filters["with_ae"] = True
+
+    if not filters:
+        return {}
+
+    # The facility type only narrows a question that is already about facilities
+    types = [facility_type for facility_type, pattern in FACILITY_TYPE_PATTERNS.items() if pattern.search(question)]
+    if len(types) == 1:
+        filters["facility_type"] = types[0]
+
+    if metadata_index is not None and not metadata_index.rows(filters):
+        # Relax the facility type first ("SOPC with A&E" -> hospitals with A&E), then give up
+        filters.pop("facility_type", None)
+        if not metadata_index.rows(filters):
+            return {}
+    return filters
+
+
+def where_clause(filters, language=None):
+    """Chroma `where` for the filters plus the question's script (None when unfiltered)"""
+    clauses = [{field: value} for field, value in sorted(filters.items())]
+    script = language_filter(language) if language else None
+    if script:
+        clauses.append(script)
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def describe(filters):
+    """'cluster=Kowloon West Cluster, with_ae=True' for logs and captions"""
+    return ", ".join(f"{field}={value}" for field, value in sorted(filters.items()))
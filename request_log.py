@@ -0,0 +1,148 @@
+"""
+Request Log - non-blocking structured logging for app_local.py
+
+Log calls only put the record on an in-memory queue; a QueueListener thread
+formats it and writes it to the console and a size-rotated JSON-lines file,
+so disk I/O never runs on the event loop. When the queue is full, records
+are dropped and counted rather than blocking the request.
+
+Each query ends with one JSON record that carries its request id, route,
+latency and stage timings. Successful queries are sampled
+(LOG_SAMPLE_RATE). Errors and slow queries are always logged. Other log
+lines written while serving a request carry its request id too.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from telemetry import Counters
+
+# Configuration
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")  # JSON lines; empty = console only
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # rotate at this size
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))  # rotated files kept
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))  # records buffered before dropping
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))  # share of successful queries logged
+LOG_SLOW_SECONDS = float(os.environ.get("LOG_SLOW_SECONDS", "10"))  # slower queries are always logged
+LOG_QUESTION_CHARS = int(os.environ.get("LOG_QUESTION_CHARS", "100"))  # 0 = leave questions out
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+REQUEST_ID_CHARS = 64
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+log_stats = Counters({"requests_logged": 0, "requests_sampled_out": 0, "records_dropped": 0})
+request_logger = logging.getLogger("requests")
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being served (captured on the calling thread)"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record and counts it"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_stats.inc("records_dropped")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and structured fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_file=LOG_FILE, level=LOG_LEVEL):
+    """Route the root logger through a bounded queue to console + rotating JSON file
+
+    Returns the QueueListener (stopped, and the queue flushed, at exit).
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers = [console]
+    if log_file:
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                           encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def begin_request(request_id=None):
+    """Use the client's X-Request-ID (trimmed) or mint one; returns it"""
+    request_id = (request_id or "").strip()[:REQUEST_ID_CHARS] or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+def log_request(endpoint, latency, timings=None, question=None, error=None, **fields):
+    """One structured record per finished query, sampled unless it failed or was slow
+
+    Returns whether the record was logged.
+    """
+    slow = latency >= LOG_SLOW_SECONDS
+    if error is None and not slow and random.random() >= LOG_SAMPLE_RATE:
+        log_stats.inc("requests_sampled_out")
+        return False
+
+    record = {
+        "endpoint": endpoint,
+        "status": "error" if error is not None else "ok",
+        "latency_ms": round(latency * 1000, 1),
+        "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in (timings or {}).items()},
+        **fields,
+    }
+    if question is not None and LOG_QUESTION_CHARS:
+        record["question"] = question[:LOG_QUESTION_CHARS]
+    if error is not None:
+        record["error"] = str(error)
+    if slow:
+        record["slow"] = True
+
+    log_stats.inc("requests_logged")
+    summary = " ".join(f"{key}={value}" for key, value in fields.items())
+    if error is not None:
+        request_logger.error(f"{endpoint} failed after {latency:.2f}s: {error}", extra={"fields": record})
+    else:
+        request_logger.info(f"{endpoint} completed in {latency:.2f}s {summary}".rstrip(), extra={"fields": record})
+    return True
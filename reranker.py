@@ -0,0 +1,119 @@
+"""
+Reranker - cross-encoder second stage with adaptive candidate depth
+Shared by app_local.py and app.py.
+
+Chroma is over-fetched (RERANK_CANDIDATES), a local CPU cross-encoder scores
+(question, chunk) pairs in batches and only the best few reach the LLM, so k
+stays small without losing recall. When the vector search already has a clear
+winner the rerank is skipped; otherwise only the candidates close enough to
+the top hit are scored. Scores are cached per (question, chunk).
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from answer_cache import normalize_question
+from retrieval import doc_key
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RERANK_ENABLED = os.environ.get("RERANK", "1") == "1"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "20"))  # max chunks fetched for the rerank
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "20000"))  # cached (question, chunk) scores
+RERANK_SKIP_MARGIN = float(os.environ.get("RERANK_SKIP_MARGIN", "0.25"))  # top hit this much closer than #2: skip
+RERANK_WINDOW = float(os.environ.get("RERANK_WINDOW", "0.5"))  # rerank hits within +50% of the top distance
+
+
+def rerank_depth(distances, k):
+    """How many candidates to rerank (0 = skip) from ascending vector distances
+
+    Easy queries - one hit clearly closer than the runner-up - skip the rerank.
+    Otherwise candidates far behind the top hit are not worth scoring.
+    """
+    if len(distances) <= 1:
+        return 0
+    best, runner_up = distances[0], distances[1]
+    if runner_up > 0 and (runner_up - best) / runner_up >= RERANK_SKIP_MARGIN:
+        return 0
+
+    close = sum(1 for distance in distances if distance <= best * (1 + RERANK_WINDOW))
+    return min(len(distances), RERANK_CANDIDATES, max(close, 2 * k))
+
+
+class Reranker:
+    """Cross-encoder scoring with a thread-safe LRU cache of pair scores"""
+
+    def __init__(self, model, batch_size=RERANK_BATCH_SIZE, cache_size=RERANK_CACHE_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (normalized question, chunk key) -> score
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def score_many(self, items):
+        """Scores for [(question, docs)], every uncached pair in one batched predict call"""
+        keys = [[(normalize_question(question), doc_key(doc)) for doc in docs] for question, docs in items]
+        scores = {}
+        pending = {}
+        with self.lock:
+            for (question, docs), doc_keys in zip(items, keys):
+                for doc, key in zip(docs, doc_keys):
+                    if key in self.cache:
+                        self.cache.move_to_end(key)
+                        scores[key] = self.cache[key]
+                        self.hits += 1
+                    elif key not in pending:
+                        pending[key] = (question, doc.page_content)
+                        self.misses += 1
+
+        if pending:
+            predicted = self.model.predict(list(pending.values()), batch_size=self.batch_size, show_progress_bar=False)
+            with self.lock:
+                for key, score in zip(pending, predicted):
+                    scores[key] = self.cache[key] = float(score)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return [[scores[key] for key in doc_keys] for doc_keys in keys]
+
+    def rerank_many(self, items, k):
+        """Best k docs for each (question, docs) pair, by cross-encoder score"""
+        results = []
+        for (_, docs), doc_scores in zip(items, self.score_many(items)):
+            ranked = sorted(zip(docs, doc_scores), key=lambda pair: pair[1], reverse=True)
+            results.append([doc for doc, _ in ranked[:k]])
+        return results
+
+    def rerank(self, question, docs, k):
+        return self.rerank_many([(question, docs)], k)[0]
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            }
+
+
+def load_reranker():
+    """Reranker for RERANK_MODEL, or None when disabled or sentence-transformers is missing"""
+    if not RERANK_ENABLED:
+        return None
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.warning("⚠️ sentence-transformers not installed - reranking disabled")
+        return None
+
+    logger.info(f"Loading cross-encoder {RERANK_MODEL}")
+    return Reranker(CrossEncoder(RERANK_MODEL, device="cpu"))
@@ -0,0 +1,68 @@
+"""
+Hybrid Retrieval - BM25 + vector search fused with reciprocal rank fusion
+Shared by app_local.py and app.py.
+
+When BM25 is confident (one chunk clearly wins and covers the query's rare
+terms, e.g. an exact facility name) the lexical hits are used directly and the
+query is never embedded.
+"""
+
+import os
+
+# Configuration
+RRF_K = 60  # standard RRF damping constant
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "10"))  # per retriever, before fusion
+LEXICAL_FAST_PATH = os.environ.get("LEXICAL_FAST_PATH", "1") == "1"
+LEXICAL_SCORE_RATIO = float(os.environ.get("LEXICAL_SCORE_RATIO", "1.5"))  # top hit vs best partial match
+LEXICAL_MIN_COVERAGE = float(os.environ.get("LEXICAL_MIN_COVERAGE", "0.8"))  # IDF-weighted query terms matched
+
+
+def doc_key(doc):
+    """Stable identity for a chunk across retrievers
+
+    Content based: LangChain's Chroma search results carry no ids while BM25 and
+    batched hits do, so ids would never match across retrievers.
+    """
+    return (doc.metadata.get("source"), doc.metadata.get("start_index"), doc.page_content)
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    """Fuse ranked document lists: score(d) = sum 1 / (k + rank)"""
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, 1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def lexical_search(bm25, question, k=HYBRID_CANDIDATES, filters=None):
+    """BM25 hits plus whether they are confident enough to skip the vector search
+
+    Returns (docs, confident). With filters, only chunks whose metadata matches are scored.
+    """
+    if bm25 is None:
+        return [], False
+
+    rows = bm25.metadata_index.rows(filters) if filters else None
+    hits = bm25.search(question, k=k, rows=rows)
+    if not hits or not LEXICAL_FAST_PATH:
+        return [doc for doc, _ in hits], False
+
+    # Confident when the top hit covers the query and clearly beats every hit that doesn't.
+    # Several full matches (e.g. the same hospital in the hospital and SOP files) are fine.
+    top_doc, top_score = hits[0]
+    confident = bm25.coverage(question, top_doc) >= LEXICAL_MIN_COVERAGE
+    if confident:
+        partial = [score for doc, score in hits[1:] if bm25.coverage(question, doc) < LEXICAL_MIN_COVERAGE]
+        confident = not partial or top_score >= LEXICAL_SCORE_RATIO * partial[0]
+    return [doc for doc, _ in hits], confident
+
+
+def hybrid_merge(vector_docs, lexical_docs, k):
+    """RRF-fuse vector and BM25 results and keep the top k"""
+    if not lexical_docs:
+        return vector_docs[:k]
+    return reciprocal_rank_fusion([vector_docs, lexical_docs])[:k]
@@ -0,0 +1,99 @@
+"""
+Single Flight - coalesce identical in-flight work in app_local.py
+Concurrent requests with the same key attach to one running computation and
+all receive its result; streams are fanned out token by token, with late
+joiners replaying what was already produced.
+
+The shared work runs in its own task, so a client that disconnects (cancelling
+its request) does not cancel the computation for the others. A stream is only
+stopped once every subscriber has gone.
+"""
+
+import asyncio
+
+
+class StreamBroadcast:
+    """Pump one async iterator into a buffer that any number of subscribers replay"""
+
+    def __init__(self, source):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.condition = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for item in source:
+                async with self.condition:
+                    self.items.append(item)
+                    self.condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    async def subscribe(self):
+        """Every item from the start, then live items until the source ends (re-raising its error)"""
+        position = 0
+        self.subscribers += 1
+        try:
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: len(self.items) > position or self.done)
+                    items = self.items[position:]
+                    finished = self.done
+                for item in items:
+                    yield item
+                position += len(items)
+                if finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Everyone disconnected - stop the source (e.g. the Ollama generation)
+                self.abandoned = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    """Per-key coalescing of coroutines (do) and async streams (stream)"""
+
+    def __init__(self):
+        self.calls = {}  # key -> task
+        self.streams = {}  # key -> StreamBroadcast
+
+    def __len__(self):
+        return len(self.calls) + len(self.streams)
+
+    async def do(self, key, func):
+        """Await func() once per key at a time; returns (result, shared)"""
+        task = self.calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = self.calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._finish(self.calls, key, done))
+        return await asyncio.shield(task), shared
+
+    def stream(self, key, source_factory):
+        """Subscribe to the running stream for key, or start source_factory(); returns (iterator, shared)"""
+        broadcast = self.streams.get(key)
+        shared = broadcast is not None and not broadcast.abandoned
+        if not shared:
+            broadcast = self.streams[key] = StreamBroadcast(source_factory())
+            broadcast.task.add_done_callback(lambda done: self._finish(self.streams, key, broadcast))
+        return broadcast.subscribe(), shared
+
+    @staticmethod
+    def _finish(flights, key, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+        # Nobody may be left awaiting a failed call - don't let asyncio warn about it
+        if isinstance(flight, asyncio.Future) and not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,97 @@
+"""
+Startup - phased, timed warm-up for app_local.py
+Models load in the background after uvicorn binds, so /live answers at once and
+/ready flips only when everything the query path needs is in memory.
+
+The embedding model can optionally be a pre-exported, int8-quantised ONNX copy
+(see export_embedding_model.py), which loads and encodes faster on CPU.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # hub name or exported directory
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")  # torch | onnx
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "")  # e.g. onnx/model_qint8_avx512_vnni.onnx
+ZH_EMBEDDING_MODEL = os.environ.get("ZH_EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")  # Chinese index
+
+
+class StartupState:
+    """Thread-safe record of startup phases and readiness"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.started_iso = datetime.now().isoformat()
+        self.phases = {}  # name -> {"status", "seconds", "error"}
+        self.ready = False
+        self.error = None
+        self.ready_seconds = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, required=True):
+        """Time one phase; a failed required phase keeps the service unready"""
+        with self.lock:
+            self.phases[name] = {"status": "running", "seconds": None}
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = {"status": "failed", "seconds": round(seconds, 3), "error": str(e)}
+                if required:
+                    self.error = f"{name}: {e}"
+            if required:
+                logger.error(f"❌ Startup phase '{name}' failed after {seconds:.2f}s: {e}")
+                raise
+            logger.warning(f"⚠️ Startup phase '{name}' failed after {seconds:.2f}s: {e}")
+        else:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = {"status": "done", "seconds": round(seconds, 3)}
+            logger.info(f"⏱️ Startup phase '{name}' took {seconds:.2f}s")
+
+    def mark_ready(self):
+        with self.lock:
+            self.ready = True
+            self.ready_seconds = round(time.time() - self.started_at, 3)
+        logger.info(f"✅ Ready in {self.ready_seconds:.2f}s")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "ready": self.ready,
+                "error": self.error,
+                "started_at": self.started_iso,
+                "seconds_to_ready": self.ready_seconds,
+                "phases": {name: dict(info) for name, info in self.phases.items()},
+            }
+
+
+def load_embeddings(model_name=None):
+    """MiniLM embeddings, from the ONNX (optionally int8) export when configured
+
+    Another model (e.g. ZH_EMBEDDING_MODEL) loads with the default torch backend.
+    """
+    if model_name is not None and model_name != EMBEDDING_MODEL:
+        logger.info(f"Loading embedding model {model_name}")
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    model_kwargs = {}
+    if EMBEDDING_BACKEND == "onnx":
+        model_kwargs["backend"] = "onnx"
+        if EMBEDDING_ONNX_FILE:
+            model_kwargs["model_kwargs"] = {"file_name": EMBEDDING_ONNX_FILE}
+        logger.info(f"Loading ONNX embedding model {EMBEDDING_MODEL} {EMBEDDING_ONNX_FILE}".rstrip())
+
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, model_kwargs=model_kwargs)
@@ -0,0 +1,305 @@
+"""
+Statistics Router - answers table lookups straight from the healthstat CSVs
+Questions like "life expectancy in 2023" or "mid-year population 2019" map to
+exact cells, so they get a cited answer in milliseconds instead of retrieval +
+generation (which may get the number wrong).
+
+The tables are held in memory as an indicator x year matrix: one row per
+(indicator, series), one column per year.
+
+The figures are territory-wide, mostly per 1,000 population, so the route
+declines questions about a facility, place or cluster, questions with a
+qualifier the tables don't break down by (a disease, the Annual Report, ...)
+and "how many" counts that would otherwise get a rate back.
+"""
+
+import glob
+import os
+import re
+
+from data_loaders import HEALTHSTAT_GLOB, iter_healthstat_rows
+from query_filters import CLUSTER_PATTERNS
+
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+YEAR_RANGE_PATTERN = re.compile(r"\b((?:19|20)\d{2})\s*(?:-|–|to|until|and)\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+LATEST_PATTERN = re.compile(r"\b(latest|current|currently|now|recent|this year)\b", re.IGNORECASE)
+# Explanations, comparisons, trends and advice need the LLM even when an indicator is named
+OPEN_ENDED_PATTERN = re.compile(
+    r"\b(why|explain|reason|reasons|cause|causes|caused|impact|affect|affects|effect|"
+    r"predict|forecast|should|improve|policy|policies|"
+    r"what happened|happen|happened|trends?|chang(e|ed|es|ing)|compare|compared|comparison|versus|vs|"
+    r"increase[sd]?|decrease[sd]?|rise|rose|fall|fell|drop|dropped|grow|grew|growth)\b",
+    re.IGNORECASE
+)
+# Age groups the population tables don't break down by ("population aged 0-14", "under 18s")
+AGE_QUALIFIER_PATTERN = re.compile(
+    r"\baged?\s+\d+|\b\d+\s*(?:\+|-\s*\d+|(?:and|or)\s+(?:over|above|older|under|below|younger))|"
+    r"\b(?:under|over|above|below)\s+\d+|\bage groups?\b|\b(?:children|youth|teenagers?|elderly|older)\b",
+    re.IGNORECASE
+)
+# Qualifiers the tables have no breakdown for - these need the documents
+UNSUPPORTED_QUALIFIER_PATTERN = re.compile(
+    r"\b(covid(-?19)?|coronavirus|sars|influenza|flu|cancers?|tuberculosis|tb|dengue|hiv|aids|stroke|"
+    r"diabetes|pneumonia|heart disease|diseases?|infections?|virus|suicides?|accidents?|"
+    r"annual report|hospital authority|ha|public|private|wards?|departments?|specialt(y|ies)|icu|"
+    r"psychiatric|districts?|clusters?|clinics?|due to|caused by)\b",
+    re.IGNORECASE
+)
+# A named facility: "Queen Mary Hospital", "Tuen Mun Clinic" (capitalised words before the type)
+NAMED_FACILITY_PATTERN = re.compile(
+    r"\b(?!(?:What|Which|How|Is|Are|Was|Were|Do|Does|The|In)\b)[A-Z][\w'.&-]*(?:\s+[A-Z][\w'.&-]*)*\s+"
+    r"(?:Hospital|Clinic|Centre|Center|Institute|Institution)\b"
+)
+COUNT_PATTERN = re.compile(r"\b(how many|number of|count of)\b", re.IGNORECASE)
+RATE_PATTERN = re.compile(
+    r"\bper\s*(?:1[\s,]?000|thousand|capita|head)(?:\s+(?:population|people|persons|residents))?\b|"
+    r"\b(?:rates?|ratios?|proportion|percentage|share)\b|%",
+    re.IGNORECASE
+)
+# Words that don't change what a bare indicator question asks ("what is the doctors per 1000 population?")
+FILLER_WORDS = {
+    "what", "what's", "whats", "is", "was", "are", "were", "the", "a", "an", "in", "of", "for", "at",
+    "hong", "kong", "hk", "hk's", "population", "people", "figure", "figures", "value", "level",
+    "tell", "me", "show", "give", "s", "and", "by", "sex", "gender", "statistics", "stats",
+    "how", "many", "much", "number",
+}
+
+# Indicator label -> question pattern, checked in order (more specific first).
+# Indicators not listed here are matched by their own label.
+INDICATOR_PATTERNS = [
+    ("Number of registered doctors", r"\b(doctors?|physicians?)\b"),
+    ("Number of registered nurses", r"\bnurses?\b"),
+    ("Hospital beds", r"\b(hospital )?beds?\b"),
+    ("Proportion of elderly population (%)",
+     r"\b(elderly|older|aged 65|65 and over)\b.*\b(population|proportion|share|percentage)\b|"
+     r"\b(proportion|share|percentage) of (the )?(elderly|older)|"
+     r"\bpopulation\b.*(\baged 65\b|\b65\s*\+|\b65 (and|or) (over|above|older)\b|\belderly\b|\bolder\b)"),
+    ("Dependency ratio", r"\bdependency\b"),
+    ("Mid-year population ('000)", r"\bpopulation\b"),
+    ("Life expectancy at birth (years)", r"\blife expectancy\b"),
+    ("Total fertility rate", r"\bfertility\b"),
+    ("Infant mortality rate", r"\binfant (mortality|deaths?)\b"),
+    ("Crude birth rate", r"\b(birth rate|births)\b"),
+    ("Crude death rate", r"\b(death rate|mortality rate|deaths)\b"),
+]
+SERIES_SYNONYMS = {
+    "male": r"\b(male|males|men|man|boys?)\b",
+    "female": r"\b(female|females|women|woman|girls?)\b",
+    "child": r"\b(child|children|young)\b",
+    "elderly": r"\b(elderly|old-age|older)\b",
+    "overall": r"\b(overall|total|combined)\b",
+}
+
+
+def _label_pattern(indicator):
+    """Match an indicator by its own label, minus units: "Crude birth rate" """
+    label = re.sub(r"\(.*?\)", "", indicator).strip().lower()
+    return re.compile(r"\b" + re.escape(label) + r"\b", re.IGNORECASE)
+
+
+class StatTable:
+    """Indicator x year matrix over every healthstat table"""
+
+    def __init__(self):
+        self.years = []        # column order
+        self.rows = []         # [{"indicator", "series", "unit", "table", "source", "footnotes"}]
+        self.values = []       # values[row][column] -> displayed value string or None
+        self.notes = {}        # (source, note id) -> note text
+        self._row_index = {}   # (source, indicator, series) -> row
+        self._year_index = {}  # year -> column
+
+    @classmethod
+    def build(cls, stat_files):
+        """Build from healthstat_*.csv files"""
+        table = cls()
+        cells = []
+        for path in stat_files:
+            for record in iter_healthstat_rows(path):
+                if record["record_type"] == "note":
+                    table.notes[(path, record["note"])] = record["text"]
+                    continue
+                key = (path, record["indicator"], record["series"])
+                if key not in table._row_index:
+                    table._row_index[key] = len(table.rows)
+                    table.rows.append({
+                        "indicator": record["indicator"],
+                        "series": record["series"],
+                        "unit": record["unit"],
+                        "table": record["table"],
+                        "source": path,
+                        "footnotes": record["footnotes"],
+                    })
+                cells.append((table._row_index[key], record["year"], record["value"]))
+
+        table.years = sorted({year for _, year, _ in cells})
+        table._year_index = {year: column for column, year in enumerate(table.years)}
+        table.values = [[None] * len(table.years) for _ in table.rows]
+        for row, year, value in cells:
+            table.values[row][table._year_index[year]] = value
+        return table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def indicators(self):
+        """Distinct indicator labels, in table order"""
+        return list(dict.fromkeys(row["indicator"] for row in self.rows))
+
+    def match_indicator(self, question):
+        """Indicator label named in the question, or None"""
+        known = set(self.indicators())
+        for indicator, pattern in INDICATOR_PATTERNS:
+            if indicator in known and re.search(pattern, question, re.IGNORECASE):
+                return indicator
+        for indicator in known:
+            if _label_pattern(indicator).search(question):
+                return indicator
+        return None
+
+    def match_rows(self, question, indicator):
+        """Rows of the indicator, narrowed to the series the question names (if any)"""
+        rows = [i for i, row in enumerate(self.rows) if row["indicator"] == indicator]
+        named = []
+        for i in rows:
+            series = self.rows[i]["series"].lower()
+            pattern = SERIES_SYNONYMS.get(series, r"\b" + re.escape(series) + r"\b") if series else None
+            if pattern and re.search(pattern, question, re.IGNORECASE):
+                named.append(i)
+        return named or rows
+
+    def value(self, row, year):
+        column = self._year_index.get(year)
+        return None if column is None else self.values[row][column]
+
+    def latest_year(self, row):
+        """Most recent year with a value for the row"""
+        for column in range(len(self.years) - 1, -1, -1):
+            if self.values[row][column] is not None:
+                return self.years[column]
+        return None
+
+
+def question_years(question, table):
+    """Years the question asks about: explicit years or a range"""
+    match = YEAR_RANGE_PATTERN.search(question)
+    if match:
+        start, end = sorted((int(match.group(1)), int(match.group(2))))
+        return [year for year in table.years if start <= year <= end] or [start, end]
+    return sorted({int(year) for year in YEAR_PATTERN.findall(question)})
+
+
+def is_rate_indicator(row):
+    """Per-1,000, percentage and ratio indicators - never an answer to "how many" """
+    indicator = row["indicator"].lower()
+    return "per " in row["unit"].lower() or "%" in indicator or "rate" in indicator or "ratio" in indicator
+
+
+def names_facility_or_place(question, geo_index=None):
+    """True when the question is about a facility, place or cluster rather than all of Hong Kong"""
+    if NAMED_FACILITY_PATTERN.search(question):
+        return True
+    if any(pattern.search(question) for pattern in CLUSTER_PATTERNS.values()):
+        return True
+    return geo_index is not None and geo_index.find_place(question) is not None
+
+
+def is_bare_indicator_question(question, indicator):
+    """The question names the indicator (and maybe a series) and nothing else"""
+    # Full label first, so synonyms don't leave part of it behind ("crude" of "crude death rate")
+    rest = _label_pattern(indicator).sub(" ", question)
+    for label, pattern in INDICATOR_PATTERNS:
+        if label == indicator:
+            rest = re.sub(pattern, " ", rest, flags=re.IGNORECASE)
+    for pattern in list(SERIES_SYNONYMS.values()) + [RATE_PATTERN.pattern, LATEST_PATTERN.pattern]:
+        rest = re.sub(pattern, " ", rest, flags=re.IGNORECASE)
+    return all(word in FILLER_WORDS for word in re.findall(r"[a-z']+", rest.lower()))
+
+
+def _row_label(row):
+    label = row["indicator"]
+    if row["series"]:
+        label += f", {row['series']}"
+    if row["unit"]:
+        label += f" {row['unit']}"
+    return label
+
+
+def answer_stat_question(question, table, geo_index=None):
+    """Answer 'indicator in year' questions from the stat tables, or None if it isn't one
+
+    geo_index (optional) supplies place and facility names to decline on.
+    """
+    if table is None or not len(table) or OPEN_ENDED_PATTERN.search(question):
+        return None
+    if UNSUPPORTED_QUALIFIER_PATTERN.search(question) or names_facility_or_place(question, geo_index):
+        return None
+
+    indicator = table.match_indicator(question)
+    if indicator is None:
+        return None
+    # "population aged 0-14" is not the total population - only the documents break it down
+    if indicator == "Mid-year population ('000)" and AGE_QUALIFIER_PATTERN.search(question):
+        return None
+    rows = table.match_rows(question, indicator)
+    # "How many doctors" asks for a count; the table only has doctors per 1,000 population
+    if COUNT_PATTERN.search(question) and not RATE_PATTERN.search(question) \
+            and all(is_rate_indicator(table.rows[row]) for row in rows):
+        return None
+
+    years = question_years(question, table)
+    if not years:
+        # "latest life expectancy" - or just "doctors per 1000 population" - gets the
+        # newest figure; with anything else in the question, leave it to retrieval
+        if not LATEST_PATTERN.search(question) and not is_bare_indicator_question(question, indicator):
+            return None
+        latest = table.latest_year(rows[0])
+        if latest is None:
+            return None
+        years = [latest]
+
+    lines = []
+    cells = []
+    for row in rows:
+        meta = table.rows[row]
+        values = [(year, table.value(row, year)) for year in years]
+        found = [(year, value) for year, value in values if value is not None]
+        if not found:
+            continue
+        cells.extend({"indicator": meta["indicator"], "series": meta["series"], "year": year, "value": value}
+                     for year, value in found)
+        if len(found) == 1:
+            lines.append(f"- {_row_label(meta)}, {found[0][0]}: {found[0][1]}")
+        else:
+            lines.append(f"- {_row_label(meta)}: " + ", ".join(f"{year}: {value}" for year, value in found))
+
+    if not cells:
+        available = f"{table.years[0]}-{table.years[-1]}" if table.years else "none"
+        return {
+            "answer": f"No {indicator} figure is published for {', '.join(map(str, years))} "
+                      f"(available years: {available}).",
+            "sources": sorted({table.rows[row]["source"] for row in rows}),
+            "cells": [],
+            "indicator": indicator,
+        }
+
+    # Cite the table and any numbered notes that define the figures
+    sources = sorted({table.rows[row]["source"] for row in rows})
+    titles = list(dict.fromkeys(table.rows[row]["table"] for row in rows))
+    notes = []
+    for row in rows:
+        meta = table.rows[row]
+        for note_id in meta["footnotes"].split(","):
+            text = table.notes.get((meta["source"], note_id))
+            if text and f"Note {note_id}: {text}" not in notes:
+                notes.append(f"Note {note_id}: {text}")
+
+    answer = "\n".join([f"{indicator}:"] + lines + [f"\nSource: {'; '.join(titles)}"] + notes)
+    return {"answer": answer, "sources": sources, "cells": cells, "indicator": indicator}
+
+
+def load_stat_table(data_dir="./data"):
+    """Load every healthstat table under data/ (milliseconds - no index file needed)"""
+    stat_files = sorted(glob.glob(os.path.join(data_dir, "**", HEALTHSTAT_GLOB), recursive=True))
+    if not stat_files:
+        return None
+    return StatTable.build(stat_files)
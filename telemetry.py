@@ -0,0 +1,221 @@
+"""
+Telemetry - thread-safe counters, gauges and bucketed latency histograms
+Shared by app_local.py (served as Prometheus text on /metrics) and app.py.
+
+Every query stage (embedding, Chroma search, prompt building, generation, ...)
+is timed into a per-stage histogram, so p50/p95/p99 show which stage is the
+bottleneck. Optionally the same timings are returned per request as a
+Server-Timing header.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds - roughly x2.5 steps from sub-millisecond lookups to minute-long generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with interpolated percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) by interpolating inside its bucket"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+
+        rank = q / 100.0 * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self.lock:
+            return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    def summary(self):
+        with self.lock:
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "mean": round(total / count, 4) if count else 0.0,
+            "p50": round(self.percentile(50), 4),
+            "p95": round(self.percentile(95), 4),
+            "p99": round(self.percentile(99), 4),
+        }
+
+
+class Counters:
+    """Dict-like counters that are safe to update from worker threads"""
+
+    def __init__(self, initial):
+        self._values = dict(initial)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._values[key]
+
+    def inc(self, key, value=1):
+        with self._lock:
+            self._values[key] += value
+            return self._values[key]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Telemetry:
+    """Per-stage latency histograms, LLM token counters and gauges"""
+
+    def __init__(self, namespace="rag"):
+        self.namespace = namespace
+        self.stages = {}  # stage -> Histogram
+        self.tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
+        self.counters = Counters({"llm_prompt_tokens": 0, "llm_completion_tokens": 0, "llm_generations": 0})
+        self.gauges = {}  # name -> (help, callable)
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, timings=None):
+        """Record one stage duration (and add it to a per-request timings dict, if given)"""
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+        histogram.observe(seconds)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage, timings=None):
+        """Time the block as `stage`, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, timings)
+
+    def record_generation(self, completion_tokens, seconds, prompt_tokens=0):
+        """Token counts and throughput for one LLM generation"""
+        self.counters.inc("llm_generations")
+        self.counters.inc("llm_completion_tokens", completion_tokens)
+        self.counters.inc("llm_prompt_tokens", prompt_tokens)
+        if completion_tokens and seconds > 0:
+            self.tokens_per_second.observe(completion_tokens / seconds)
+
+    def gauge(self, name, help_text, func):
+        """Register a gauge read at scrape time"""
+        self.gauges[name] = (help_text, func)
+
+    def stage_summary(self):
+        """{stage: {count, mean, p50, p95, p99}} in seconds"""
+        with self.lock:
+            stages = dict(self.stages)
+        return {stage: histogram.summary() for stage, histogram in sorted(stages.items())}
+
+    def token_summary(self):
+        counters = self.counters.snapshot()
+        return {
+            "generations": counters["llm_generations"],
+            "prompt_tokens": counters["llm_prompt_tokens"],
+            "completion_tokens": counters["llm_completion_tokens"],
+            "tokens_per_second_p50": round(self.tokens_per_second.percentile(50), 1),
+        }
+
+    def render_prometheus(self, extra_counters=None):
+        """Prometheus text exposition format (version 0.0.4)"""
+        ns = self.namespace
+        lines = []
+
+        lines.append(f"# HELP {ns}_stage_seconds Latency of each query stage")
+        lines.append(f"# TYPE {ns}_stage_seconds histogram")
+        with self.lock:
+            stages = sorted(self.stages.items())
+        for stage, histogram in stages:
+            _render_histogram(lines, f"{ns}_stage_seconds", histogram, f'stage="{_escape(stage)}",')
+
+        lines.append(f"# HELP {ns}_llm_tokens_per_second Completion tokens per second of each generation")
+        lines.append(f"# TYPE {ns}_llm_tokens_per_second histogram")
+        _render_histogram(lines, f"{ns}_llm_tokens_per_second", self.tokens_per_second, "")
+
+        counters = self.counters.snapshot()
+        lines.append(f"# HELP {ns}_llm_tokens_total LLM tokens processed")
+        lines.append(f"# TYPE {ns}_llm_tokens_total counter")
+        lines.append(f'{ns}_llm_tokens_total{{kind="prompt"}} {counters["llm_prompt_tokens"]}')
+        lines.append(f'{ns}_llm_tokens_total{{kind="completion"}} {counters["llm_completion_tokens"]}')
+        lines.append(f"# HELP {ns}_llm_generations_total LLM generations")
+        lines.append(f"# TYPE {ns}_llm_generations_total counter")
+        lines.append(f"{ns}_llm_generations_total {counters['llm_generations']}")
+
+        for name, (help_text, value) in sorted((extra_counters or {}).items()):
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} counter")
+            lines.append(f"{ns}_{name} {_format_value(value)}")
+
+        for name, (help_text, func) in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue  # e.g. not loaded yet - skip rather than fail the scrape
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} gauge")
+            lines.append(f"{ns}_{name} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines, name, histogram, labels):
+    snapshot = histogram.snapshot()
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, snapshot["counts"]):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {snapshot["count"]}')
+    labels = labels.rstrip(",")
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {snapshot['sum']:.6f}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return f"{value}"
+
+
+def server_timing_header(timings):
+    """Server-Timing header value: 'embed;dur=12.3, vector_search;dur=4.1' (milliseconds)"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
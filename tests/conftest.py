@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(ROOT, "data")
+
+
+@pytest.fixture(scope="session")
+def stat_table():
+    from stat_router import load_stat_table
+    return load_stat_table(DATA_DIR)
+
+
+@pytest.fixture(scope="session")
+def geo_index():
+    from geo_index import load_geo_index
+    # No saved index in an empty directory - built from the facility JSON in data/
+    return load_geo_index(os.path.join(ROOT, "tests"), DATA_DIR)
@@ -0,0 +1,44 @@
+import pytest
+
+from answer_cache import AnswerCache, cache_scope
+
+KOWLOON_WEST = {"cluster": "Kowloon West Cluster", "with_ae": True}
+KOWLOON_EAST = {"cluster": "Kowloon East Cluster", "with_ae": True}
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(max_size=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("Hospitals with A&E in Kowloon West?", "West answer", ["facility-hosp.json"],
+              embedding=[1.0, 0.0, 0.0], scope=cache_scope(KOWLOON_WEST, "en"))
+    return cache
+
+
+@pytest.mark.parametrize("embedding, scope, answer", [
+    # Same scope, near-identical embedding
+    ([0.99, 0.1, 0.0], cache_scope(KOWLOON_WEST, "en"), "West answer"),
+    # Embeds almost identically but other filters or another language must not share it
+    ([0.99, 0.1, 0.0], cache_scope(KOWLOON_EAST, "en"), None),
+    ([0.99, 0.1, 0.0], cache_scope(KOWLOON_WEST, "zh-hant"), None),
+    ([0.99, 0.1, 0.0], cache_scope(), None),
+    # Same scope, different question
+    ([0.0, 1.0, 0.0], cache_scope(KOWLOON_WEST, "en"), None),
+])
+def test_semantic_hits_stay_in_scope(cache, embedding, scope, answer):
+    entry = cache.get_similar(embedding, scope)
+    assert (entry["answer"] if entry else None) == answer
+
+
+def test_exact_hit_ignores_punctuation_and_case(cache):
+    assert cache.get_exact("hospitals with a&e in kowloon west")["answer"] == "West answer"
+    assert cache.get_exact("Hospitals with A&E in Kowloon East?") is None
+
+
+@pytest.mark.parametrize("a, b, same", [
+    (cache_scope(), cache_scope(None, None), True),
+    (cache_scope({"cluster": "X", "with_ae": True}), cache_scope({"with_ae": True, "cluster": "X"}), True),
+    (cache_scope(KOWLOON_WEST, "en"), cache_scope(KOWLOON_WEST, "zh-hans"), False),
+    (cache_scope(KOWLOON_WEST), cache_scope(KOWLOON_EAST), False),
+])
+def test_cache_scope_keys(a, b, same):
+    assert (a == b) == same
@@ -0,0 +1,43 @@
+import pytest
+
+from geo_index import answer_nearby_question, place_key
+
+
+@pytest.mark.parametrize("question, place, first_line", [
+    ("nearest hospital to Tuen Mun", "Tuen Mun", "Nearest Hospitals to Tuen Mun:"),
+    ("clinics near Queen Mary Hospital", "Queen Mary Hospital", "Nearest clinics to Queen Mary Hospital:"),
+    ("nearest A&E to Sha Tin", "Sha Tin", "Nearest A&E hospitals to Sha Tin:"),
+    ("A&E near Mong Kok", "Mong Kok", "Nearest A&E hospitals to Mong Kok:"),
+    ("closest clinic to Sai Kung", "Sai Kung", "Nearest clinics to Sai Kung:"),
+])
+def test_answers_nearby(geo_index, question, place, first_line):
+    result = answer_nearby_question(question, geo_index)
+    assert result is not None
+    assert result["place"] == place
+    lines = result["answer"].splitlines()
+    assert lines[0] == first_line
+    assert lines[1].startswith("1. ")
+
+
+@pytest.mark.parametrize("question", [
+    "Which hospitals are around Kowloon?",  # a region, not a distance ranking
+    "hospitals in Kowloon",
+    "What is the nearest hospital?",  # no place to measure from
+])
+def test_not_nearby(geo_index, question):
+    assert answer_nearby_question(question, geo_index) is None
+
+
+def test_results_are_distinct(geo_index):
+    result = answer_nearby_question("nearest hospital to Mong Kok", geo_index)
+    names = [facility["name"] for facility in result["facilities"]]
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Sha Tin", "shatin"),
+    ("Shatin", "shatin"),
+    ("Tsuen-Wan", "tsuenwan"),
+])
+def test_place_key(name, key):
+    assert place_key(name) == key
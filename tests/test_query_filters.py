@@ -0,0 +1,42 @@
+import pytest
+
+from query_filters import MetadataIndex, extract_filters, where_clause
+
+
+@pytest.mark.parametrize("question, filters", [
+    ("hospitals with A&E in Kowloon West",
+     {"cluster": "Kowloon West Cluster", "with_ae": True, "facility_type": "hosp"}),
+    ("Which hospitals in NT East have no A&E?",
+     {"cluster": "New Territories East Cluster", "with_ae": False, "facility_type": "hosp"}),
+    ("九龍西有急症室的醫院", {"cluster": "Kowloon West Cluster", "with_ae": True, "facility_type": "hosp"}),
+    ("family medicine clinics in Hong Kong East", {"cluster": "Hong Kong East Cluster", "facility_type": "fmc"}),
+    ("SOPC with A&E in KCC", {"cluster": "Kowloon Central Cluster", "with_ae": True, "facility_type": "sop"}),
+    # A&E as a topic, or a facility type alone, is not a filter
+    ("What are the A&E waiting times?", {}),
+    ("Which hospital has most beds?", {}),
+])
+def test_extract_filters(question, filters):
+    assert extract_filters(question) == filters
+
+
+def test_relaxes_filters_no_chunk_matches():
+    index = MetadataIndex([
+        {"cluster": "Kowloon Central Cluster", "facility_type": "hosp", "with_ae": True},
+        {"cluster": "Kowloon Central Cluster", "facility_type": "sop", "with_ae": False},
+    ])
+    # No SOPC has A&E: the facility type is dropped first
+    assert extract_filters("SOPC with A&E in KCC", index) == {"cluster": "Kowloon Central Cluster", "with_ae": True}
+    # Nothing at all in the cluster: no filter rather than an empty search
+    assert extract_filters("hospitals with A&E in Kowloon West", index) == {}
+
+
+@pytest.mark.parametrize("filters, language, where", [
+    ({}, None, None),
+    ({"cluster": "Kowloon West Cluster"}, None, {"cluster": "Kowloon West Cluster"}),
+    ({"cluster": "Kowloon West Cluster"}, "zh-hant",
+     {"$and": [{"cluster": "Kowloon West Cluster"}, {"language": "zh-hant"}]}),
+    ({"with_ae": True, "cluster": "Kowloon West Cluster"}, None,
+     {"$and": [{"cluster": "Kowloon West Cluster"}, {"with_ae": True}]}),
+])
+def test_where_clause(filters, language, where):
+    assert where_clause(filters, language) == where
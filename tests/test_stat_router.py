@@ -0,0 +1,46 @@
+import pytest
+
+from stat_router import answer_stat_question
+
+
+@pytest.mark.parametrize("question, expected", [
+    # Indicator + year, range or nothing (latest year)
+    ("life expectancy in 2023", "- Life expectancy at birth (years), Male, 2023: 82.5"),
+    ("hospital beds 2018-2020", "- Hospital beds, Series A (per 1 000 population): 2018: 4.6, 2019: 4.7, 2020: 4.8"),
+    ("Crude death rate 2015 to 2018", "- Crude death rate: 2015: 6.4, 2016: 6.4, 2017: 6.2, 2018: 6.4"),
+    ("What was the population in 2021?", "- Mid-year population ('000), 2021: 7 413"),
+    ("What is the life expectancy for women?", "- Life expectancy at birth (years), Female, 2024: 88.2"),
+    ("elderly dependency ratio in 2022", "- Dependency ratio, Elderly, 2022: 303"),
+    # Bare indicator questions, however the label is phrased
+    ("doctors per 1000 population", "- Number of registered doctors (per 1 000 population), 2024: 2.2"),
+    ("how many doctors per 1000 population", "- Number of registered doctors (per 1 000 population), 2024: 2.2"),
+    ("What is the crude death rate?", "- Crude death rate, 2024: 7.0"),
+    ("crude birth rate", "- Crude birth rate, 2024: 4.9"),
+    # Elderly share, qualifier before or after "population"
+    ("elderly population 2019", "- Proportion of elderly population (%), 2019: 17.7"),
+    ("population aged 65 and over in 2020", "- Proportion of elderly population (%), 2020: 18.5"),
+    ("What share of the population is 65+ in 2021?", "- Proportion of elderly population (%), 2021: 19.6"),
+])
+def test_answers_from_table(stat_table, geo_index, question, expected):
+    result = answer_stat_question(question, stat_table, geo_index)
+    assert result is not None
+    assert expected in result["answer"].splitlines()
+
+
+@pytest.mark.parametrize("question", [
+    # Open-ended: explanations, trends, comparisons
+    "why did life expectancy fall?",
+    "What happened around 2020 to hospital beds?",
+    "How did the death rate change from 2019 to 2022?",
+    "compare hospital beds in 2015 and 2024",
+    # Qualifiers, places and age groups the territory-wide tables lack
+    "How many COVID-19 deaths were there in 2022?",
+    "How many beds does Queen Mary Hospital have in 2023?",
+    "population aged 0-14 in 2020",
+    # Count of a rate-only indicator
+    "how many doctors in 2022",
+    # No indicator at all
+    "What are the opening hours of Tuen Mun clinic?",
+])
+def test_declines(stat_table, geo_index, question):
+    assert answer_stat_question(question, stat_table, geo_index) is None